@@ -0,0 +1,71 @@
+"""
+Benchmark rolling-origin backtesting against a per-item pandas loop.
+
+The loop scores each item with rolling().mean().shift() the way a
+straightforward implementation would; it is timed on a subset of items,
+checked against DemandEngine.backtest and extrapolated.
+
+Usage:
+    python benchmarks/bench_backtest.py [--items 10000] [--days 730] [--windows 7 14 28 56] [--horizons 1 7]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from demand_engine import DemandEngine  # noqa: E402
+
+from bench_sma import make_history, timed  # noqa: E402
+
+
+def legacy_backtest(engine: DemandEngine, windows, horizons) -> pd.DataFrame:
+    first = max(windows) + max(horizons) - 1
+    rows = []
+    for item, history in engine.df.groupby('Item', sort=False):
+        actual = history['QuantitySold'].astype(float).reset_index(drop=True)
+        for window in windows:
+            sma = actual.rolling(window).mean()
+            for horizon in horizons:
+                error = (sma.shift(horizon) - actual).iloc[first:].dropna()
+                scored = actual.iloc[first:][error.index]
+                nonzero = scored != 0
+                rows.append((item, window, horizon, len(error), error.abs().mean(),
+                             (error[nonzero].abs() / scored[nonzero]).mean() * 100, error.mean()))
+    return pd.DataFrame(rows, columns=['Item', 'Window', 'Horizon', 'Count', 'MAE', 'MAPE', 'Bias'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=10_000)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--windows', type=int, nargs='+', default=[7, 14, 28, 56])
+    parser.add_argument('--horizons', type=int, nargs='+', default=[1, 7])
+    parser.add_argument('--legacy-items', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"Generating {args.items:,} items x {args.days} days...")
+    engine = DemandEngine(make_history(args.items, args.days))
+    engine.df  # Materialize outside the timings
+
+    vectorized, scores = timed(lambda: engine.backtest(args.windows, args.horizons))
+    forecasts, _ = timed(engine.backtest_forecasts)
+
+    subset = DemandEngine(make_history(args.legacy_items, args.days))
+    legacy, expected = timed(lambda: legacy_backtest(subset, args.windows, args.horizons))
+    pd.testing.assert_frame_equal(subset.backtest(args.windows, args.horizons), expected, check_dtype=False)
+    legacy_estimate = legacy * args.items / args.legacy_items
+
+    settings = len(args.windows) * len(args.horizons)
+    print(f"{'path':>30} {'seconds':>10}")
+    print(f"{'per-item loop (extrapolated)':>30} {legacy_estimate:>10.2f}")
+    print(f"{'vectorized backtest':>30} {vectorized:>10.3f}   ({legacy_estimate / vectorized:.0f}x)")
+    print(f"{'one forecast_df':>30} {forecasts:>10.3f}")
+    print(f"Scored {len(scores):,} item x setting pairs ({settings} settings); "
+          f"median MAE by window: {scores.groupby('Window')['MAE'].median().round(3).to_dict()}")
+
+
+if __name__ == '__main__':
+    main()
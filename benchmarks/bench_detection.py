@@ -0,0 +1,68 @@
+"""
+Time sales column detection on narrow and wide headers.
+
+The legacy scan is the original nested loop of uncompiled re.search calls
+over patterns x columns. "cold" clears the per-name score cache first,
+"warm" reuses it, and "memo" answers from a SchemaMemo as repeat uploads
+of the same header do.
+
+Usage:
+    python benchmarks/bench_detection.py [--extra-columns 500] [--repeat 200]
+"""
+import argparse
+import re
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from column_detection import FIELD_PATTERNS, SchemaMemo, detect_columns, name_scores  # noqa: E402
+
+
+def legacy_detect(columns):
+    def find_matching_column(patterns, df_columns):
+        for pattern in patterns:
+            for col in df_columns:
+                if re.search(pattern, col, re.IGNORECASE):
+                    return col
+        return None
+    return {field: find_matching_column(patterns, columns) for field, patterns in FIELD_PATTERNS.items()}
+
+
+def best_of(func, repeat: int) -> float:
+    """Best time per call in microseconds"""
+    return min(timeit.repeat(func, number=repeat, repeat=5)) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--extra-columns', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    headers = {
+        'narrow': ['order date', 'sku', 'units sold', 'on hand'],
+        'wide': [f"attribute_{i}_value" for i in range(args.extra_columns)]
+                + ['order date', 'sku', 'units sold', 'on hand'],
+    }
+    memo = SchemaMemo(Path(tempfile.mkdtemp(prefix='bench_detection_')) / 'memo.json')
+
+    print(f"{'header':>8} {'columns':>8} {'legacy us':>10} {'cold us':>9} {'warm us':>9} {'memo us':>9}")
+    for name, columns in headers.items():
+        detect_columns(columns, memo=memo)
+
+        def cold():
+            name_scores.cache_clear()
+            detect_columns(columns)
+
+        legacy = best_of(lambda: legacy_detect(columns), args.repeat)
+        cold_us = best_of(cold, args.repeat)
+        warm_us = best_of(lambda: detect_columns(columns), args.repeat)
+        memo_us = best_of(lambda: detect_columns(columns, memo=memo), args.repeat)
+        print(f"{name:>8} {len(columns):>8} {legacy:>10.1f} {cold_us:>9.1f} {warm_us:>9.1f} {memo_us:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
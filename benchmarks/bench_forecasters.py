@@ -0,0 +1,61 @@
+"""
+Compare the cost and holdout accuracy of DemandEngine's forecasting methods.
+
+Each method is fitted on all but the last --holdout days of a synthetic
+seasonal history and timed; its mean daily forecast over the holdout is
+then compared with the actual mean daily demand (MAE across SKUs). The
+smoothing methods include their per-item grid search in the timing.
+
+Usage:
+    python benchmarks/bench_forecasters.py [--skus 10000] [--days 730] [--holdout 14] [--seasonality 0.3]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from demand_engine import DemandEngine, FORECAST_METHODS  # noqa: E402
+
+from synthetic import generate_sales  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--skus', type=int, default=10_000)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--holdout', type=int, default=14)
+    parser.add_argument('--seasonality', type=float, default=0.3)
+    parser.add_argument('--trend', type=float, default=0.2)
+    parser.add_argument('--noise', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"Generating {args.skus:,} SKUs x {args.days} days...")
+    df = generate_sales(args.skus, args.days, seasonality=args.seasonality, noise=args.noise,
+                        trend=args.trend, seed=args.seed)
+    history = df[['product', 'date', 'sold_units']].rename(
+        columns={'product': 'Item', 'date': 'Date', 'sold_units': 'QuantitySold'})
+    cutoff = history['Date'].max() - pd.Timedelta(days=args.holdout - 1)
+    train = history[history['Date'] < cutoff]
+    actual = history[history['Date'] >= cutoff].groupby('Item', observed=True)['QuantitySold'].mean()
+
+    engine = DemandEngine(train)
+    engine.df  # Materialize outside the timings
+
+    print(f"{'method':>14} {'seconds':>9} {'vs sma':>8} {'holdout MAE':>12}")
+    baseline = None
+    for method in FORECAST_METHODS:
+        start = time.perf_counter()
+        forecast = engine.calculate_forecast_demand(method, horizon=args.holdout)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        error = (forecast.set_index('Item')['ForecastDemand'] - actual).abs().mean()
+        print(f"{method:>14} {elapsed:>9.3f} {elapsed / baseline:>7.1f}x {error:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark the columnar metrics engine against the original per-product loop.
+
+Usage:
+    python benchmarks/bench_metrics.py [--skus 100 1000 10000 50000] [--days 30]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from metrics_engine import compute_inventory_metrics  # noqa: E402
+
+from synthetic import generate_sales  # noqa: E402
+
+
+def legacy_metrics(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The row-by-row implementation compute_metrics used before the columnar
+    engine, with current stock taken from the latest row rather than the first
+    """
+    metrics = []
+    for product, group in df.groupby('product'):
+        avg_demand = group['sold_units'].mean()
+        std_demand = group['sold_units'].std() if len(group) > 1 else 0
+        current_stock = group.sort_values('date', kind='stable')['current_stock'].iloc[-1]
+        lead_time_days = 7
+        safety_stock = 1.65 * std_demand * np.sqrt(lead_time_days) if not np.isnan(std_demand) else 0
+        reorder_point = (avg_demand * lead_time_days) + safety_stock
+        needs_reorder = current_stock <= reorder_point
+        days_of_inventory = current_stock / avg_demand if avg_demand > 0 else 0
+        inventory_turnover = 365 / days_of_inventory if days_of_inventory > 0 else 0
+        days_until_stockout = current_stock / avg_demand if avg_demand > 0 else float('inf')
+        potential_stockout = days_until_stockout < lead_time_days * 1.5
+        metrics.append({
+            'product': str(product),
+            'current_stock': int(current_stock),
+            'avg_demand': round(avg_demand, 2),
+            'safety_stock': round(safety_stock, 2),
+            'reorder_point': round(reorder_point, 2),
+            'inventory_turnover': round(inventory_turnover, 2),
+            'needs_reorder': needs_reorder,
+            'potential_stockout': potential_stockout,
+            'days_until_stockout': round(days_until_stockout, 1) if not np.isinf(days_until_stockout) else float('inf')
+        })
+    return pd.DataFrame(metrics)
+
+
+def best_of(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--skus', type=int, nargs='+', default=[100, 1000, 10000, 50000])
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'skus':>8} {'rows':>10} {'legacy (s)':>12} {'columnar (s)':>13} {'speedup':>8}")
+    for n_skus in args.skus:
+        df = generate_sales(n_skus, args.days)
+
+        expected = legacy_metrics(df)
+        actual = compute_inventory_metrics(df)
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+        legacy_time = best_of(lambda: legacy_metrics(df), 1 if n_skus > 10000 else args.repeat)
+        columnar_time = best_of(lambda: compute_inventory_metrics(df), args.repeat)
+        print(f"{n_skus:>8} {len(df):>10} {legacy_time:>12.4f} {columnar_time:>13.4f} "
+              f"{legacy_time / columnar_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
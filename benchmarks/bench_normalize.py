@@ -0,0 +1,88 @@
+"""
+Measure per-request peak memory of column normalization before and after the
+shared canonical schema.
+
+The legacy path replays what one dashboard request did to the cached frame:
+the route lowercased and remapped the columns, then compute_metrics copied
+the frame and remapped it again, and the plot helper did the same once more.
+The canonical path hands the frame load_sales returned straight to the same
+consumers.
+
+Usage:
+    python benchmarks/bench_normalize.py [--rows 5000000] [--skus 50000]
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from metrics_engine import compute_inventory_metrics  # noqa: E402
+from schema import LEGACY_COLUMN_MAP, ensure_canonical  # noqa: E402
+
+from bench_storage import make_history  # noqa: E402
+
+
+def legacy_normalize(df: pd.DataFrame, copy: bool) -> pd.DataFrame:
+    """The lowercase + column_map pass each route and helper used to repeat"""
+    df = df.copy() if copy else df
+    df = df.rename(columns=lambda col: col.lower().strip())
+    return df.rename(columns={col: new_col for col, new_col in LEGACY_COLUMN_MAP.items()
+                              if col in df.columns and new_col not in df.columns})
+
+
+def legacy_request(df: pd.DataFrame, product: str):
+    df = legacy_normalize(df, copy=False)           # dashboard() / api_metrics()
+    metrics = compute_inventory_metrics(legacy_normalize(df, copy=True))   # compute_metrics()
+    plot_df = legacy_normalize(df, copy=True)       # generate_demand_plot()
+    rows = plot_df[plot_df['product'].astype(str).str.lower() == product.lower()].copy()
+    return metrics, rows.sort_values('date')
+
+
+def canonical_request(df: pd.DataFrame, product: str):
+    df = ensure_canonical(df)
+    metrics = compute_inventory_metrics(ensure_canonical(df))
+    categories = df['product'].cat.categories
+    rows = df[df['product'].isin(categories[categories.str.lower() == product.lower()])]
+    return metrics, rows.sort_values('date')
+
+
+def measure(func):
+    """Return (seconds, peak traced bytes, result) for one call of func"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--skus', type=int, default=50_000)
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows:,} rows over {args.skus:,} SKUs...")
+    df = ensure_canonical(make_history(args.rows, args.skus))
+    product = 'sku-000042'
+
+    results = {}
+    print(f"{'path':>10} {'seconds':>10} {'peak alloc (MB)':>16}")
+    for label, func in [('legacy', legacy_request), ('canonical', canonical_request)]:
+        elapsed, peak, results[label] = measure(lambda: func(df, product))
+        print(f"{label:>10} {elapsed:>10.3f} {peak / 1e6:>16.1f}")
+
+    pd.testing.assert_frame_equal(results['legacy'][0], results['canonical'][0])
+    np.testing.assert_array_equal(results['legacy'][1]['sold_units'], results['canonical'][1]['sold_units'])
+    print(f"Frame itself: {df.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
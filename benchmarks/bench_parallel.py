@@ -0,0 +1,47 @@
+"""
+Measure DemandEngine.run throughput against worker count for each backend.
+
+Usage:
+    python benchmarks/bench_parallel.py [--items 50000] [--days 365] [--workers 1 2 4 8]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from demand_engine import DemandEngine  # noqa: E402
+from bench_sma import make_history  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=50_000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    engine = DemandEngine(make_history(args.items, args.days))
+    engine.df  # Materialize outside the timings
+
+    start = time.perf_counter()
+    expected = engine.run(backend='serial')
+    serial = time.perf_counter() - start
+    print(f"{'backend':>8} {'workers':>8} {'seconds':>9} {'items/s':>12}")
+    print(f"{'serial':>8} {1:>8} {serial:>9.3f} {args.items / serial:>12,.0f}")
+
+    for backend in ('thread', 'process'):
+        for workers in sorted(set(args.workers)):
+            start = time.perf_counter()
+            result = engine.run(backend=backend, workers=workers)
+            elapsed = time.perf_counter() - start
+            pd.testing.assert_frame_equal(result, expected, check_exact=True)
+            print(f"{backend:>8} {workers:>8} {elapsed:>9.3f} {args.items / elapsed:>12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Time LocationRollup on a synthetic multi-location catalog.
+
+Every location stocks a random assortment of the SKUs, each pair with its own
+synthetic demand history, and sells each on a random share of the days. Building the rollup is timed once per repetition;
+the queries afterwards are the per-location, per-region and per-product
+slices an API request would ask for. The pooled safety stock of one region
+is checked against the deviation of its summed daily demand computed with
+pandas.
+
+Usage:
+    python benchmarks/bench_rollup.py [--locations 1000] [--skus 50000] [--assortment 0.02] [--days 14]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from rollup import LocationRollup  # noqa: E402
+
+from synthetic import generate_sales  # noqa: E402
+
+
+def generate(n_locations: int, n_skus: int, assortment: float, n_days: int, sale_share: float,
+             n_regions: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic daily sales of every (location, product) pair, thinned to the
+    days they sold plus a stock count on the last day
+    """
+    rng = np.random.default_rng(seed)
+    per_location = max(1, int(n_skus * assortment))
+    pair_location = np.repeat(np.arange(n_locations), per_location)
+    pair_product = np.concatenate([rng.choice(n_skus, per_location, replace=False) for _ in range(n_locations)])
+
+    # One synthetic SKU per pair, then each pair keeps about sale_share of its days
+    df = generate_sales(len(pair_location), n_days, start='2024-01-01', mean_demand=3.0, seed=seed)
+    pairs = df['product'].cat.codes.to_numpy()
+    last_day = df['date'].to_numpy() == df['date'].max()
+    keep = last_day | (rng.random(len(df)) < sale_share)
+    df, pairs = df[keep].reset_index(drop=True), pairs[keep]
+
+    region_labels = np.array([f"REGION-{i:02d}" for i in range(n_regions)])
+    return df.assign(
+        product=pd.Categorical.from_codes(pair_product[pairs], categories=[f"SKU-{i:06d}" for i in range(n_skus)]),
+        location=pd.Categorical.from_codes(pair_location[pairs],
+                                           categories=[f"LOC-{i:04d}" for i in range(n_locations)]),
+        region=pd.Categorical(region_labels[pair_location[pairs] % n_regions]),
+    )
+
+
+def best_of(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--locations', type=int, default=1000)
+    parser.add_argument('--skus', type=int, default=50000)
+    parser.add_argument('--assortment', type=float, default=0.02, help='Share of SKUs each location stocks')
+    parser.add_argument('--days', type=int, default=14)
+    parser.add_argument('--sale-share', type=float, default=0.3, help='Share of days each pair sells on')
+    parser.add_argument('--regions', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = generate(args.locations, args.skus, args.assortment, args.days, args.sale_share, args.regions)
+    print(f"{args.locations:,} locations x {args.skus:,} SKUs, {len(df):,} rows")
+
+    rollup = LocationRollup(df)
+    build_time = best_of(lambda: LocationRollup(df), args.repeat)
+    summary = rollup.summary()
+    print(f"build: {build_time:.2f} s ({summary['location']['rows']:,} location rows, "
+          f"{summary['region']['rows']:,} region rows, {summary['network']['rows']:,} products)")
+    print(f"safety stock: unpooled {summary['network']['unpooled_safety_stock']:,.0f}, "
+          f"regions {summary['region']['safety_stock']:,.0f}, network {summary['network']['safety_stock']:,.0f}")
+
+    # Pooled region safety stock against pandas on the summed daily series
+    region = str(df['region'].cat.categories[0])
+    subset = df[df['region'] == region]
+    product = str(subset['product'].iloc[0])
+    rows = subset[subset['product'] == product]
+    daily = (rows.groupby('date')['sold_units'].sum()
+             .reindex(pd.date_range(rows['date'].min(), df['date'].max()), fill_value=0))
+    expected = round(1.65 * daily.std() * np.sqrt(7), 2)
+    actual = rollup.metrics('region', region=region, product=product)['safety_stock'].iloc[0]
+    assert abs(actual - expected) < 0.011, (actual, expected)
+
+    location = str(df['location'].iloc[0])
+    queries = [
+        ('one location', lambda: rollup.metrics('location', location=location)),
+        ('one region', lambda: rollup.metrics('region', region=region)),
+        ('one product, all locations', lambda: rollup.metrics('location', product=product)),
+        ('network', lambda: rollup.metrics('network')),
+    ]
+    print(f"{'query':>28} {'ms':>8}")
+    for name, query in queries:
+        print(f"{name:>28} {best_of(query, args.repeat) * 1e3:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Time per-product and date-range sales queries against the SQLite database.
+
+"csv scan" is what answering such a query from the loose upload files costs:
+reading the whole file and filtering it. "frame filter" is a boolean mask
+over the already parsed dataset, and "index" is SalesDatabase.product_history
+on the (product, date) index. The one-off cost of loading the sales table is
+reported too, along with a check that all three return the same rows.
+
+Usage:
+    python benchmarks/bench_sales_db.py [--skus 5000] [--days 365] [--queries 50]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from data_loader import load_sales  # noqa: E402
+from sales_db import SalesDatabase  # noqa: E402
+
+from synthetic import generate_sales, write_sales_csv  # noqa: E402
+
+
+def per_query(func, queries) -> float:
+    """Mean seconds per query"""
+    start = time.perf_counter()
+    for query in queries:
+        func(*query)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--skus', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--range-days', type=int, default=30, help='Length of each queried date range')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench_sales_db_') as workdir:
+        workdir = Path(workdir)
+        print(f"Generating {args.skus:,} SKUs x {args.days} days...")
+        csv_path = write_sales_csv(generate_sales(args.skus, args.days, seed=args.seed), workdir / 'sales.csv')
+        df = load_sales(str(csv_path))
+        db = SalesDatabase(workdir / 'inventory.db')
+
+        start = time.perf_counter()
+        db.replace_sales(df, 'bench')
+        load_time = time.perf_counter() - start
+
+        rng = np.random.default_rng(args.seed)
+        products = df['product'].cat.categories
+        first_day = df['date'].min()
+        queries = []
+        for _ in range(args.queries):
+            offset = int(rng.integers(0, max(args.days - args.range_days, 1)))
+            begin = first_day + pd.Timedelta(days=offset)
+            end = begin + pd.Timedelta(days=args.range_days - 1)
+            queries.append((str(products[rng.integers(len(products))]),
+                            begin.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')))
+
+        def csv_scan(product, begin, end):
+            rows = load_sales(str(csv_path))
+            return frame_filter(product, begin, end, rows)
+
+        def frame_filter(product, begin, end, rows=df):
+            mask = ((rows['product'] == product) & (rows['date'] >= pd.Timestamp(begin)) &
+                    (rows['date'] <= pd.Timestamp(end)))
+            return rows.loc[mask].sort_values('date', kind='stable')
+
+        # Same rows from every path
+        product, begin, end = queries[0]
+        expected = frame_filter(product, begin, end)
+        actual = db.product_history(product, begin, end)
+        np.testing.assert_array_equal(actual['date'].to_numpy(), expected['date'].to_numpy())
+        np.testing.assert_allclose(actual['sold_units'].to_numpy(), expected['sold_units'].to_numpy(dtype=float))
+
+        timings = [
+            ('csv scan', per_query(csv_scan, queries[:max(1, len(queries) // 10)])),
+            ('frame filter', per_query(frame_filter, queries)),
+            ('index', per_query(db.product_history, queries)),
+        ]
+
+        print(f"Loaded {len(df):,} rows into SQLite in {load_time:.2f} s "
+              f"({db.path.stat().st_size / 1e6:.1f} MB)")
+        print(f"{'path':>14} {'ms/query':>10}")
+        for name, seconds in timings:
+            print(f"{name:>14} {seconds * 1e3:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
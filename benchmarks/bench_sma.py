@@ -0,0 +1,73 @@
+"""
+Benchmark DemandEngine SMA forecasting against the groupby.apply implementation.
+
+The legacy path is timed on a subset of items and extrapolated, since running
+it on 100k items takes far too long.
+
+Usage:
+    python benchmarks/bench_sma.py [--items 100000] [--days 365] [--legacy-items 2000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from demand_engine import DemandEngine  # noqa: E402
+
+from synthetic import generate_sales  # noqa: E402
+
+
+def make_history(n_items: int, n_days: int, seed: int = 0) -> pd.DataFrame:
+    """Build an Item/Date/QuantitySold frame with one row per item per day"""
+    df = generate_sales(n_items, n_days, seed=seed)
+    return pd.DataFrame({'Item': df['product'].astype(str), 'Date': df['date'], 'QuantitySold': df['sold_units']})
+
+
+def legacy_sma(engine: DemandEngine) -> pd.DataFrame:
+    """The groupby.apply implementation calculate_sma_demand used before"""
+    return (
+        engine.df.groupby('Item')
+        .apply(lambda x: x.set_index('Date')['QuantitySold'].rolling(engine.window).mean().iloc[-1])
+        .reset_index(name='ForecastDemand')
+    )
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=100_000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--window', type=int, default=7)
+    parser.add_argument('--legacy-items', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"Generating {args.items:,} items x {args.days} days...")
+    engine = DemandEngine(make_history(args.items, args.days), window=args.window)
+    engine.df  # Materialize outside the timings
+
+    vectorized, sma = timed(engine.calculate_sma_demand)
+    rolling, _ = timed(engine.calculate_rolling_sma)
+
+    subset = DemandEngine(make_history(args.legacy_items, args.days), window=args.window)
+    legacy, expected = timed(lambda: legacy_sma(subset))
+    pd.testing.assert_frame_equal(subset.calculate_sma_demand(), expected, check_dtype=False)
+    legacy_estimate = legacy * args.items / args.legacy_items
+
+    print(f"{'path':>28} {'seconds':>10}")
+    print(f"{'legacy apply (extrapolated)':>28} {legacy_estimate:>10.2f}")
+    print(f"{'last-window SMA':>28} {vectorized:>10.3f}   ({legacy_estimate / vectorized:.0f}x)")
+    print(f"{'full rolling series':>28} {rolling:>10.3f}")
+    print(f"Forecasts for {len(sma):,} items")
+
+
+if __name__ == '__main__':
+    main()
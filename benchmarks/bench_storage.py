@@ -0,0 +1,77 @@
+"""
+Compare load time and memory of the CSV active dataset against the columnar store.
+
+Usage:
+    python benchmarks/bench_storage.py [--rows 10000000] [--skus 50000]
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from columnar_store import write_columnar  # noqa: E402
+from data_loader import load_sales  # noqa: E402
+
+from synthetic import generate_sales  # noqa: E402
+
+
+def make_history(n_rows: int, n_skus: int, seed: int = 0) -> pd.DataFrame:
+    """Build a normalized sales history of about n_rows rows: n_skus products, one row per day each"""
+    return generate_sales(n_skus, max(1, n_rows // n_skus), start='2020-01-01', seed=seed)
+
+
+def measure(func):
+    """Return (seconds, peak traced bytes, result) for one call of func"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def dir_size(path: Path) -> int:
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.iterdir())
+    return path.stat().st_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--skus', type=int, default=50_000)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='bench_storage_'))
+    try:
+        print(f"Generating {args.rows:,} rows over {args.skus:,} SKUs...")
+        df = make_history(args.rows, args.skus)
+        csv_path = workdir / 'active.csv'
+        store_path = workdir / 'active_dataset'
+        df.to_csv(csv_path, index=False)
+        write_columnar(df, store_path)
+        del df
+
+        print(f"{'format':>10} {'on disk (MB)':>13} {'load (s)':>10} {'peak alloc (MB)':>16} {'sum (s)':>9}")
+        for label, path in [('csv', csv_path), ('columnar', store_path)]:
+            elapsed, peak, loaded = measure(lambda: load_sales(str(path)))
+            # Touch a column so memory-mapped pages are actually read
+            start = time.perf_counter()
+            loaded['sold_units'].sum()
+            touch = time.perf_counter() - start
+            print(f"{label:>10} {dir_size(path) / 1e6:>13.1f} {elapsed:>10.3f} {peak / 1e6:>16.1f} {touch:>9.3f}")
+            del loaded
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
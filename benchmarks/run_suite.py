@@ -0,0 +1,224 @@
+"""
+Time every hot path on a synthetic dataset and write the results as JSON.
+
+Each case runs once under tracemalloc to record its peak allocation and then
+--repeat times untraced for timing. Flask routes are exercised through the
+test client against a temporary copy of the dataset. The app seeds its data
+directory when it is imported, so it is imported with INVENTORY_DATA_DIR
+pointing at a scratch directory, and the app's own data directory is not
+modified.
+
+Pass --compare with an earlier results file to print the change per case.
+
+Usage:
+    python benchmarks/run_suite.py [--skus 2000] [--days 365] [--repeat 3] [--output results.json]
+    python benchmarks/run_suite.py --output new.json --compare old.json
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+# Importing the app seeds its data directory, so give it a scratch one
+os.environ['INVENTORY_DATA_DIR'] = tempfile.mkdtemp(prefix='bench_suite_data_')
+atexit.register(shutil.rmtree, os.environ['INVENTORY_DATA_DIR'], ignore_errors=True)
+
+import app as webapp  # noqa: E402
+from columnar_store import write_columnar  # noqa: E402
+from data_loader import load_sales  # noqa: E402
+from demand_engine import DemandEngine  # noqa: E402
+from demand_matrix import DemandMatrix  # noqa: E402
+from plot_cache import PlotCache  # noqa: E402
+from rollup import LocationRollup  # noqa: E402
+from sales_db import SalesDatabase  # noqa: E402
+from snapshots import SnapshotStore  # noqa: E402
+
+from synthetic import generate_sales, write_sales_csv  # noqa: E402
+
+
+class Case:
+    """One benchmarked call; setup runs untimed before every repetition"""
+
+    def __init__(self, name: str, func, setup=None):
+        self.name = name
+        self.func = func
+        self.setup = setup
+
+    def run(self, repeat: int) -> dict:
+        if self.setup:
+            self.setup()
+        tracemalloc.start()
+        self.func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings = []
+        for _ in range(repeat):
+            if self.setup:
+                self.setup()
+            start = time.perf_counter()
+            self.func()
+            timings.append(time.perf_counter() - start)
+
+        return {
+            'name': self.name,
+            'seconds': min(timings),
+            'mean_seconds': statistics.fmean(timings),
+            'peak_bytes': int(peak),
+            'repeat': repeat,
+        }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def route(client, url: str):
+    """Return a callable that GETs url and fails loudly on an error status"""
+    def call():
+        response = client.get(url)
+        if response.status_code >= 400:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+        return response
+    return call
+
+
+def build_cases(workdir: Path, args) -> list:
+    df = generate_sales(args.skus, args.days, seasonality=args.seasonality, noise=args.noise, seed=args.seed)
+    csv_path = write_sales_csv(df, workdir / 'sales.csv')
+    store_path = workdir / 'active_dataset'
+    store = SnapshotStore(store_path)
+    with store.transaction() as snapshot:
+        write_columnar(load_sales(str(csv_path)), snapshot.path)
+
+    loaded = load_sales(str(store_path))
+    matrix = DemandMatrix.from_frame(loaded)
+    product = str(loaded['product'].cat.categories[0])
+    # Last 30 days of the history, for the date-range query
+    history_start = (loaded['date'].max() - pd.Timedelta(days=29)).strftime('%Y-%m-%d')
+    engine_input = loaded[['product', 'date', 'sold_units']].rename(
+        columns={'product': 'Item', 'date': 'Date', 'sold_units': 'QuantitySold'})
+
+    # Point the app at the synthetic store and keep its outputs in the work directory
+    webapp.DEFAULT_DATA = store_path
+    webapp.dataset_store = store
+    webapp.sales_db = SalesDatabase(workdir / 'inventory.db')
+    webapp.plot_cache = PlotCache(max_bytes=webapp.PLOT_CACHE_MAX_BYTES)
+    webapp.dataset_cache.invalidate()
+    client = webapp.app.test_client()
+
+    def cold_app():
+        webapp.dataset_cache.invalidate()
+        webapp.active_demand.update(version=None, matrix=None)
+        webapp.sales_db.clear_metrics()
+        webapp.plot_cache.clear()
+
+    def warm_app():
+        route(client, '/api/metrics')()
+        webapp.plot_cache.clear()
+
+    return [
+        Case('load_sales.csv', lambda: load_sales(str(csv_path))),
+        Case('load_sales.columnar', lambda: load_sales(str(store_path))),
+        Case('compute_metrics', lambda: webapp.compute_metrics(loaded)),
+        Case('generate_demand_plot', lambda: webapp.generate_demand_plot(loaded, product),
+             setup=webapp.plot_cache.clear),
+        Case('DemandMatrix.from_frame', lambda: DemandMatrix.from_frame(loaded)),
+        Case('render_demand_plot', lambda: webapp.render_demand_plot(matrix, product),
+             setup=webapp.plot_cache.clear),
+        Case('LocationRollup', lambda: LocationRollup(loaded)),
+        Case('DemandEngine.init', lambda: DemandEngine(engine_input)),
+        Case('DemandEngine.run.serial', lambda: DemandEngine(engine_input).run()),
+        Case('DemandEngine.run.thread', lambda: DemandEngine(engine_input).run(backend='thread')),
+        Case('DemandEngine.run.holt_winters', lambda: DemandEngine(engine_input).run(method='holt_winters')),
+        Case('route./dashboard.cold', route(client, '/dashboard'), setup=cold_app),
+        Case('route./dashboard', route(client, '/dashboard'), setup=warm_app),
+        Case('route./api/metrics.cold', route(client, '/api/metrics'), setup=cold_app),
+        Case('route./api/metrics', route(client, '/api/metrics'), setup=warm_app),
+        Case('route./api/plot', route(client, f'/api/plot/{product}'), setup=warm_app),
+        Case('route./api/sweep', route(client, '/api/sweep'), setup=warm_app),
+        Case('route./api/history', route(client, f'/api/history/{product}?start={history_start}'),
+             setup=webapp.active_sales_db),
+    ]
+
+
+def compare(results: list, baseline_path: Path):
+    baseline = {case['name']: case for case in json.loads(baseline_path.read_text())['results']}
+    print(f"\nCompared with {baseline_path}:")
+    print(f"{'case':>28} {'time':>8} {'peak':>8}")
+    for case in results:
+        old = baseline.get(case['name'])
+        if old is None:
+            print(f"{case['name']:>28} {'new':>8} {'new':>8}")
+            continue
+        time_ratio = case['seconds'] / old['seconds'] if old['seconds'] else np.nan
+        peak_ratio = case['peak_bytes'] / old['peak_bytes'] if old['peak_bytes'] else np.nan
+        print(f"{case['name']:>28} {time_ratio:>7.2f}x {peak_ratio:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--skus', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seasonality', type=float, default=0.3)
+    parser.add_argument('--noise', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', help='Run only cases whose name contains this text')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='bench_suite_'))
+    try:
+        print(f"Generating {args.skus:,} SKUs x {args.days} days...")
+        cases = build_cases(workdir, args)
+        if args.only:
+            cases = [case for case in cases if args.only in case.name]
+
+        results = []
+        print(f"{'case':>28} {'seconds':>10} {'peak alloc (MB)':>16}")
+        for case in cases:
+            result = case.run(args.repeat)
+            results.append(result)
+            print(f"{case.name:>28} {result['seconds']:>10.4f} {result['peak_bytes'] / 1e6:>16.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'params': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'results': results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        compare(results, Path(args.compare))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Stress the snapshot store with concurrent reader and writer processes.
+
+Writers alternately replace the dataset and append to it while readers load
+it as fast as they can. Every dataset written is a synthetic history with one
+row per (product, day), appends adding whole days, so a reader can check that
+what it loaded is a whole snapshot: no missing products, every product with
+the same number of rows and no missing units. Any torn or partial read is reported as an error.
+
+Usage:
+    python benchmarks/stress_snapshots.py [--readers 4] [--writers 2] [--seconds 10]
+"""
+import argparse
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from columnar_store import write_columnar  # noqa: E402
+from data_loader import load_sales  # noqa: E402
+from schema import to_canonical  # noqa: E402
+from snapshots import SnapshotStore  # noqa: E402
+
+from synthetic import generate_sales  # noqa: E402
+
+
+def make_rows(skus: int, days: int, start, seed: int = 0) -> pd.DataFrame:
+    return to_canonical(generate_sales(skus, days, start=start, seed=seed))
+
+
+def writer(root: str, skus: int, days: int, deadline: float, worker: int, results):
+    # Short grace period so garbage collection runs during the test too
+    store = SnapshotStore(root, grace_seconds=1)
+    writes = errors = 0
+    appended_days = 0
+    rng = np.random.default_rng(worker)
+    while time.time() < deadline:
+        try:
+            if rng.random() < 0.5:
+                with store.transaction() as snapshot:
+                    write_columnar(make_rows(skus, days, '2024-01-01'), snapshot.path)
+            else:
+                appended_days += 1
+                delta = make_rows(skus, 1, pd.Timestamp('2030-01-01') + pd.Timedelta(days=appended_days),
+                                  seed=appended_days)
+                with store.transaction(append=True) as snapshot:
+                    write_columnar(delta, snapshot.path, append=True)
+            writes += 1
+        except Exception as exc:
+            errors += 1
+            print(f"writer {worker}: {exc!r}")
+    results.put(('writer', writes, errors, 0.0))
+
+
+def reader(root: str, skus: int, deadline: float, worker: int, results):
+    reads = errors = 0
+    slowest = 0.0
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            df = load_sales(root)
+            # Writers may append the same day, but always for every product
+            per_product = df.groupby('product', observed=True).size()
+            if (len(per_product) != skus or per_product.nunique() != 1 or df['product'].isna().any()
+                    or df['sold_units'].isna().any()):
+                raise ValueError(f"inconsistent snapshot: rows={len(df)} products={len(per_product)} "
+                                 f"rows per product={sorted(per_product.unique())}")
+            reads += 1
+        except Exception as exc:
+            errors += 1
+            print(f"reader {worker}: {exc!r}")
+        slowest = max(slowest, time.perf_counter() - start)
+    results.put(('reader', reads, errors, slowest))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--skus', type=int, default=500)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix='stress_snapshots_'))
+    try:
+        with SnapshotStore(root).transaction() as snapshot:
+            write_columnar(make_rows(args.skus, args.days, '2024-01-01'), snapshot.path)
+
+        results = multiprocessing.Queue()
+        deadline = time.time() + args.seconds
+        processes = [multiprocessing.Process(target=writer, args=(str(root), args.skus, args.days, deadline, i, results))
+                     for i in range(args.writers)]
+        processes += [multiprocessing.Process(target=reader, args=(str(root), args.skus, deadline, i, results))
+                      for i in range(args.readers)]
+        for process in processes:
+            process.start()
+        totals = {'reader': [0, 0, 0.0], 'writer': [0, 0, 0.0]}
+        for _ in processes:
+            role, count, errors, slowest = results.get()
+            totals[role][0] += count
+            totals[role][1] += errors
+            totals[role][2] = max(totals[role][2], slowest)
+        for process in processes:
+            process.join()
+
+        reads, read_errors, slowest = totals['reader']
+        writes, write_errors, _ = totals['writer']
+        print(f"reads:  {reads:>8,} ({reads / args.seconds:,.0f}/s), {read_errors} errors, "
+              f"slowest {slowest * 1000:.1f} ms")
+        print(f"writes: {writes:>8,} ({writes / args.seconds:,.0f}/s), {write_errors} errors")
+        print(f"snapshots left on disk: {len(SnapshotStore(root).snapshot_ids())}")
+        if read_errors or write_errors:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
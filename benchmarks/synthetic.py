@@ -0,0 +1,88 @@
+"""
+Synthetic sales histories for benchmarks.
+
+Demand per SKU is a base level times weekly and yearly seasonal factors,
+plus a linear trend and Gaussian noise, rounded to non-negative integer
+units. Stock on hand is drawn down by sales and restocked when it runs low,
+so generated files look like real uploads rather than uniform noise.
+
+Usage:
+    python benchmarks/synthetic.py out.csv [--skus 1000] [--days 365] [--seasonality 0.3] [--noise 0.2]
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Column headers written to generated files; load_sales detects and renames them
+SOURCE_COLUMNS = {'date': 'Date', 'product': 'Product', 'sold_units': 'Sold_Units', 'current_stock': 'Current_Stock'}
+
+
+def generate_sales(n_skus: int = 1000, n_days: int = 365, start: str = '2023-01-01',
+                   seasonality: float = 0.3, noise: float = 0.2, trend: float = 0.0,
+                   mean_demand: float = 10.0, seed: int = 0) -> pd.DataFrame:
+    """
+    Build a normalized date/product/sold_units/current_stock frame with one
+    row per SKU per day, ordered by SKU then date.
+
+    seasonality is the relative amplitude of the weekly and yearly cycles,
+    noise the relative standard deviation of daily demand and trend the
+    relative change in demand per year.
+    """
+    rng = np.random.default_rng(seed)
+    days = np.arange(n_days)
+
+    # Every SKU gets its own level and phase so seasonal peaks do not all line up
+    base = rng.lognormal(np.log(mean_demand), 0.75, n_skus)[:, None]
+    weekly_phase = rng.uniform(0, 2 * np.pi, n_skus)[:, None]
+    yearly_phase = rng.uniform(0, 2 * np.pi, n_skus)[:, None]
+    season = (1
+              + seasonality * np.sin(2 * np.pi * days / 7 + weekly_phase)
+              + seasonality * np.sin(2 * np.pi * days / 365.25 + yearly_phase))
+    level = base * np.clip(season, 0, None) * (1 + trend * days / 365.25)
+    sold = np.rint(np.clip(level + rng.normal(0, 1, level.shape) * noise * level, 0, None)).astype(np.int64)
+
+    # Stock covers ~3 weeks of demand and is refilled whenever it would run out
+    capacity = np.ceil(base[:, 0] * 21).astype(np.int64)
+    stock = np.empty_like(sold)
+    on_hand = capacity.copy()
+    for day in days:
+        on_hand = np.where(on_hand < sold[:, day], capacity, on_hand) - sold[:, day]
+        stock[:, day] = on_hand
+
+    names = [f"SKU-{i:06d}" for i in range(n_skus)]
+    return pd.DataFrame({
+        'date': np.tile(pd.date_range(start, periods=n_days).to_numpy(), n_skus),
+        'product': pd.Categorical.from_codes(np.repeat(np.arange(n_skus), n_days), categories=names),
+        'sold_units': sold.ravel(),
+        'current_stock': stock.ravel(),
+    })
+
+
+def write_sales_csv(df: pd.DataFrame, path) -> Path:
+    """Write a generated frame with upload-style headers"""
+    path = Path(path)
+    df.rename(columns=SOURCE_COLUMNS).to_csv(path, index=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output')
+    parser.add_argument('--skus', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--start', default='2023-01-01')
+    parser.add_argument('--seasonality', type=float, default=0.3)
+    parser.add_argument('--noise', type=float, default=0.2)
+    parser.add_argument('--trend', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    df = generate_sales(args.skus, args.days, args.start, args.seasonality, args.noise, args.trend, seed=args.seed)
+    write_sales_csv(df, args.output)
+    print(f"Wrote {len(df):,} rows for {args.skus:,} SKUs to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
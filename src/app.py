@@ -1,16 +1,34 @@
 import os
-import json
-from datetime import datetime, timedelta
+import uuid
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
 from pathlib import Path
 from flask import (
-    Flask, render_template, request, send_file, 
-    redirect, url_for, send_from_directory, flash, jsonify
+    Flask, render_template, request,
+    redirect, url_for, flash, jsonify, Response, g, stream_with_context
 )
 import pandas as pd
 import numpy as np
-from data_loader import load_sales
+from data_loader import load_sales, ingest_sales
+from column_detection import SchemaMemo
 from demand_engine import DemandEngine
-import io
+from metrics_engine import compute_inventory_metrics, compute_metrics_from_matrix
+from demand_matrix import DemandMatrix, OutOfOrderStock
+from dataset_cache import DatasetCache
+from plot_cache import PlotCache, plot_cache_key
+from columnar_store import can_append, is_columnar_store, write_columnar
+from snapshots import SnapshotStore, is_snapshot_store
+from sales_db import SalesDatabase
+from jobs import JobQueue
+from schema import ensure_canonical
+from perf import PerfRegistry, profile_call, PROFILERS
+from metrics_table import MetricsTable, FILTER_COLUMNS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, records
+from rollup import LocationRollup, LEVELS
+from export import EXPORT_FORMATS, iter_export
+from series import build_series, series_to_json, series_to_binary, BINARY_MIMETYPE
+import time
 import base64
 import matplotlib
 matplotlib.use('Agg')
@@ -25,7 +43,8 @@ app.secret_key = 'your_secret_key_here'  # Change this in production
 
 # Configure paths
 BASE_DIR = Path(__file__).resolve().parent.parent
-DATA_DIR = BASE_DIR / 'data'
+# INVENTORY_DATA_DIR moves the dataset, database and uploads elsewhere, e.g. for benchmarks
+DATA_DIR = Path(os.environ.get('INVENTORY_DATA_DIR') or BASE_DIR / 'data')
 OUTPUT_DIR = BASE_DIR / 'output'
 TEMPLATE_DIR = BASE_DIR / 'templates'
 UPLOAD_FOLDER = DATA_DIR / 'uploads'
@@ -34,8 +53,41 @@ UPLOAD_FOLDER = DATA_DIR / 'uploads'
 for directory in [DATA_DIR, OUTPUT_DIR, UPLOAD_FOLDER]:
     directory.mkdir(exist_ok=True, parents=True)
 
-DEFAULT_DATA = UPLOAD_FOLDER / 'sample_data.csv'
-OUTPUT_FILE = OUTPUT_DIR / 'restock_recommendations.csv'
+# The active dataset is a series of immutable columnar snapshots behind an atomic
+# pointer; CSV is only used for import/export
+DEFAULT_DATA = DATA_DIR / 'active_dataset'
+SAMPLE_FILE = UPLOAD_FOLDER / 'sample_data.csv'
+
+# Column mappings of upload headers seen before, so repeat uploads skip detection
+SCHEMA_MEMO_FILE = DATA_DIR / 'schema_memo.json'
+
+# Indexed sales rows, materialized metrics and upload history
+DATABASE_FILE = DATA_DIR / 'inventory.db'
+
+# Seconds browsers may reuse a plot image before revalidating its ETag
+PLOT_MAX_AGE = 300
+
+# Points the dashboard asks /api/series for; longer histories are downsampled with LTTB
+CHART_SERIES_POINTS = 800
+
+# Rendered plot cache budget; evicted plots spill to disk under output/
+PLOT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+PLOT_CACHE_DIR = OUTPUT_DIR / 'plot_cache'
+
+# Upper bound on lead time x z-value scenarios per /api/sweep request
+MAX_SWEEP_SCENARIOS = 10000
+
+# Products plotted by the dashboard's summary charts; the table pages through the rest
+CHART_MAX_PRODUCTS = 50
+
+# Background threads processing uploads
+UPLOAD_WORKERS = 2
+
+# File types load_sales reads: CSV, or Excel through read_excel
+UPLOAD_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+# Set INVENTORY_PROFILING=1 to allow ?profile=cprofile|pyinstrument on any route
+PROFILING_ENABLED = os.environ.get('INVENTORY_PROFILING') == '1'
 
 # Sample data for demo purposes
 SAMPLE_DATA = """Date,Product,Sold_Units,Current_Stock
@@ -52,148 +104,277 @@ SAMPLE_DATA = """Date,Product,Sold_Units,Current_Stock
 """
 
 # Create sample data if it doesn't exist
-if not os.path.exists(DEFAULT_DATA):
-    with open(DEFAULT_DATA, 'w') as f:
+if not os.path.exists(SAMPLE_FILE):
+    with open(SAMPLE_FILE, 'w') as f:
         f.write(SAMPLE_DATA)
 
+# Snapshots of the active dataset; writers are serialized, readers never wait
+dataset_store = SnapshotStore(DEFAULT_DATA)
+
+# Seed the store on first run, from a single-version store left by older
+# releases if there is one, otherwise from the sample data
+if not is_snapshot_store(DEFAULT_DATA):
+    seed_path = DEFAULT_DATA if is_columnar_store(DEFAULT_DATA) else SAMPLE_FILE
+    seed = load_sales(str(seed_path))
+    if is_columnar_store(DEFAULT_DATA):
+        seed = seed.copy()  # Detach from the memory-mapped files before they are removed
+    with dataset_store.transaction() as snapshot:
+        write_columnar(seed, snapshot.path)
+    for legacy_file in list(DEFAULT_DATA.glob('*.bin')) + [DEFAULT_DATA / 'manifest.json']:
+        legacy_file.unlink(missing_ok=True)
+
+# Timing histograms for the hot paths, served by /api/perf
+perf_stats = PerfRegistry()
+
+# Uploads made before the database existed still count for deduplication
+sales_db = SalesDatabase(DATABASE_FILE)
+sales_db.register_files(path for path in UPLOAD_FOLDER.iterdir() if path.name.startswith('upload_'))
+
+# Parsed copy of the active dataset, shared across requests
+dataset_cache = DatasetCache(perf_stats.timed('load_sales')(load_sales))
+
+# Rendered PNGs keyed on each product's data slice, so only changed products re-render
+plot_cache = PlotCache(max_bytes=PLOT_CACHE_MAX_BYTES, spill_dir=PLOT_CACHE_DIR)
+
+# Daily demand matrix of one version of the active dataset; append uploads
+# extend it with their delta instead of rebuilding it from the whole history
+active_demand = {'version': None, 'matrix': None}
+active_demand_lock = threading.Lock()
+
+# Uploads are processed off the request thread; dataset_store keeps their writes
+# in order when several jobs finish together
+upload_jobs = JobQueue(max_workers=UPLOAD_WORKERS)
+
+schema_memo = SchemaMemo(SCHEMA_MEMO_FILE)
+
 # Helper functions
+def active_metrics_table():
+    """Return the queryable metrics table for the active dataset, built once per version"""
+    return dataset_cache.derive(DEFAULT_DATA, 'metrics_table',
+                                lambda df, version: MetricsTable(compute_active_metrics(df, version)),
+                                versioned=True)
+
+def active_demand_matrix(df=None, version=None):
+    """
+    Return the daily demand matrix of the active dataset, rebuilding it if the
+    dataset changed. df and version, if given, are the dataset already loaded
+    and the version it was loaded at; the matrix is cached under that version.
+    """
+    if df is None:
+        with active_demand_lock:
+            if active_demand['version'] == dataset_cache.version(DEFAULT_DATA):
+                return active_demand['matrix']
+        df, version = dataset_cache.get_versioned(DEFAULT_DATA)
+    
+    with active_demand_lock:
+        if active_demand['version'] == version:
+            return active_demand['matrix']
+    matrix = DemandMatrix.from_frame(df)
+    cache_demand_matrix(version, matrix)
+    return matrix
+
+def snapshot_demand_matrix(snapshot):
+    """
+    Build the demand matrix of a snapshot being written, so data it cannot
+    hold is rejected before the snapshot is published
+    """
+    return DemandMatrix.from_frame(load_sales(str(snapshot.path)))
+
+def cache_demand_matrix(version, matrix):
+    """Make matrix the active demand matrix, as that of dataset version"""
+    with active_demand_lock:
+        active_demand.update(version=version, matrix=matrix)
+
+def active_rollup():
+    """Return the location -> region -> network rollup of the active dataset, built once per version"""
+    return dataset_cache.derive(DEFAULT_DATA, 'rollup', LocationRollup)
+
+def index_sales(version):
+    """Make the sales table of the database hold dataset version, loading that snapshot if it does not"""
+    return sales_db.sync_sales(version, lambda: load_sales(str(dataset_store.path_for(version))))
+
+def active_sales_db():
+    """Return the sales database with its sales table synced to the active dataset"""
+    index_sales(dataset_cache.version(DEFAULT_DATA))
+    return sales_db
+
+def append_upload(filepath):
+    """
+    Append an uploaded delta to the active dataset and carry its demand matrix
+    and sales table forward. Returns the number of rows and the new snapshot id.
+    """
+    delta = load_sales(str(filepath), memo=schema_memo)
+    if len(delta) == 0:
+        return 0, None
+    
+    # A delta with columns or dtypes the base snapshot's files cannot hold
+    # (e.g. the first one with a location column) is merged with it instead
+    append = can_append(dataset_store.current_path(), delta)
+    with dataset_store.transaction(append=append) as snapshot:
+        if append:
+            write_columnar(delta, snapshot.path, append=True)
+        else:
+            base_df = load_sales(str(dataset_store.path_for(snapshot.base_id)))
+            write_columnar(pd.concat([base_df, delta], ignore_index=True), snapshot.path)
+        # Snapshot ids are the dataset versions, so the matrix of exactly the
+        # base snapshot can be carried forward. extend() returns a new matrix,
+        # so requests holding the old one are unaffected, and raises before
+        # anything is published if the delta's dates cannot be held.
+        with active_demand_lock:
+            base = active_demand['matrix'] if active_demand['version'] == snapshot.base_id else None
+        try:
+            matrix = base.extend(delta) if base is not None else snapshot_demand_matrix(snapshot)
+        except OutOfOrderStock:
+            # A location reported stock for a day before its last report
+            matrix = snapshot_demand_matrix(snapshot)
+    cache_demand_matrix(snapshot.id, matrix)
+    
+    # Likewise only the delta is inserted if the sales table holds the base
+    try:
+        sales_db.append_sales(delta, snapshot.id, snapshot.base_id)
+    except sqlite3.Error as e:
+        print(f"Warning: could not index appended rows, they will be indexed on the next query: {e}")
+    
+    return len(delta), snapshot.id
+
+def ingest_upload(filepath, append=False, progress=None):
+    """Load an uploaded file into the active dataset and return the number of rows and the snapshot id"""
+    if append and dataset_store.current_id() is not None:
+        return append_upload(filepath)
+    
+    if str(filepath).lower().endswith('.csv'):
+        # CSVs are streamed in chunks straight into a new snapshot
+        with dataset_store.transaction() as snapshot:
+            _, report = ingest_sales(str(filepath), store_dir=snapshot.path, progress=progress,
+                                     memo=schema_memo)
+            matrix = snapshot_demand_matrix(snapshot)
+        cache_demand_matrix(snapshot.id, matrix)
+        return report.rows, snapshot.id
+    
+    # Excel files cannot be streamed, so they are loaded whole
+    df = load_sales(str(filepath), memo=schema_memo)
+    if len(df) == 0:
+        return 0, None
+    with dataset_store.transaction() as snapshot:
+        write_columnar(df, snapshot.path)
+        matrix = DemandMatrix.from_frame(df)
+    cache_demand_matrix(snapshot.id, matrix)
+    return len(df), snapshot.id
+
+def describe_upload_error(error_msg):
+    """Turn a loader error into a message for the person who uploaded the file"""
+    if 'Could not find required columns' in error_msg:
+        return f'File format issue: {error_msg}'
+    if 'Could not parse date column' in error_msg:
+        return 'Date format issue: Please ensure your date column is in a standard format (e.g., YYYY-MM-DD).'
+    return f'Error processing file: {error_msg}'
+
+def process_upload(filepath, append=False, upload_id=None, progress=None):
+    """Background job: ingest a saved upload, swap it in as the active dataset and record the outcome"""
+    # Appending content that is already in the dataset would count its sales twice
+    duplicate_of = sales_db.applied_upload(upload_id) if append and upload_id is not None else None
+    if duplicate_of is not None:
+        sales_db.finish_upload(upload_id, rows=0, snapshot_id=dataset_store.current_id())
+        progress(stage='done', rows=0)
+        return {'rows': 0, 'append': append, 'upload_id': upload_id, 'duplicate_of': duplicate_of}
+    
+    progress(stage='ingesting')
+    try:
+        try:
+            row_count, snapshot_id = ingest_upload(filepath, append=append, progress=progress)
+        except ValueError as ve:
+            raise ValueError(describe_upload_error(str(ve)))
+        
+        # Check if we have any data
+        if row_count == 0:
+            raise ValueError('The uploaded file appears to be empty or contains no valid data.')
+    except Exception as e:
+        sales_db.finish_upload(upload_id, error=str(e))
+        raise
+    sales_db.finish_upload(upload_id, rows=row_count, snapshot_id=snapshot_id)
+    
+    # Index the new rows now rather than on the first query that needs them
+    progress(stage='indexing', rows=row_count)
+    try:
+        index_sales(snapshot_id)
+    except sqlite3.Error as e:
+        print(f"Warning: could not index upload {upload_id}, it will be indexed on the next query: {e}")
+    
+    progress(stage='done', rows=row_count)
+    return {'rows': row_count, 'append': append, 'upload_id': upload_id}
+
+def queue_upload(file, append=False):
+    """
+    Save an uploaded file, filed by its content hash, and queue it for
+    background processing. Raises ValueError for file types that cannot be
+    loaded, before anything is saved.
+    """
+    file_ext = os.path.splitext(file.filename)[1].lower()
+    if file_ext not in UPLOAD_EXTENSIONS:
+        kind = f"'{file_ext}'" if file_ext else 'without an extension'
+        raise ValueError(f"Unsupported file format {kind}. "
+                         f"Please upload a CSV or Excel file ({', '.join(UPLOAD_EXTENSIONS)}).")
+    # Received under a name unique across threads and workers, then moved
+    # into place; content seen before is not stored a second time
+    incoming = UPLOAD_FOLDER / f".incoming_{uuid.uuid4().hex}{file_ext}"
+    file.save(incoming)
+    upload_id, filepath, _ = sales_db.store_upload(incoming, UPLOAD_FOLDER, file.filename,
+                                                   'append' if append else 'replace')
+    return upload_jobs.submit(f'upload {file.filename}', process_upload, filepath, append=append,
+                              upload_id=upload_id)
+
+@perf_stats.timed('compute_metrics')
 def compute_metrics(df):
     """Compute inventory metrics for the dashboard"""
-    # Make a copy to avoid modifying the original dataframe
-    df = df.copy()
-    
-    # Standardize column names (in case load_sales didn't do it)
-    df.columns = df.columns.str.lower().str.strip()
-    
-    # Map common column name variations to standard names
-    column_map = {
-        'date': 'date',
-        'order date': 'date',
-        'product': 'product',
-        'item': 'product',
-        'sku': 'product',
-        'sold_units': 'sold_units',
-        'quantity': 'sold_units',
-        'qty': 'sold_units',
-        'current_stock': 'current_stock',
-        'stock': 'current_stock',
-        'inventory': 'current_stock'
-    }
+    # Canonical frames from load_sales are used as-is; anything else is mapped once
+    df = ensure_canonical(df)
     
-    # Apply column name mapping
-    df = df.rename(columns={col: new_col for col, new_col in column_map.items() 
-                          if col in df.columns and new_col not in df.columns})
-    
-    # Ensure required columns exist
-    missing_columns = []
-    if 'product' not in df.columns:
-        missing_columns.append('product (or item, sku)')
-    if 'sold_units' not in df.columns:
-        missing_columns.append('sold_units (or quantity, qty)')
-    if missing_columns:
-        raise ValueError(f"Could not find required columns: {', '.join(missing_columns)}. "
-                        f"Available columns: {', '.join(df.columns)}")
-    
-    # Ensure we have a date column, if not create a dummy one
-    if 'date' not in df.columns:
-        df['date'] = pd.to_datetime('today')
-    
-    # Ensure we have a current_stock column, if not set to 0
-    if 'current_stock' not in df.columns:
-        df['current_stock'] = 0
-    
-    # Group by product and calculate metrics
-    metrics = []
-    for product, group in df.groupby('product'):
-        try:
-            # Basic metrics
-            avg_demand = group['sold_units'].mean()
-            std_demand = group['sold_units'].std() if len(group) > 1 else 0
-            current_stock = group['current_stock'].iloc[0] if 'current_stock' in group.columns else 0
-            
-            # Calculate safety stock (1.65 z-score for 95% service level)
-            lead_time_days = 7  # Default lead time
-            safety_stock = 1.65 * std_demand * np.sqrt(lead_time_days) if not np.isnan(std_demand) else 0
-            
-            # Calculate reorder point
-            reorder_point = (avg_demand * lead_time_days) + safety_stock
-            
-            # Determine if reorder is needed
-            needs_reorder = current_stock <= reorder_point
-            
-            # Calculate inventory turnover (annual)
-            days_of_inventory = current_stock / avg_demand if avg_demand > 0 else 0
-            inventory_turnover = 365 / days_of_inventory if days_of_inventory > 0 else 0
-            
-            # Check for potential stockout
-            days_until_stockout = current_stock / avg_demand if avg_demand > 0 else float('inf')
-            potential_stockout = days_until_stockout < lead_time_days * 1.5  # 1.5x lead time as buffer
-            
-            metrics.append({
-                'product': str(product),  # Ensure product is string
-                'current_stock': int(current_stock),
-                'avg_demand': round(avg_demand, 2),
-                'safety_stock': round(safety_stock, 2),
-                'reorder_point': round(reorder_point, 2),
-                'inventory_turnover': round(inventory_turnover, 2),
-                'needs_reorder': needs_reorder,
-                'potential_stockout': potential_stockout,
-                'days_until_stockout': round(days_until_stockout, 1) if not np.isinf(days_until_stockout) else float('inf')
-            })
-        except Exception as e:
-            print(f"Error processing product {product}: {str(e)}")
-            continue
+    # Group by product and calculate metrics in one columnar pass
+    metrics = compute_inventory_metrics(df)
     
-    if not metrics:
+    if metrics.empty:
         raise ValueError("No valid products found in the data. Please check your file format.")
     
-    return pd.DataFrame(metrics)
+    return metrics
 
-def generate_demand_plot(df, product):
-    """Generate a demand plot for a specific product"""
+@perf_stats.timed('compute_active_metrics')
+def compute_active_metrics(df, version):
+    """
+    Compute metrics for version of the active dataset, df, from its demand
+    matrix, or read them back from the database if this version was
+    materialized before. With a location column the matrix sums demand and
+    stock over the locations, so these are the network level of its rollup.
+    """
+    metrics = sales_db.load_metrics(version)
+    if metrics is None:
+        metrics = compute_metrics_from_matrix(active_demand_matrix(df, version))
+        sales_db.save_metrics(metrics, version)
+    
+    if metrics.empty:
+        raise ValueError("No valid products found in the data. Please check your file format.")
+    
+    return metrics
+
+@perf_stats.timed('render_demand_plot')
+def render_demand_plot(matrix, product, figsize=(10, 6), dpi=100):
+    """
+    Render the daily demand plot for a specific product, read straight out of
+    a DemandMatrix, and return the PNG bytes.
+    """
+    product_data = matrix.series(product)
+    
+    if product_data.empty:
+        raise LookupError(f"No data found for product: {product}")
+    
+    # Reuse a previous render if neither the product's rows nor the parameters changed
+    plotted_columns = [col for col in ('date', 'sold_units', 'current_stock') if col in product_data.columns]
+    cache_key = plot_cache_key(product, product_data[plotted_columns], figsize=figsize, dpi=dpi)
+    png = plot_cache.get(cache_key)
+    if png is not None:
+        return png
+    
+    fig = plt.figure(figsize=figsize)
     try:
-        plt.figure(figsize=(10, 6))
-        
-        # Standardize column names
-        df = df.copy()
-        df.columns = df.columns.str.lower().str.strip()
-        
-        # Map common column name variations
-        column_map = {
-            'date': 'date',
-            'order date': 'date',
-            'product': 'product',
-            'item': 'product',
-            'sku': 'product',
-            'sold_units': 'sold_units',
-            'quantity': 'sold_units',
-            'qty': 'sold_units',
-            'current_stock': 'current_stock',
-            'stock': 'current_stock',
-            'inventory': 'current_stock'
-        }
-        
-        # Apply column name mapping
-        df = df.rename(columns={col: new_col for col, new_col in column_map.items() 
-                              if col in df.columns and new_col not in df.columns})
-        
-        # Ensure required columns exist
-        if 'product' not in df.columns or 'sold_units' not in df.columns:
-            raise ValueError("Missing required columns for plotting")
-            
-        # Ensure we have a date column, if not create a dummy one
-        if 'date' not in df.columns:
-            df['date'] = pd.to_datetime('today')
-        
-        # Filter data for the specific product
-        product_data = df[df['product'].astype(str).str.lower() == str(product).lower()].copy()
-        
-        if product_data.empty:
-            raise ValueError(f"No data found for product: {product}")
-        
-        # Sort by date to ensure proper line plotting
-        product_data = product_data.sort_values('date')
-        
         # Create the plot
         plt.plot(product_data['date'], product_data['sold_units'], marker='o', label='Daily Sales')
         
@@ -202,8 +383,9 @@ def generate_demand_plot(df, product):
         plt.axhline(y=avg_sales, color='r', linestyle='--', label=f'Avg: {avg_sales:.1f} units/day')
         
         # Add current stock if available
-        if 'current_stock' in product_data.columns:
-            current_stock = product_data['current_stock'].iloc[0]
+        row = matrix.code(product)
+        if 'current_stock' in product_data.columns and not np.isnan(matrix.current_stock[row]):
+            current_stock = int(matrix.current_stock[row])
             plt.axhline(y=current_stock, color='g', linestyle=':', 
                        label=f'Current Stock: {current_stock}')
         
@@ -218,12 +400,33 @@ def generate_demand_plot(df, product):
         
         # Save plot to a bytes buffer
         buf = BytesIO()
-        plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-        plt.close()
-        buf.seek(0)
-        
+        plt.savefig(buf, format='png', dpi=dpi, bbox_inches='tight')
+        png = buf.getvalue()
+    finally:
+        plt.close(fig)
+    
+    plot_cache.put(cache_key, png)
+    return png
+
+def filter_product_rows(df, product):
+    """Return one product's rows sorted by date by scanning an arbitrary sales frame"""
+    df = ensure_canonical(df)
+    
+    # Filter data for the specific product; only the categories need comparing
+    categories = df['product'].cat.categories
+    matches = categories[categories.astype(str).str.lower() == str(product).lower()]
+    product_data = df[df['product'].isin(matches)]
+    
+    # Sort by date to ensure proper line plotting
+    return product_data.sort_values('date')
+
+@perf_stats.timed('generate_demand_plot')
+def generate_demand_plot(df, product):
+    """Generate a demand plot for a specific product of an arbitrary sales frame as a base64 data URI"""
+    try:
+        matrix = DemandMatrix.from_frame(filter_product_rows(df, product))
         # Convert to base64 for embedding in HTML
-        plot_data = base64.b64encode(buf.read()).decode('utf-8')
+        plot_data = base64.b64encode(render_demand_plot(matrix, product)).decode('utf-8')
         return f"data:image/png;base64,{plot_data}"
         
     except Exception as e:
@@ -231,6 +434,39 @@ def generate_demand_plot(df, product):
         # Return a transparent 1x1 pixel as fallback
         return "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
 
+# Request instrumentation
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.before_request
+def profile_request():
+    """Run the view under a profiler and return the report instead of its response"""
+    profiler = request.args.get('profile')
+    if not profiler or not PROFILING_ENABLED or request.endpoint not in app.view_functions:
+        return None
+    if profiler in ('1', 'true'):
+        profiler = 'cprofile'
+    if profiler not in PROFILERS:
+        return jsonify({'error': f"profile must be one of {', '.join(PROFILERS)}"}), 400
+    
+    # Profiled timings are inflated, so keep them out of the histograms
+    g.pop('request_start', None)
+    view = app.view_functions[request.endpoint]
+    try:
+        report, mimetype = profile_call(lambda: view(**(request.view_args or {})), profiler,
+                                        sort=request.args.get('sort', 'cumulative'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return Response(report, mimetype=mimetype)
+
+@app.after_request
+def record_request_time(response):
+    start = g.pop('request_start', None)
+    if start is not None and request.endpoint:
+        perf_stats.observe(f'request.{request.endpoint}', time.perf_counter() - start)
+    return response
+
 # Routes
 @app.route('/', methods=['GET', 'POST'])
 def index():
@@ -247,43 +483,16 @@ def index():
             return redirect(request.url)
         
         # Check file extension
-        if not (file.filename.lower().endswith('.csv') or file.filename.lower().endswith(('.xls', '.xlsx'))):
+        if not file.filename.lower().endswith(UPLOAD_EXTENSIONS):
             flash('Unsupported file format. Please upload a CSV or Excel file.', 'error')
             return redirect(request.url)
         
         try:
-            # Save the uploaded file
-            file_ext = os.path.splitext(file.filename)[1].lower()
-            filename = f"upload_{int(datetime.now().timestamp())}{file_ext}"
-            filepath = UPLOAD_FOLDER / filename
-            file.save(filepath)
+            # Save the file and process it in the background
+            job = queue_upload(file, append=request.form.get('mode') == 'append')
+            flash('File uploaded. Processing it in the background; the dashboard will refresh when it is ready.', 'success')
+            return redirect(url_for('dashboard', job=job.id))
             
-            # Process the file
-            try:
-                df = load_sales(str(filepath))
-                
-                # Check if we have any data
-                if len(df) == 0:
-                    flash('The uploaded file appears to be empty or contains no valid data.', 'error')
-                    return redirect(url_for('index'))
-                
-                # Save a copy as the active dataset
-                df.to_csv(DEFAULT_DATA, index=False)
-                
-                flash('File successfully uploaded and processed', 'success')
-                return redirect(url_for('dashboard'))
-                
-            except ValueError as ve:
-                # More user-friendly error messages
-                error_msg = str(ve)
-                if 'Could not find required columns' in error_msg:
-                    flash(f'File format issue: {error_msg}', 'error')
-                elif 'Could not parse date column' in error_msg:
-                    flash('Date format issue: Please ensure your date column is in a standard format (e.g., YYYY-MM-DD).', 'error')
-                else:
-                    flash(f'Error processing file: {error_msg}', 'error')
-                return redirect(url_for('index'))
-                
         except Exception as e:
             flash(f'Error processing file: {str(e)}', 'error')
             return redirect(url_for('index'))
@@ -292,87 +501,56 @@ def index():
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    """Handle file upload and process the data"""
+    """Accept a file upload and return the ID of the job processing it"""
     if 'file' not in request.files:
-        flash('No file part', 'error')
-        return redirect(request.url)
+        return jsonify({'error': 'No file part'}), 400
     
     file = request.files['file']
     
     if file.filename == '':
-        flash('No selected file', 'error')
-        return redirect(request.url)
+        return jsonify({'error': 'No selected file'}), 400
     
-    if file:
-        try:
-            # Save the uploaded file
-            filename = f"upload_{int(datetime.now().timestamp())}.csv"
-            filepath = UPLOAD_FOLDER / filename
-            file.save(filepath)
-            
-            # Process the file
-            df = load_sales(str(filepath))
-            
-            # Save a copy as the active dataset
-            df.to_csv(DEFAULT_DATA, index=False)
-            
-            flash('File successfully uploaded and processed', 'success')
-            return redirect(url_for('dashboard'))
-            
-        except Exception as e:
-            flash(f'Error processing file: {str(e)}', 'error')
-            return redirect(url_for('index'))
+    try:
+        job = queue_upload(file, append=request.form.get('mode') == 'append')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Error saving file: {str(e)}'}), 500
     
-    return redirect(url_for('index'))
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': url_for('api_job_status', job_id=job.id),
+    }), 202
+
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """API endpoint to get the status, progress and error of a background job"""
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    return jsonify(job.to_dict())
 
 @app.route('/dashboard')
 def dashboard():
     """Render the main dashboard with inventory metrics"""
     try:
-        # Load and process the data
-        df = load_sales(str(DEFAULT_DATA))
-        
-        # Standardize column names for the dashboard
-        df.columns = df.columns.str.lower().str.strip()
-        
-        # Map common column name variations
-        column_map = {
-            'date': 'date',
-            'order date': 'date',
-            'product': 'product',
-            'item': 'product',
-            'sku': 'product',
-            'sold_units': 'sold_units',
-            'quantity': 'sold_units',
-            'qty': 'sold_units',
-            'current_stock': 'current_stock',
-            'stock': 'current_stock',
-            'inventory': 'current_stock'
-        }
-        
-        # Apply column name mapping
-        df = df.rename(columns={col: new_col for col, new_col in column_map.items() 
-                              if col in df.columns and new_col not in df.columns})
-        
-        # Compute metrics
-        metrics = compute_metrics(df)
-        
-        # Generate plots for each product
-        plots = {}
-        if 'product' in df.columns:
-            for product in df['product'].unique():
-                plots[product] = generate_demand_plot(df, product)
+        # Metrics are computed once per dataset version; the table pages through them via /api/metrics
+        table = active_metrics_table()
         
-        # Save metrics to CSV
-        metrics.to_csv(OUTPUT_FILE, index=False)
+        # Plots are not rendered here; the dashboard fetches them lazily from /api/plot/<product>,
+        # and /download streams the recommendations, so nothing is written on a page view
         
-        # Convert DataFrame to list of dicts for the template
-        metrics_data = metrics.to_dict(orient='records')
+        # Only a bounded number of products go into the page itself
+        chart_metrics = table.query(limit=CHART_MAX_PRODUCTS)['items']
         
-        return render_template('dashboard.html', 
-                             metrics=metrics_data,
-                             plots=plots,
-                             products=df['product'].unique().tolist() if 'product' in df.columns else [])
+        with perf_stats.timer('render_template'):
+            return render_template('dashboard.html', 
+                                 summary=table.summary(),
+                                 chart_metrics=chart_metrics,
+                                 page_size=DEFAULT_PAGE_SIZE,
+                                 series_points=CHART_SERIES_POINTS,
+                                 job_id=request.args.get('job'))
         
     except Exception as e:
         import traceback
@@ -380,88 +558,323 @@ def dashboard():
         flash(f'Error loading data: {str(e)}', 'error')
         return redirect(url_for('index'))
 
+def parse_bool(value):
+    """Parse an optional true/false query parameter"""
+    if value is None or value == '':
+        return None
+    if value.lower() in ('1', 'true', 'yes'):
+        return True
+    if value.lower() in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f"Expected true or false, got {value!r}")
+
+def metrics_query_args():
+    """Sort, prefix and flag filters shared by /api/metrics and /download"""
+    query = {
+        'sort': request.args.get('sort', 'product'),
+        'prefix': request.args.get('prefix'),
+    }
+    for column in FILTER_COLUMNS:
+        query[column] = parse_bool(request.args.get(column))
+    return query
+
 @app.route('/api/metrics')
 def api_metrics():
-    """API endpoint to get metrics data"""
+    """
+    API endpoint to get one page of metrics.
+    
+    Query parameters: sort (a metrics column, '-' prefix for descending),
+    needs_reorder and potential_stockout (true/false), prefix (product name
+    prefix), limit and cursor (the next_cursor of the previous page).
+    """
     try:
-        df = load_sales(str(DEFAULT_DATA))
-        
-        # Standardize column names for the dashboard
-        df.columns = df.columns.str.lower().str.strip()
-        
-        # Map common column name variations
-        column_map = {
-            'date': 'date',
-            'order date': 'date',
-            'product': 'product',
-            'item': 'product',
-            'sku': 'product',
-            'sold_units': 'sold_units',
-            'quantity': 'sold_units',
-            'qty': 'sold_units',
-            'current_stock': 'current_stock',
-            'stock': 'current_stock',
-            'inventory': 'current_stock'
-        }
-        
-        # Apply column name mapping
-        df = df.rename(columns={col: new_col for col, new_col in column_map.items() 
-                              if col in df.columns and new_col not in df.columns})
-        
-        metrics = compute_metrics(df)
-        return jsonify(metrics.to_dict(orient='records'))
+        query = metrics_query_args()
+        query.update(limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+                     cursor=request.args.get('cursor'))
+        table = active_metrics_table()
+        return jsonify(table.query(**query))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         import traceback
         print(f"Error in api_metrics: {str(e)}\n{traceback.format_exc()}")
         return jsonify({'error': str(e)}), 500
 
+def product_etag(product, *variant):
+    """ETag for a per-product response; depends only on the dataset version and request"""
+    key = ':'.join([dataset_cache.version(DEFAULT_DATA), str(product).lower()] + [str(part) for part in variant])
+    return hashlib.sha1(key.encode()).hexdigest()
+
 @app.route('/api/plot/<product>')
 def api_plot_demand(product):
-    """API endpoint to get demand plot for a product"""
+    """API endpoint to get the demand plot for a product as a PNG image"""
     try:
-        df = load_sales(str(DEFAULT_DATA))
-        
-        # Standardize column names for the dashboard
-        df.columns = df.columns.str.lower().str.strip()
-        
-        # Map common column name variations
-        column_map = {
-            'date': 'date',
-            'order date': 'date',
-            'product': 'product',
-            'item': 'product',
-            'sku': 'product',
-            'sold_units': 'sold_units',
-            'quantity': 'sold_units',
-            'qty': 'sold_units',
-            'current_stock': 'current_stock',
-            'stock': 'current_stock',
-            'inventory': 'current_stock'
-        }
-        
-        # Apply column name mapping
-        df = df.rename(columns={col: new_col for col, new_col in column_map.items() 
-                              if col in df.columns and new_col not in df.columns})
-        
-        plot_data = generate_demand_plot(df, product)
-        return jsonify({'plot': plot_data})
+        # The ETag only depends on the dataset version and product, so a
+        # revalidation can be answered without loading or rendering anything
+        etag = product_etag(product)
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            png = render_demand_plot(active_demand_matrix(), product)
+            response = Response(png, mimetype='image/png')
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.max_age = PLOT_MAX_AGE
+        response.cache_control.must_revalidate = True
+        return response
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
     except Exception as e:
         import traceback
         print(f"Error in api_plot_demand: {str(e)}\n{traceback.format_exc()}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/series/<product>')
+def api_series(product):
+    """
+    API endpoint to get a product's sales history as compact columnar arrays.
+    
+    points downsamples long histories to at most that many points with LTTB.
+    format=binary returns typed arrays (see series.BINARY_HEADER) instead of JSON.
+    """
+    points = request.args.get('points', type=int)
+    fmt = request.args.get('format', 'json')
+    if fmt not in ('json', 'binary'):
+        return jsonify({'error': 'format must be json or binary'}), 400
+    if points is not None and points < 3:
+        return jsonify({'error': 'points must be at least 3'}), 400
+    
+    try:
+        etag = product_etag(product, points, fmt)
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            product_data = active_demand_matrix().series(product)
+            if product_data.empty:
+                raise LookupError(f"No data found for product: {product}")
+            series = build_series(product_data, points)
+            if fmt == 'binary':
+                response = Response(series_to_binary(series), mimetype=BINARY_MIMETYPE)
+            else:
+                response = jsonify(series_to_json(product_data['product'].iloc[0], series))
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.max_age = PLOT_MAX_AGE
+        response.cache_control.must_revalidate = True
+        return response
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        import traceback
+        print(f"Error in api_series: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({'error': str(e)}), 500
+
+def parse_date_arg(name):
+    """Parse an optional date query parameter into an ISO date string"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return pd.Timestamp(value).strftime('%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"{name} must be a date such as 2023-01-31, got {value!r}")
+
+def nullable(values):
+    """List of values with NaN (NULL in the database) as None, which JSON can carry"""
+    return [None if pd.isna(value) else value for value in values]
+
+@app.route('/api/history/<product>')
+def api_history(product):
+    """
+    API endpoint to get a product's recorded sales rows, as stored, from the
+    database's (product, date) index. start and end (inclusive ISO dates)
+    limit the date range, and location the rows to one location.
+    """
+    try:
+        start, end = parse_date_arg('start'), parse_date_arg('end')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        db = active_sales_db()
+        # Resolve the name as the other product routes do, ignoring case if needed
+        matrix = active_demand_matrix()
+        row = matrix.code(product)
+        if row is None:
+            return jsonify({'error': f"No data found for product: {product}"}), 404
+        name = str(matrix.products[row])
+        location = request.args.get('location')
+        rows = db.product_history(name, start=start, end=end, location=location)
+        return jsonify({
+            'product': name,
+            'start': start,
+            'end': end,
+            'location': location,
+            'dates': rows['date'].dt.strftime('%Y-%m-%d').tolist(),
+            'sold_units': nullable(rows['sold_units'].tolist()),
+            'current_stock': nullable(rows['current_stock'].tolist()),
+            'locations': nullable(rows['location'].tolist()),
+            'rows': len(rows),
+        })
+    except Exception as e:
+        import traceback
+        print(f"Error in api_history: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/sales/daily')
+def api_daily_sales():
+    """API endpoint to get units sold per day over all products, optionally between start and end"""
+    try:
+        start, end = parse_date_arg('start'), parse_date_arg('end')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        totals = active_sales_db().daily_totals(start=start, end=end)
+        return jsonify({
+            'start': start,
+            'end': end,
+            'dates': totals['date'].dt.strftime('%Y-%m-%d').tolist(),
+            'sold_units': nullable(totals['sold_units'].tolist()),
+            'rows': totals['rows'].tolist(),
+        })
+    except Exception as e:
+        import traceback
+        print(f"Error in api_daily_sales: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/uploads')
+def api_uploads():
+    """API endpoint to get the most recent uploads with their content hash, outcome and snapshot"""
+    limit = request.args.get('limit', 50, type=int)
+    if limit < 1:
+        return jsonify({'error': 'limit must be at least 1'}), 400
+    return jsonify({'uploads': sales_db.uploads(limit)})
+
+@app.route('/api/rollup')
+def api_rollup():
+    """
+    API endpoint to get reorder metrics at one level of the location
+    hierarchy: level (location, region or network), optionally narrowed to
+    one location, region and/or product, paged with limit and offset.
+    Region and network rows carry the pooled safety stock of the summed
+    demand next to the unpooled sum of their locations' safety stocks.
+    """
+    level = request.args.get('level', 'location')
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    if level not in LEVELS:
+        return jsonify({'error': f"level must be one of {', '.join(LEVELS)}"}), 400
+    
+    try:
+        rollup = active_rollup()
+        rows = rollup.metrics(level, location=request.args.get('location'),
+                              region=request.args.get('region'), product=request.args.get('product'))
+        return jsonify({
+            'level': level,
+            'total': len(rows),
+            'offset': offset,
+            'limit': limit,
+            'items': records(rows.iloc[offset:offset + limit]),
+            'summary': rollup.summary(),
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        import traceback
+        print(f"Error in api_rollup: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({'error': str(e)}), 500
+
+def parse_float_list(value, default):
+    """Parse a comma-separated query parameter into a list of floats"""
+    if not value:
+        return default
+    return [float(part) for part in value.split(',') if part.strip()]
+
+@app.route('/api/sweep')
+def api_sweep():
+    """API endpoint for reorder points across a grid of lead times and service levels"""
+    try:
+        lead_times = parse_float_list(request.args.get('lead_times'), [1, 3, 5, 7, 14])
+        z_values = parse_float_list(request.args.get('z_values'), [1.28, 1.65, 1.96, 2.33])
+        window = request.args.get('window', 7, type=int)
+    except ValueError:
+        return jsonify({'error': 'lead_times and z_values must be comma-separated numbers'}), 400
+    
+    if not lead_times or not z_values:
+        return jsonify({'error': 'lead_times and z_values must not be empty'}), 400
+    if len(lead_times) * len(z_values) > MAX_SWEEP_SCENARIOS:
+        return jsonify({'error': f'At most {MAX_SWEEP_SCENARIOS} scenarios per request'}), 400
+    
+    try:
+        df = dataset_cache.get(DEFAULT_DATA)
+        engine = DemandEngine(
+            df[['product', 'date', 'sold_units']].rename(
+                columns={'product': 'Item', 'date': 'Date', 'sold_units': 'QuantitySold'}),
+            window=window)
+        
+        if request.args.get('format') == 'array':
+            items, reorder_points = engine.sweep(lead_times, z_values, as_array=True)
+            return jsonify({
+                'items': [str(item) for item in items],
+                'lead_times': lead_times,
+                'z_values': z_values,
+                # NaN (not enough history for the window) is not valid JSON
+                'reorder_points': np.where(np.isnan(reorder_points), None, np.round(reorder_points, 2)).tolist(),
+            })
+        
+        result = engine.sweep(lead_times, z_values)
+        result['Item'] = result['Item'].astype(str)
+        result = result.round(2).astype(object).where(result.notna(), None)
+        return jsonify(result.to_dict(orient='records'))
+    except Exception as e:
+        import traceback
+        print(f"Error in api_sweep: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/perf')
+def api_perf():
+    """API endpoint to get timing histograms, as JSON or ?format=prometheus"""
+    if request.args.get('format') == 'prometheus':
+        return Response(perf_stats.to_prometheus(), mimetype='text/plain; version=0.0.4')
+    return jsonify({'timings': perf_stats.snapshot(), 'profiling_enabled': PROFILING_ENABLED})
+
+@app.route('/api/cache')
+def api_cache_stats():
+    """API endpoint to get cache hit/miss counters"""
+    return jsonify({'dataset': dataset_cache.stats(), 'plots': plot_cache.stats(),
+                    'schema_memo': schema_memo.stats()})
+
 @app.route('/download')
 def download():
-    """Download the recommendations as CSV"""
-    if OUTPUT_FILE.exists():
-        return send_file(
-            OUTPUT_FILE,
-            as_attachment=True,
-            download_name=f'inventory_recommendations_{datetime.now().strftime("%Y%m%d")}.csv',
-            mimetype='text/csv'
-        )
-    flash('No recommendations available to download', 'error')
-    return redirect(url_for('dashboard'))
+    """
+    Stream the recommendations as an attachment.
+    
+    format is csv (default), ndjson or parquet (needs pyarrow); sort,
+    needs_reorder, potential_stockout and prefix filter the rows as in
+    /api/metrics. Rows are serialized in chunks straight from the cached
+    metrics, so memory stays flat however large the catalog is.
+    """
+    fmt = request.args.get('format', 'csv').lower()
+    try:
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+        table = active_metrics_table()
+        rows = table.select(**metrics_query_args())
+        # The response is streamed after this view returns, so the export is
+        # timed until its last chunk rather than by the request timer
+        chunks = perf_stats.timed_iter('iter_export', iter_export(table.frame, rows, fmt))
+    except ValueError as e:
+        flash(f'Could not export recommendations: {str(e)}', 'error')
+        return redirect(url_for('dashboard'))
+    
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    filename = f'inventory_recommendations_{datetime.now().strftime("%Y%m%d")}.{extension}'
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
 
 # Error handlers
 @app.errorhandler(404)
@@ -475,7 +888,7 @@ def internal_server_error(e):
 if __name__ == '__main__':
     # Enable more detailed error reporting
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-    app.config['UPLOAD_EXTENSIONS'] = ['.csv', '.xlsx']
+    app.config['UPLOAD_EXTENSIONS'] = list(UPLOAD_EXTENSIONS)
     app.config['DEBUG'] = True
     
     # Add request logging
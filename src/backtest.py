@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+
+# Trailing windows and horizons scored by DemandEngine.backtest when none are given
+DEFAULT_WINDOWS = (7, 14, 28)
+DEFAULT_HORIZONS = (1,)
+
+
+def _cumulative(values: np.ndarray):
+    """Cumulative sums with NaNs counted apart, so any window's sum is two lookups"""
+    missing = np.isnan(values)
+    return np.r_[0.0, np.cumsum(np.where(missing, 0.0, values))], np.r_[0, np.cumsum(missing)]
+
+
+def rolling_sma(values: np.ndarray, starts: np.ndarray, ends: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing SMA ending at every row of the item layout (see
+    DemandEngine._item_layout), NaN until an item has a full window and
+    wherever the window holds a NaN, as rolling().mean() does.
+    """
+    sums, nans = _cumulative(values)
+    position = np.arange(len(values))
+    lower = position + 1 - window
+    row_start = np.repeat(starts, ends - starts)
+
+    sma = np.full(len(values), np.nan)
+    full = lower >= row_start
+    upper = position[full] + 1
+    window_sum = sums[upper] - sums[lower[full]]
+    window_nans = nans[upper] - nans[lower[full]]
+    sma[full] = np.where(window_nans == 0, window_sum / window, np.nan)
+    return sma
+
+
+def item_positions(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Position of every row within its item, 0 for the item's first row"""
+    lengths = ends - starts
+    return np.arange(lengths.sum()) - np.repeat(starts, lengths)
+
+
+def shift_forward(series: np.ndarray, positions: np.ndarray, horizon: int) -> np.ndarray:
+    """
+    Move every value `horizon` rows later within its item. Applied to a
+    trailing SMA this gives, at each row, the forecast made `horizon` rows
+    earlier; rows without such an origin are NaN.
+    """
+    shifted = np.full(len(series), np.nan)
+    rows = np.flatnonzero(positions >= horizon)
+    shifted[rows] = series[rows - horizon]
+    return shifted
+
+
+class ForecastScorer:
+    """
+    Per-item error metrics of forecasts for a fixed set of actuals.
+
+    Rows are grouped into items by segments, (item numbers, offsets) of the
+    contiguous runs each item occupies in actual. Everything that depends
+    only on the actuals is computed once, so scoring another forecast is a
+    handful of passes over the rows.
+    """
+
+    def __init__(self, segments, n_items: int, actual: np.ndarray):
+        self.segment_items, self.offsets = segments
+        self.n_items = n_items
+        self.actual = actual
+        self._known = ~np.isnan(actual)
+        self._nonzero = self._known & (actual != 0)
+        with np.errstate(divide='ignore'):
+            self._inverse = np.where(self._nonzero, 1 / np.abs(actual), 0.0)
+        self._count = self.per_item(self._known.astype(np.float64))
+        self._nonzero_count = self.per_item(self._nonzero.astype(np.float64))
+
+    def per_item(self, rows: np.ndarray) -> np.ndarray:
+        totals = np.zeros(self.n_items)
+        if len(self.segment_items):
+            totals[self.segment_items] = np.add.reduceat(rows, self.offsets)
+        return totals
+
+    def score(self, forecast: np.ndarray) -> dict:
+        """
+        Arrays of length n_items:
+
+        - count: rows scored (both actual and forecast known)
+        - mae: mean absolute error
+        - mape: mean absolute percentage error over rows with non-zero actuals
+        - bias: mean of forecast - actual, positive when over-forecasting
+
+        Items without scored rows get NaN metrics.
+        """
+        error = forecast - self.actual
+        count, nonzero_count = self._count, self._nonzero_count
+        missing = np.isnan(error)
+        if missing.any():
+            valid = ~missing
+            error = np.where(valid, error, 0.0)
+            count = self.per_item(valid.astype(np.float64))
+            nonzero_count = self.per_item((valid & self._nonzero).astype(np.float64))
+        absolute = np.abs(error)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return {
+                'count': count,
+                'mae': self.per_item(absolute) / count,
+                'mape': self.per_item(absolute * self._inverse) / nonzero_count * 100,
+                'bias': self.per_item(error) / count,
+            }
+
+
+def rolling_origin_scores(items, starts: np.ndarray, ends: np.ndarray, values: np.ndarray,
+                          windows=DEFAULT_WINDOWS, horizons=DEFAULT_HORIZONS, holdout: int = None) -> pd.DataFrame:
+    """
+    Rolling-origin evaluation of trailing-SMA forecasts for every item at once.
+
+    Every row is a forecast origin: the SMA of the `window` rows ending there
+    forecasts the row `horizon` rows later. All settings are scored on the
+    same target rows, those with enough history for the largest window and
+    horizon, optionally restricted to each item's last `holdout` rows, so
+    their errors are comparable.
+
+    Window sums come from one cumulative sum shared by every setting, and the
+    targets of each item are a contiguous run, so each setting is a few
+    vectorized passes and reduceat calls over the whole layout; the cost does
+    not depend on the number of items.
+
+    Returns one row per item, window and horizon with columns Item, Window,
+    Horizon, Count, MAE, MAPE and Bias.
+    """
+    windows = [int(window) for window in windows]
+    horizons = [int(horizon) for horizon in horizons]
+    if not windows or not horizons or min(windows) < 1 or min(horizons) < 1:
+        raise ValueError("windows and horizons must be non-empty lists of positive integers")
+
+    # Each item's targets are its rows from `first` on
+    lengths = ends - starts
+    first = np.full(len(lengths), max(windows) + max(horizons) - 1)
+    if holdout is not None:
+        first = np.maximum(first, lengths - int(holdout))
+    counts = np.clip(lengths - first, 0, None)
+    segment_items = np.flatnonzero(counts)
+    offsets = np.r_[0, np.cumsum(counts[segment_items])[:-1]].astype(np.int64)
+    rows = np.arange(counts.sum()) + np.repeat(starts[segment_items] + first[segment_items] - offsets,
+                                               counts[segment_items])
+
+    scorer = ForecastScorer((segment_items, offsets), len(items), values[rows])
+    sums, nans = _cumulative(values)
+    n_items, n_settings = len(items), len(windows) * len(horizons)
+    columns = {name: np.empty((n_items, n_settings)) for name in ('count', 'mae', 'mape', 'bias')}
+    setting = 0
+    for window in windows:
+        # SMA of the window ending at every row, from plain slices. Windows
+        # reaching into the previous item are never read: a target's origin is
+        # always at least max(windows) - 1 rows into its item.
+        sma = np.full(len(values), np.nan)
+        sma[window - 1:] = (sums[window:] - sums[:-window]) / window
+        if nans[-1]:
+            sma[window - 1:][nans[window:] != nans[:-window]] = np.nan
+        for horizon in horizons:
+            for name, column in scorer.score(sma[rows - horizon]).items():
+                columns[name][:, setting] = column
+            setting += 1
+
+    # Item-major, like DemandEngine.sweep
+    return pd.DataFrame({
+        'Item': np.repeat(np.asarray(items), n_settings),
+        'Window': np.tile(np.repeat(windows, len(horizons)), n_items),
+        'Horizon': np.tile(horizons, n_items * len(windows)),
+        'Count': columns['count'].ravel().astype(np.int64),
+        'MAE': columns['mae'].ravel(),
+        'MAPE': columns['mape'].ravel(),
+        'Bias': columns['bias'].ravel(),
+    })
@@ -0,0 +1,285 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+
+# Common column name variations, most specific first within each field
+DATE_PATTERNS = ['date', 'order date', 'sale date', 'transaction date', 'day']
+PRODUCT_PATTERNS = ['product', 'item', 'sku', 'product name', 'item name', 'product id']
+QUANTITY_PATTERNS = ['sold_units', 'quantity', 'units sold', 'sold', 'sales quantity', 'qty', 'units']
+STOCK_PATTERNS = ['current_stock', 'stock', 'inventory', 'on hand', 'current inventory']
+LOCATION_PATTERNS = ['location', 'store', 'warehouse', 'site', 'branch', 'location id', 'store id', 'warehouse id']
+REGION_PATTERNS = ['region', 'district', 'territory']
+
+FIELD_PATTERNS = {
+    'date': DATE_PATTERNS,
+    'product': PRODUCT_PATTERNS,
+    'sold_units': QUANTITY_PATTERNS,
+    'current_stock': STOCK_PATTERNS,
+    'location': LOCATION_PATTERNS,
+    'region': REGION_PATTERNS,
+}
+REQUIRED_FIELDS = ('date', 'product', 'sold_units')
+MISSING_HINTS = {
+    'date': 'date (or similar like Order Date, Transaction Date)',
+    'product': 'product (or similar like Item, SKU, Product Name)',
+    'sold_units': 'quantity (or similar like Sold_Units, Units Sold, Qty)',
+}
+
+# Rows of a file read to sniff the contents of ambiguous columns
+SNIFF_ROWS = 50
+
+# Contested candidates whose sampled values fit the field worse than this are dropped
+MIN_CONTENT_FIT = 0.5
+
+# Bumped whenever scoring changes in a way that should invalidate memoized mappings
+DETECTION_VERSION = 2
+
+# Fields that say where a row belongs rather than what was measured. They lose
+# to measure fields on names matching both, so 'Store Stock' is a stock column
+DIMENSION_FIELDS = ('location', 'region')
+DIMENSION_PENALTY = 50
+
+# Header signatures remembered by a SchemaMemo
+MEMO_MAX_ENTRIES = 1000
+
+# Name match strength: the column is the pattern, contains it as a word, or contains it
+EXACT, WORD, SUBSTRING = 3, 2, 1
+
+
+class FieldMatcher:
+    """Precompiled name matcher for one field; works on lowercased column names"""
+
+    def __init__(self, field: str, patterns: list):
+        self.field = field
+        self.patterns = patterns
+        self.penalty = DIMENSION_PENALTY if field in DIMENSION_FIELDS else 0
+        self._exact = {pattern: rank for rank, pattern in enumerate(patterns)}
+        self._words = [re.compile(rf'(?<![a-z0-9]){re.escape(pattern)}(?![a-z0-9])') for pattern in patterns]
+
+    def score(self, lowered: str) -> int:
+        """0 if no pattern occurs in the name, otherwise higher for stronger, higher-priority matches"""
+        priority = len(self.patterns)
+        rank = self._exact.get(lowered)
+        if rank is not None:
+            return EXACT * 100 + priority - rank - self.penalty
+        best = 0
+        for rank, pattern in enumerate(self.patterns):
+            if pattern in lowered:
+                strength = WORD if self._words[rank].search(lowered) else SUBSTRING
+                best = max(best, strength * 100 + priority - rank - self.penalty)
+        return best
+
+
+MATCHERS = [FieldMatcher(field, patterns) for field, patterns in FIELD_PATTERNS.items()]
+
+# One case-sensitive scan over the lowercased name rejects the columns that
+# match no field at all, which on wide exports is nearly all of them
+ANY_PATTERN = re.compile('|'.join(re.escape(pattern) for pattern in
+                                  sorted({p for patterns in FIELD_PATTERNS.values() for p in patterns},
+                                         key=len, reverse=True)))
+
+# Fingerprint of everything that decides a mapping, so memo entries from other
+# pattern lists or scoring rules are never reused
+DETECTOR_FINGERPRINT = hashlib.sha1(
+    json.dumps([DETECTION_VERSION, FIELD_PATTERNS], sort_keys=True).encode()).hexdigest()[:12]
+
+
+@lru_cache(maxsize=4096)
+def name_scores(column: str) -> tuple:
+    """(field, score) for every field whose patterns occur in the column name"""
+    lowered = column.lower()
+    if not ANY_PATTERN.search(lowered):
+        return ()
+    scores = ((matcher.field, matcher.score(lowered)) for matcher in MATCHERS)
+    return tuple((field, score) for field, score in scores if score)
+
+
+def content_profile(values: pd.Series) -> tuple:
+    """(share of numeric values, share of date-like values) among the non-null values"""
+    values = values.dropna()
+    if len(values) == 0:
+        return None
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return 0.0, 1.0
+    if pd.api.types.is_numeric_dtype(values):
+        return 1.0, 0.0
+    text = values.astype(str).str.strip()
+    numeric = pd.to_numeric(text, errors='coerce').notna()
+    # Bare numbers parse as dates too, so only non-numeric text counts as a date
+    dates = pd.to_datetime(text[~numeric], errors='coerce', format='mixed').notna()
+    return float(numeric.mean()), float(dates.sum() / len(text))
+
+
+def content_fit(field: str, profile: tuple) -> float:
+    """How well sampled values suit a field, from 0 to 1; 1 without a sample"""
+    if profile is None:
+        return 1.0
+    numeric, dates = profile
+    if field == 'date':
+        return dates
+    if field in ('product',) + DIMENSION_FIELDS:
+        return 1.0 - dates
+    return numeric
+
+
+def rank_candidates(columns, sample: pd.DataFrame = None) -> list:
+    """
+    Score every (field, column) pair whose name matches, best first.
+
+    Returns (score, field, column) tuples. When sample is given, candidates
+    that are contested - their field has several candidates or the column
+    matches several fields - are weighted by how well the sampled values fit
+    the field, and dropped if they fit worse than MIN_CONTENT_FIT.
+    """
+    candidates = []
+    for position, column in enumerate(columns):
+        for field, score in name_scores(column):
+            candidates.append([float(score), field, column, position])
+
+    if sample is not None and candidates:
+        per_field, per_column = {}, {}
+        for _, field, column, _ in candidates:
+            per_field[field] = per_field.get(field, 0) + 1
+            per_column[column] = per_column.get(column, 0) + 1
+        profiles = {}
+        kept = []
+        for candidate in candidates:
+            _, field, column, _ = candidate
+            if (per_field[field] > 1 or per_column[column] > 1) and column in sample.columns:
+                if column not in profiles:
+                    profiles[column] = content_profile(sample[column])
+                fit = content_fit(field, profiles[column])
+                if fit < MIN_CONTENT_FIT:
+                    continue
+                candidate[0] *= fit
+            kept.append(candidate)
+        candidates = kept
+
+    # Ties go to the column that comes first, as the original first-match scan did
+    candidates.sort(key=lambda candidate: (-candidate[0], candidate[3]))
+    return [(score, field, column) for score, field, column, _ in candidates]
+
+
+def resolve_mapping(columns, sample: pd.DataFrame = None) -> dict:
+    """Assign each field its best-ranked column, using every column at most once"""
+    mapping = {}
+    assigned = set()
+    for _, field, column in rank_candidates(columns, sample):
+        if field in assigned or column in mapping:
+            continue
+        mapping[column] = field
+        assigned.add(field)
+
+    missing = [MISSING_HINTS[field] for field in REQUIRED_FIELDS if field not in assigned]
+    if missing:
+        raise ValueError("Could not find required columns: " +
+                         ", ".join(missing) + ".\n" +
+                         "Please ensure your file contains date, product, and quantity information.")
+
+    # Keep the historical key order: date, product, sold_units, current_stock, then the dimensions
+    order = {field: rank for rank, field in enumerate(FIELD_PATTERNS)}
+    return dict(sorted(mapping.items(), key=lambda item: order[item[1]]))
+
+
+class SchemaMemo:
+    """
+    Persistent memo from a header signature to its resolved column mapping.
+
+    Files from the same source share their header, so after the first one
+    detection is a hash of the column names and a dict lookup. Entries live
+    in memory and, when path is given, in a JSON file that is rewritten
+    atomically and merged with what other processes saved. The memo is only
+    a cache: losing an entry just means detecting that header again.
+    """
+
+    def __init__(self, path=None, max_entries: int = MEMO_MAX_ENTRIES):
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def signature(columns) -> str:
+        digest = hashlib.sha1(DETECTOR_FINGERPRINT.encode())
+        digest.update('\x1f'.join(columns).encode())
+        return digest.hexdigest()
+
+    def _read_file(self) -> dict:
+        if self.path is None:
+            return {}
+        try:
+            return json.loads(self.path.read_text()).get('entries', {})
+        except (OSError, ValueError, AttributeError):
+            # Missing or corrupt memo files are rebuilt from scratch
+            return {}
+
+    def _load(self):
+        if not self._loaded:
+            self._entries.update(self._read_file())
+            self._loaded = True
+
+    def get(self, columns):
+        """Return the memoized mapping for this exact header, or None"""
+        key = self.signature(columns)
+        with self._lock:
+            self._load()
+            mapping = self._entries.get(key)
+            if mapping is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(mapping)
+
+    def put(self, columns, mapping: dict):
+        key = self.signature(columns)
+        with self._lock:
+            self._load()
+            if self.path is not None:
+                # Keep entries other processes saved since we loaded
+                for other_key, other_mapping in self._read_file().items():
+                    self._entries.setdefault(other_key, other_mapping)
+            self._entries[key] = dict(mapping)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self.path is not None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp_path.write_text(json.dumps({'fingerprint': DETECTOR_FINGERPRINT, 'entries': self._entries}))
+                os.replace(tmp_path, self.path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+def detect_columns(columns, sample: pd.DataFrame = None, memo: SchemaMemo = None) -> dict:
+    """
+    Map lowercased source column names to the standard names
+    date, product, sold_units and (optionally) current_stock, location and region.
+
+    sample, a few rows of the file under the same column names, lets
+    ambiguous names be settled by their contents. With a memo, a header
+    seen before is answered from it without running detection at all.
+    """
+    columns = [str(column) for column in columns]
+    if memo is not None:
+        mapping = memo.get(columns)
+        if mapping is not None:
+            return mapping
+
+    mapping = resolve_mapping(columns, sample)
+    if memo is not None:
+        memo.put(columns, mapping)
+    return mapping
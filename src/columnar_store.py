@@ -0,0 +1,291 @@
+import json
+import os
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_NAME = 'manifest.json'
+STORE_FORMAT_VERSION = 2
+
+# Rows remapped per step when categorical codes are re-sorted on commit
+REMAP_CHUNK_ROWS = 1_000_000
+
+
+def is_columnar_store(path) -> bool:
+    """Return True if path is a directory written by write_columnar"""
+    path = Path(path)
+    return path.is_dir() and (path / MANIFEST_NAME).exists()
+
+
+def _append_problems(columns: list, df: pd.DataFrame) -> list:
+    """Reasons df cannot be appended to a store with the given column entries"""
+    names = {entry['name'] for entry in columns}
+    problems = []
+    extra = [str(name) for name in df.columns if str(name) not in names]
+    if extra:
+        problems.append(f"columns the store lacks: {', '.join(extra)}")
+    # Columns the delta lacks are filled with missing values where the dtype allows it
+    missing = [entry['name'] for entry in columns if entry['name'] not in df.columns
+               and entry['kind'] != 'categorical' and entry['dtype'] != 'float64']
+    if missing:
+        problems.append(f"missing columns: {', '.join(missing)}")
+    for entry in columns:
+        if entry['name'] not in df.columns or entry['kind'] == 'categorical':
+            continue
+        series = df[entry['name']]
+        if entry['kind'] == 'datetime':
+            fits = pd.api.types.is_datetime64_any_dtype(series)
+        elif entry['dtype'] == 'bool':
+            fits = pd.api.types.is_bool_dtype(series)
+        elif entry['dtype'] == 'int64':
+            fits = pd.api.types.is_integer_dtype(series) or pd.api.types.is_bool_dtype(series)
+        else:
+            fits = pd.api.types.is_numeric_dtype(series)
+        if not fits:
+            problems.append(f"column {entry['name']} is {series.dtype}, the store holds {entry['dtype']}")
+    return problems
+
+
+def can_append(store_dir, df: pd.DataFrame) -> bool:
+    """Return True if df can be appended to the columnar store as it is, without a full rewrite"""
+    manifest = json.loads((Path(store_dir) / MANIFEST_NAME).read_text())
+    if manifest.get('format_version') != STORE_FORMAT_VERSION:
+        return False
+    return not _append_problems(manifest['columns'], df)
+
+
+class ColumnarWriter:
+    """
+    Append DataFrame chunks to a typed columnar store.
+
+    Each column is written to a raw binary file whose dtype is recorded in the
+    manifest:
+
+    - datetime columns are stored as int64 nanoseconds
+    - integer, float and boolean columns keep a fixed dtype taken from the first chunk
+    - everything else (product names, categories) is stored as int32
+      categorical codes with the categories listed in the manifest
+
+    The first chunk's DataFrame.attrs (e.g. the sales schema version) are saved
+    in the manifest and restored by read_columnar, so they must be JSON-serializable.
+
+    Nothing is visible to readers until commit(), which swaps the manifest in
+    with os.replace, so readers always see either the old or the new dataset.
+
+    With append=True new rows are written after the rows of the current
+    generation. Readers map only the row count in their manifest, so the
+    extra bytes stay invisible until commit. Appended chunks must fit the
+    store's columns and dtypes (see can_append). If new categories break the
+    sorted order, the codes of that column are re-sorted into a new file
+    rather than in place, since readers may have the old one mapped.
+    """
+
+    def __init__(self, store_dir, append: bool = False):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(exist_ok=True, parents=True)
+        self.append_mode = append and is_columnar_store(self.store_dir)
+        self.rows = 0
+        self._columns = None
+        self._handles = {}
+        self._categories = {}
+        self.attrs = {}
+
+        if self.append_mode:
+            manifest = json.loads((self.store_dir / MANIFEST_NAME).read_text())
+            if manifest.get('format_version') != STORE_FORMAT_VERSION:
+                raise ValueError(f"Unsupported columnar store version: {manifest.get('format_version')}")
+            self.rows = self._base_rows = manifest['rows']
+            self._columns = manifest['columns']
+            self.attrs = manifest.get('attrs', {})
+            for entry in self._columns:
+                if entry['kind'] == 'categorical':
+                    self._categories[entry['name']] = {
+                        category: code for code, category in enumerate(entry.pop('categories'))}
+                # Drop anything left behind by an aborted append before writing after it
+                handle = open(self.store_dir / entry['file'], 'r+b')
+                handle.truncate(self._base_rows * np.dtype(entry['dtype']).itemsize)
+                handle.seek(0, os.SEEK_END)
+                self._handles[entry['name']] = handle
+        # Files written by this writer, including re-sorted code files in append mode
+        self.generation = uuid.uuid4().hex[:12]
+
+    def _file_name(self, name: str) -> str:
+        return f"{name}.{self.generation}.bin"
+
+    def _init_columns(self, df: pd.DataFrame):
+        self.attrs = dict(df.attrs)
+        self._columns = []
+        for name in df.columns:
+            series = df[name]
+            entry = {'name': str(name), 'file': self._file_name(name)}
+            if pd.api.types.is_datetime64_any_dtype(series):
+                entry.update(kind='datetime', dtype='int64')
+            elif pd.api.types.is_bool_dtype(series):
+                entry.update(kind='numeric', dtype='bool')
+            elif pd.api.types.is_integer_dtype(series):
+                entry.update(kind='numeric', dtype='int64')
+            elif pd.api.types.is_float_dtype(series):
+                entry.update(kind='numeric', dtype='float64')
+            else:
+                entry.update(kind='categorical', dtype='int32')
+                self._categories[entry['name']] = {}
+            self._columns.append(entry)
+            self._handles[entry['name']] = open(self.store_dir / entry['file'], 'wb')
+
+    def _encode(self, entry: dict, series: pd.Series) -> np.ndarray:
+        if entry['kind'] == 'datetime':
+            return series.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        if entry['kind'] == 'numeric':
+            return series.to_numpy(dtype=entry['dtype'])
+
+        # Categorical: codes are assigned in order of first appearance across chunks
+        lookup = self._categories[entry['name']]
+        codes, uniques = pd.factorize(series.astype('string'))
+        chunk_to_store = np.array([lookup.setdefault(str(value), len(lookup)) for value in uniques] + [-1],
+                                  dtype=np.int32)
+        return chunk_to_store[codes]
+
+    def append(self, df: pd.DataFrame):
+        if self._columns is None:
+            self._init_columns(df)
+        elif self.append_mode:
+            problems = _append_problems(self._columns, df)
+            if problems:
+                raise ValueError(f"Appended data does not fit the store: {'; '.join(problems)}")
+            df = df.reindex(columns=[entry['name'] for entry in self._columns])
+        elif [entry['name'] for entry in self._columns] != [str(name) for name in df.columns]:
+            raise ValueError("All chunks must have the same columns")
+
+        for entry in self._columns:
+            values = np.ascontiguousarray(self._encode(entry, df[entry['name']]))
+            self._handles[entry['name']].write(values.tobytes())
+        self.rows += len(df)
+
+    def _close_handles(self):
+        for handle in self._handles.values():
+            handle.close()
+        self._handles = {}
+
+    def _sort_categories(self, entry: dict):
+        """Re-code a categorical column so its categories are in sorted order"""
+        lookup = self._categories[entry['name']]
+        categories = list(lookup)
+        order = sorted(range(len(categories)), key=categories.__getitem__)
+        entry['categories'] = [categories[i] for i in order]
+        if order == list(range(len(categories))) or self.rows == 0:
+            return
+
+        remap = np.empty(len(categories) + 1, dtype=np.int32)
+        remap[order] = np.arange(len(categories), dtype=np.int32)
+        remap[-1] = -1
+
+        path = self.store_dir / entry['file']
+        if self.append_mode:
+            # The old file may be mapped by readers of the previous manifest
+            codes = np.memmap(path, dtype=np.int32, mode='r', shape=(self.rows,))
+            entry['file'] = self._file_name(entry['name'])
+            with open(self.store_dir / entry['file'], 'wb') as handle:
+                for start in range(0, len(codes), REMAP_CHUNK_ROWS):
+                    handle.write(remap[codes[start:start + REMAP_CHUNK_ROWS]].tobytes())
+            del codes
+            return
+
+        codes = np.memmap(path, dtype=np.int32, mode='r+')
+        for start in range(0, len(codes), REMAP_CHUNK_ROWS):
+            block = codes[start:start + REMAP_CHUNK_ROWS]
+            block[:] = remap[block]
+        codes.flush()
+        del codes
+
+    def commit(self):
+        """Finish the files and atomically publish them as the store's current dataset"""
+        if self._columns is None:
+            raise ValueError("Cannot commit an empty columnar store")
+        self._close_handles()
+
+        for entry in self._columns:
+            if entry['kind'] == 'categorical':
+                self._sort_categories(entry)
+
+        manifest = {
+            'format_version': STORE_FORMAT_VERSION,
+            'generation': self.generation,
+            'rows': int(self.rows),
+            'columns': self._columns,
+            'attrs': self.attrs,
+        }
+        tmp_path = self.store_dir / f"{MANIFEST_NAME}.{self.generation}.tmp"
+        tmp_path.write_text(json.dumps(manifest))
+        os.replace(tmp_path, self.store_dir / MANIFEST_NAME)
+
+        _remove_stale_generations(self.store_dir, {entry['file'] for entry in self._columns})
+
+    def abort(self):
+        """Discard everything written by this writer"""
+        self._close_handles()
+        if self.append_mode:
+            for entry in self._columns:
+                if not entry['file'].endswith(f".{self.generation}.bin"):
+                    os.truncate(self.store_dir / entry['file'], self._base_rows * np.dtype(entry['dtype']).itemsize)
+        for path in self.store_dir.glob(f"*.{self.generation}.bin"):
+            path.unlink(missing_ok=True)
+
+
+def write_columnar(df: pd.DataFrame, store_dir, append: bool = False):
+    """Write df as the current dataset of a typed columnar store, or append it to the current one"""
+    writer = ColumnarWriter(store_dir, append=append)
+    try:
+        writer.append(df)
+        writer.commit()
+    except Exception:
+        writer.abort()
+        raise
+
+
+def _remove_stale_generations(store_dir: Path, live_files: set):
+    """Delete column files that the current manifest no longer references"""
+    for path in list(store_dir.glob('*.bin')) + list(store_dir.glob('*.npy')):
+        if path.name not in live_files:
+            try:
+                path.unlink()
+            except OSError:
+                # Still mapped by a reader on platforms that forbid it; retry next write
+                pass
+
+
+def read_columnar(store_dir, mmap: bool = True) -> pd.DataFrame:
+    """
+    Load a columnar store into a DataFrame.
+
+    With mmap=True the numeric columns are memory-mapped read-only rather than
+    read into memory, and categorical columns are rebuilt from their codes
+    without parsing any strings.
+    """
+    store_dir = Path(store_dir)
+    manifest = json.loads((store_dir / MANIFEST_NAME).read_text())
+    if manifest.get('format_version') != STORE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported columnar store version: {manifest.get('format_version')}")
+
+    data = {}
+    for entry in manifest['columns']:
+        path = store_dir / entry['file']
+        if manifest['rows'] == 0:
+            values = np.empty(0, dtype=entry['dtype'])
+        elif mmap:
+            # Map only the rows this manifest covers; an append may be in progress past them
+            values = np.memmap(path, dtype=entry['dtype'], mode='r', shape=(manifest['rows'],))
+        else:
+            values = np.fromfile(path, dtype=entry['dtype'], count=manifest['rows'])
+
+        if entry['kind'] == 'datetime':
+            data[entry['name']] = values.view('datetime64[ns]')
+        elif entry['kind'] == 'categorical':
+            data[entry['name']] = pd.Categorical.from_codes(values, categories=entry['categories'])
+        else:
+            data[entry['name']] = values
+
+    df = pd.DataFrame(data, copy=False)
+    df.attrs.update(manifest.get('attrs', {}))
+    return df
@@ -1,111 +1,264 @@
 from pathlib import Path
 import pandas as pd
-import re
+from columnar_store import is_columnar_store, read_columnar, ColumnarWriter
+from schema import is_canonical, to_canonical, ensure_canonical
+from snapshots import is_snapshot_store, SnapshotStore
+from column_detection import detect_columns, SchemaMemo, SNIFF_ROWS
 
-def load_sales(csv_path: str):
+# Rows parsed per chunk by the streaming ingestion path
+DEFAULT_CHUNKSIZE = 250_000
+
+# Row numbers kept as examples when reporting validation errors
+MAX_ERROR_EXAMPLES = 5
+
+
+def normalize_sales(df: pd.DataFrame, mapping: dict):
+    """
+    Rename and type-cast a frame with lowercased columns using a mapping from
+    detect_columns. Returns the canonical frame (see schema.py) plus a boolean
+    mask of rows whose date could not be parsed and the number of non-numeric
+    quantities that were replaced with 0, so callers can decide how to report them.
+    """
+    # Standardize column names
+    df = df.rename(columns=mapping)
+
+    # Convert date column to datetime
+    df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    bad_dates = df['date'].isnull()
+
+    # Convert quantity to numeric, replacing non-numeric values with 0
+    df['sold_units'] = pd.to_numeric(df['sold_units'], errors='coerce')
+    null_count = int(df['sold_units'].isnull().sum())
+    if null_count > 0:
+        df['sold_units'] = df['sold_units'].fillna(0)
+
+    # Convert to integers (handles floats if any)
+    df['sold_units'] = df['sold_units'].astype(int)
+
+    # Handle stock column: rows without a stock count leave it unknown (NaN),
+    # so an appended sales-only file does not overwrite the last stock reported
+    if 'current_stock' in df.columns:
+        df['current_stock'] = pd.to_numeric(df['current_stock'], errors='coerce')
+    else:
+        df['current_stock'] = float('nan')
+
+    return to_canonical(df), bad_dates, null_count
+
+
+def load_sales(csv_path: str, memo: SchemaMemo = None):
     """
     Load and validate sales data from CSV or Excel file with flexible column names.
-    
+
     The function tries to automatically detect and map common column name variations.
-    
+
     Required data:
     - Date (or similar like 'Order Date', 'Transaction Date')
     - Product (or similar like 'Item', 'SKU', 'Product Name')
     - Quantity/Sales (or similar like 'Sold_Units', 'Units Sold', 'Qty')
-    
+
     Optional:
     - Current_Stock (or similar like 'On Hand', 'Inventory', 'Stock')
+    - Location (or similar like 'Store', 'Warehouse', 'Site') and Region, for
+      stock and sales tracked per location (see rollup.py)
+
+    Ambiguous column names are settled by sniffing the first rows (see
+    column_detection.py). With a SchemaMemo, files whose header was seen
+    before reuse its mapping without any detection.
+
+    The result is a canonical sales frame (see schema.py): the columns date,
+    product, sold_units and current_stock, plus location and region if the file
+    has them, with fixed dtypes, flagged with the schema version so downstream
+    code can use it without renaming or copying.
+
+    A columnar store directory (see columnar_store.write_columnar), or a snapshot
+    store whose current snapshot is one, holds data that was already normalized,
+    so it is memory-mapped directly without any detection.
+    For files too large to hold in memory use ingest_sales instead.
     """
     try:
         path = Path(csv_path)
         if not path.exists():
             raise FileNotFoundError(f"File not found: {csv_path}")
-        
+
+        if is_snapshot_store(path) or is_columnar_store(path):
+            df = SnapshotStore(path).read() if is_snapshot_store(path) else read_columnar(path)
+            # Stores written before the schema flag existed are cast once here
+            return df if is_canonical(df) else ensure_canonical(df)
+
         # Read the file
         if str(path).lower().endswith('.csv'):
             df = pd.read_csv(path, parse_dates=True)
         else:  # Excel
             df = pd.read_excel(path, parse_dates=True)
-        
+
         if df.empty:
             raise ValueError("The file is empty.")
-        
+
         # Convert column names to lowercase for case-insensitive matching
         df.columns = df.columns.str.lower().str.strip()
-        
-        # Common column name variations
-        date_patterns = ['date', 'order date', 'sale date', 'transaction date', 'day']
-        product_patterns = ['product', 'item', 'sku', 'product name', 'item name', 'product id']
-        quantity_patterns = ['sold_units', 'quantity', 'units sold', 'sold', 'sales quantity', 'qty', 'units']
-        stock_patterns = ['current_stock', 'stock', 'inventory', 'on hand', 'current inventory']
-        
-        # Function to find matching column
-        def find_matching_column(patterns, df_columns):
-            for pattern in patterns:
-                for col in df_columns:
-                    if re.search(pattern, col, re.IGNORECASE):
-                        return col
-            return None
-        
-        # Find matching columns
-        date_col = find_matching_column(date_patterns, df.columns)
-        product_col = find_matching_column(product_patterns, df.columns)
-        quantity_col = find_matching_column(quantity_patterns, df.columns)
-        stock_col = find_matching_column(stock_patterns, df.columns)
-        
-        # Check for required columns
-        missing = []
-        if not date_col:
-            missing.append('date (or similar like Order Date, Transaction Date)')
-        if not product_col:
-            missing.append('product (or similar like Item, SKU, Product Name)')
-        if not quantity_col:
-            missing.append('quantity (or similar like Sold_Units, Units Sold, Qty)')
-            
-        if missing:
-            raise ValueError("Could not find required columns: " + 
-                          ", ".join(missing) + ".\n" +
-                          "Please ensure your file contains date, product, and quantity information.")
-        
-        # Standardize column names
-        df = df.rename(columns={
-            date_col: 'date',
-            product_col: 'product',
-            quantity_col: 'sold_units'
-        })
-        
-        if stock_col:
-            df = df.rename(columns={stock_col: 'current_stock'})
-        
-        # Convert date column to datetime
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-        if df['date'].isnull().any():
+
+        mapping = detect_columns(df.columns, sample=df.head(SNIFF_ROWS), memo=memo)
+        df, bad_dates, null_count = normalize_sales(df, mapping)
+
+        if bad_dates.any():
             raise ValueError("Could not parse date column. Please ensure dates are in a standard format (e.g., YYYY-MM-DD).")
-        
-        # Convert quantity to numeric, replacing non-numeric values with 0 and logging a warning
-        original_count = len(df)
-        df['sold_units'] = pd.to_numeric(df['sold_units'], errors='coerce')
-        
-        # Count and report any non-numeric values
-        null_count = df['sold_units'].isnull().sum()
+
+        # Report any non-numeric values
         if null_count > 0:
             print(f"Warning: Found {null_count} non-numeric values in quantity column. These will be treated as 0.")
-            df['sold_units'] = df['sold_units'].fillna(0)
-        
-        # Convert to integers (handles floats if any)
-        df['sold_units'] = df['sold_units'].astype(int)
-        
+
         # Check if all quantities are zero (which might indicate a parsing issue)
         if (df['sold_units'] == 0).all():
             print("Warning: All quantity values are zero. Please verify your quantity column contains valid numbers.")
-        
-        # Handle stock column
-        if 'current_stock' in df.columns:
-            df['current_stock'] = pd.to_numeric(df['current_stock'], errors='coerce').fillna(0).astype(int)
-        else:
-            df['current_stock'] = 0
-        
+
         return df
-        
+
+    except Exception as e:
+        raise ValueError(f"Error loading file: {str(e)}")
+
+
+class IngestReport:
+    """Totals and validation problems collected across every chunk of an ingestion"""
+
+    def __init__(self):
+        self.rows = 0
+        self.chunks = 0
+        self.bad_dates = 0
+        self.bad_date_rows = []
+        self.non_numeric_quantities = 0
+        self.nonzero_quantities = 0
+
+    def add_chunk(self, offset: int, chunk: pd.DataFrame, bad_dates: pd.Series, null_count: int):
+        self.rows += len(chunk)
+        self.chunks += 1
+        self.non_numeric_quantities += null_count
+        self.nonzero_quantities += int((chunk['sold_units'] != 0).sum())
+
+        bad_count = int(bad_dates.sum())
+        if bad_count:
+            self.bad_dates += bad_count
+            if len(self.bad_date_rows) < MAX_ERROR_EXAMPLES:
+                # +2: one for the header line, one for 1-based line numbers
+                positions = bad_dates.to_numpy().nonzero()[0][:MAX_ERROR_EXAMPLES - len(self.bad_date_rows)]
+                self.bad_date_rows.extend(int(offset + pos + 2) for pos in positions)
+
+    def raise_for_errors(self):
+        if self.rows == 0:
+            raise ValueError("The file is empty.")
+        if self.bad_dates:
+            lines = ', '.join(str(line) for line in self.bad_date_rows)
+            raise ValueError(f"Could not parse date column in {self.bad_dates} rows (e.g. lines {lines}). "
+                             "Please ensure dates are in a standard format (e.g., YYYY-MM-DD).")
+
+    def warnings(self) -> list:
+        messages = []
+        if self.non_numeric_quantities:
+            messages.append(f"Found {self.non_numeric_quantities} non-numeric values in quantity column. "
+                            "These will be treated as 0.")
+        if self.rows and not self.nonzero_quantities:
+            messages.append("All quantity values are zero. Please verify your quantity column contains valid numbers.")
+        return messages
+
+    def to_dict(self) -> dict:
+        return {
+            'rows': self.rows,
+            'chunks': self.chunks,
+            'bad_dates': self.bad_dates,
+            'bad_date_rows': self.bad_date_rows,
+            'non_numeric_quantities': self.non_numeric_quantities,
+            'warnings': self.warnings(),
+        }
+
+
+def iter_sales_chunks(csv_path: str, chunksize: int = DEFAULT_CHUNKSIZE, report: IngestReport = None,
+                      memo: SchemaMemo = None):
+    """
+    Parse a sales CSV in fixed-size chunks, yielding normalized frames.
+
+    The column mapping is detected once from the header and the first rows
+    (or taken from memo). Chunks are read as strings and cast like load_sales
+    does, so every chunk has the same canonical schema whatever pandas would
+    infer for it; columns the mapping does not cover are dropped.
+    Validation problems are accumulated into report rather than raised per chunk.
+    """
+    head = pd.read_csv(csv_path, nrows=SNIFF_ROWS, dtype=str)
+    source_columns = head.columns.str.lower().str.strip()
+    head.columns = source_columns
+    mapping = detect_columns(source_columns, sample=head, memo=memo)
+    report = report if report is not None else IngestReport()
+
+    offset = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=str):
+        chunk.columns = source_columns
+        chunk, bad_dates, null_count = normalize_sales(chunk, mapping)
+        report.add_chunk(offset, chunk, bad_dates, null_count)
+        offset += len(chunk)
+        yield chunk[~bad_dates] if bad_dates.any() else chunk
+
+
+def _report_progress(chunks, report: IngestReport, progress):
+    for chunk in chunks:
+        progress(rows=report.rows, chunks=report.chunks)
+        yield chunk
+
+
+def ingest_sales(csv_path: str, store_dir=None, chunksize: int = DEFAULT_CHUNKSIZE, progress=None,
+                 memo: SchemaMemo = None) -> tuple:
+    """
+    Stream a sales CSV of any size with memory bounded by chunksize.
+
+    With store_dir the normalized rows are appended to a columnar store that is
+    only published once every chunk validated. Without it, rows are aggregated
+    incrementally into per-product, per-day totals (per location, if the file
+    has one; sold units summed, the last stock value kept) and that frame is
+    returned.
+
+    progress, if given, is called as progress(rows=..., chunks=...) after each chunk.
+    memo is a SchemaMemo used for column detection, as in load_sales.
+
+    Returns (frame or None, IngestReport). Raises ValueError if any chunk had
+    unparseable dates, reporting the total across the whole file.
+    """
+    try:
+        path = Path(csv_path)
+        if not path.exists():
+            raise FileNotFoundError(f"File not found: {csv_path}")
+
+        report = IngestReport()
+        chunks = iter_sales_chunks(str(path), chunksize, report, memo=memo)
+        if progress is not None:
+            chunks = _report_progress(chunks, report, progress)
+
+        if store_dir is not None:
+            writer = ColumnarWriter(store_dir)
+            try:
+                for chunk in chunks:
+                    writer.append(chunk)
+                report.raise_for_errors()
+                writer.commit()
+            except Exception:
+                writer.abort()
+                raise
+            result = None
+        else:
+            totals = None
+            for chunk in chunks:
+                keys = [name for name in ('location', 'product', 'date') if name in chunk.columns]
+                columns = {'sold_units': 'sum', 'current_stock': 'last'}
+                if 'region' in chunk.columns:
+                    columns['region'] = 'first'
+                partial = chunk.groupby(keys, sort=False, observed=True).agg(columns)
+                # Fold the chunk into the running totals; size is bounded by (locations x) products x days
+                totals = partial if totals is None else (
+                    pd.concat([totals, partial])
+                    .groupby(level=keys, sort=False)
+                    .agg(columns))
+            report.raise_for_errors()
+            result = to_canonical(totals.sort_index().reset_index())
+
+        for message in report.warnings():
+            print(f"Warning: {message}")
+        return result, report
+
     except Exception as e:
-        raise ValueError(f"Error loading file: {str(e)}")
\ No newline at end of file
+        raise ValueError(f"Error loading file: {str(e)}")
@@ -0,0 +1,141 @@
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+import pandas as pd
+
+from snapshots import is_snapshot_store, SnapshotStore
+
+
+class DatasetCache:
+    """
+    Process-level cache of parsed datasets.
+
+    Entries are keyed on the file's resolved path and validated against its
+    mtime and size (or, for a snapshot store, the id of its current snapshot),
+    so a file rewritten behind our back is re-parsed on the next read while
+    repeated reads of an unchanged file are a dict lookup.
+    """
+
+    def __init__(self, loader: Callable[[str], pd.DataFrame]):
+        self.loader = loader
+        self._entries: Dict[str, Tuple[tuple, pd.DataFrame]] = {}
+        self._derived: Dict[Tuple[str, str], Tuple[tuple, object]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _signature(path: Path) -> tuple:
+        # Snapshot stores are versioned by the snapshot their pointer names
+        if is_snapshot_store(path):
+            return (SnapshotStore(path).current_id(),)
+        # Directory datasets (columnar stores) are versioned by their manifest
+        if path.is_dir():
+            path = path / 'manifest.json'
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _version(signature: tuple) -> str:
+        return '-'.join(str(part) for part in signature)
+
+    def version(self, path) -> str:
+        """Return a cheap identifier for the current contents of path"""
+        return self._version(self._signature(Path(path).resolve()))
+
+    @staticmethod
+    def _source(path: Path, signature: tuple) -> str:
+        # Load the snapshot the signature names, not whatever is current by
+        # the time the loader runs, so an entry never pairs a version with
+        # another version's data
+        if is_snapshot_store(path):
+            return str(SnapshotStore(path).path_for(signature[0]))
+        return str(path)
+
+    def get(self, path) -> pd.DataFrame:
+        """Return the parsed dataset for path, loading it on a miss"""
+        path = Path(path).resolve()
+        return self._get(path, self._signature(path))
+
+    def get_versioned(self, path) -> tuple:
+        """
+        Return (dataset, version) for path, version identifying the data
+        returned even if path changes while it loads
+        """
+        path = Path(path).resolve()
+        signature = self._signature(path)
+        return self._get(path, signature), self._version(signature)
+
+    def _get(self, path: Path, signature: tuple) -> pd.DataFrame:
+        key = str(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Parse outside the lock so slow loads do not block other readers
+        df = self.loader(self._source(path, signature))
+
+        with self._lock:
+            self._entries[key] = (signature, df)
+        return df
+
+    def derive(self, path, name: str, builder: Callable[..., object], versioned: bool = False):
+        """
+        Return builder(dataset) for the current version of path, building it at
+        most once per version. Use this for indexes and other structures that
+        are expensive to compute but only change when the dataset does.
+
+        With versioned=True the builder is called as builder(dataset, version),
+        version being that of the dataset it is given, for builders that
+        persist what they build under it.
+        """
+        path = Path(path).resolve()
+        key = (str(path), name)
+        signature = self._signature(path)
+
+        with self._lock:
+            entry = self._derived.get(key)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+
+        df = self._get(path, signature)
+        value = builder(df, self._version(signature)) if versioned else builder(df)
+
+        with self._lock:
+            self._derived[key] = (signature, value)
+        return value
+
+    def put(self, path, df: pd.DataFrame):
+        """Swap in an already-parsed dataset for a file that was just written"""
+        path = Path(path).resolve()
+        signature = self._signature(path)
+        with self._lock:
+            self._entries[str(path)] = (signature, df)
+
+    def invalidate(self, path=None):
+        """Drop the entry for path, or every entry if no path is given"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._derived.clear()
+            else:
+                key = str(Path(path).resolve())
+                self._entries.pop(key, None)
+                for derived_key in [k for k in self._derived if k[0] == key]:
+                    del self._derived[derived_key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'derived': len(self._derived),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
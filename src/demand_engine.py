@@ -1,5 +1,49 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import shared_memory
 import pandas as pd
 import numpy as np
+from demand_matrix import DemandMatrix, UNITS_DTYPE
+from smoothing import FORECASTERS, history_matrix
+from backtest import DEFAULT_WINDOWS, DEFAULT_HORIZONS, rolling_sma, item_positions, shift_forward, rolling_origin_scores
+
+# Execution backends accepted by DemandEngine.run
+BACKENDS = ('serial', 'thread', 'process')
+
+# Forecasting methods accepted by DemandEngine.run; see smoothing.py for all but 'sma'
+FORECAST_METHODS = ('sma',) + tuple(FORECASTERS)
+
+# Shards per worker; more shards than workers evens out uneven items
+SHARDS_PER_WORKER = 4
+
+
+def _forecast_rows(units: np.ndarray, first_day: np.ndarray, window: int):
+    """
+    Trailing-window SMA forecast and demand std for a block of demand matrix
+    rows.
+
+    The block is wrapped as a DemandMatrix and reduced with its own
+    trailing_mean and std, the kernels the serial path runs over the whole
+    matrix. Every reduction is per row, so results do not depend on how rows
+    are sharded.
+    """
+    block = DemandMatrix(pd.RangeIndex(len(units)), 0, units, None, first_day, None)
+    return block.trailing_mean(window), block.std()
+
+
+def _forecast_shared_shard(shm_name: str, shape: tuple, row_start: int, row_end: int,
+                           first_day: np.ndarray, window: int):
+    """Process-pool entry point: attach to the shared demand matrix and forecast one block of rows"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        units = np.ndarray(shape, dtype=UNITS_DTYPE, buffer=shm.buf)
+        # Results are fresh arrays, so no view into the shared buffer outlives it
+        result = _forecast_rows(units[row_start:row_end], first_day, window)
+        del units
+        return result
+    finally:
+        shm.close()
+
 
 class DemandEngine:
     def __init__(self, df: pd.DataFrame, window: int = 7):
@@ -9,39 +53,143 @@ class DemandEngine:
         - Date
         - QuantitySold
         """
-        self.df = df.copy()
+        self._df = self._prepare(df)
         self.window = window
+        self._pending = []
+        self._matrix = None
 
-        if not {"Item", "Date", "QuantitySold"}.issubset(self.df.columns):
+    @staticmethod
+    def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+        if not {"Item", "Date", "QuantitySold"}.issubset(df.columns):
             raise ValueError("DataFrame must contain Item, Date, and QuantitySold columns.")
+        df = df.copy()
+        df['Date'] = pd.to_datetime(df['Date'])
+        df.sort_values(['Item', 'Date'], inplace=True, kind='stable')
+        return df
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """Full history, with any appended deltas merged in on first access"""
+        if self._pending:
+            self._df = pd.concat([self._df] + self._pending).sort_values(['Item', 'Date'], kind='stable')
+            self._pending = []
+        return self._df
+
+    @property
+    def matrix(self) -> DemandMatrix:
+        """
+        Daily demand per item with same-day rows summed and days without
+        sales as zero. Every statistic and forecast reads from it; it is
+        built once and then extended from appended deltas.
+        """
+        if self._matrix is None:
+            self._matrix = DemandMatrix.from_frame(self.df, key='Item', date='Date', value='QuantitySold', stock=None)
+        return self._matrix
+
+    def append(self, delta: pd.DataFrame):
+        """
+        Add newer rows to the history. The demand matrix is extended in
+        O(delta) plus one array copy; the full history is only re-merged when
+        something needs it.
+        """
+        delta = self._prepare(delta)
+        if self._matrix is not None:
+            self._matrix = self._matrix.extend(delta, key='Item', date='Date', value='QuantitySold', stock=None)
+        self._pending.append(delta)
 
-        self.df['Date'] = pd.to_datetime(self.df['Date'])
-        self.df.sort_values(['Item', 'Date'], inplace=True)
+    def _item_layout(self):
+        """
+        Return (items, starts, ends, values) for the daily demand: item i's
+        days from its first sale on are the contiguous slice values[starts[i]:ends[i]].
+        """
+        items, starts, ends, values, _ = self.matrix.layout()
+        return items, starts, ends, values
 
     def calculate_sma_demand(self) -> pd.DataFrame:
-        """Calculate Simple Moving Average demand for each item"""
-        sma_df = (
-            self.df.groupby('Item')
-            .apply(lambda x: x.set_index('Date')['QuantitySold'].rolling(self.window).mean().iloc[-1])
-            .reset_index(name='ForecastDemand')
-        )
+        """Calculate Simple Moving Average demand over the last `window` days for each item"""
+        sma_df = pd.DataFrame({'Item': self.matrix.products, 'ForecastDemand': self.matrix.trailing_mean(self.window)})
         return sma_df
 
+    def fit_forecaster(self, method: str, **options):
+        """
+        Fit one of the smoothing forecasters ('ses', 'holt', 'holt_winters') to
+        every item at once, with smoothing parameters grid-searched per item.
+        options are passed to the forecaster, e.g. grid= or season_length=.
+
+        Returns (items, fitted forecaster), rows of its arrays following items.
+        """
+        if method not in FORECASTERS:
+            raise ValueError(f"method must be one of {', '.join(FORECASTERS)}")
+        items, starts, ends, values = self._item_layout()
+        return items, FORECASTERS[method](**options).fit(history_matrix(values, starts, ends))
+
+    def calculate_forecast_demand(self, method: str = 'sma', horizon: int = 1, **options) -> pd.DataFrame:
+        """
+        Forecast daily demand per item as the mean forecast over the next
+        `horizon` days; demand is never forecast below zero. 'sma' is the
+        trailing SMA, which is flat, so the horizon does not change it.
+        """
+        if method == 'sma':
+            return self.calculate_sma_demand()
+        items, forecaster = self.fit_forecaster(method, **options)
+        forecast = np.clip(forecaster.forecast(max(int(horizon), 1)), 0, None).mean(axis=1)
+        return pd.DataFrame({'Item': items, 'ForecastDemand': forecast})
+
+    def calculate_rolling_sma(self) -> pd.DataFrame:
+        """
+        Calculate the full trailing Simple Moving Average series for every item,
+        one row per active day, NaN until an item has a full window.
+        """
+        items, starts, ends, values, days = self.matrix.layout()
+        sma = rolling_sma(values, starts, ends, self.window)
+
+        return pd.DataFrame({
+            'Item': np.repeat(np.asarray(items), ends - starts),
+            'Date': self._dates(days),
+            'SMA': sma,
+        })
+
+    def _dates(self, days: np.ndarray) -> np.ndarray:
+        return (self.matrix.start + days).astype('datetime64[ns]')
+
+    def backtest(self, windows=DEFAULT_WINDOWS, horizons=DEFAULT_HORIZONS, holdout: int = None) -> pd.DataFrame:
+        """
+        Score SMA forecasts for every item by rolling-origin backtesting.
+
+        Each day is a forecast origin; the SMA of each window of days is
+        compared with the actual demand `horizon` days later. All items are scored
+        together with array operations (see backtest.rolling_origin_scores).
+
+        Returns one row per item, window and horizon with Count, MAE, MAPE and Bias.
+        """
+        items, starts, ends, values = self._item_layout()
+        return rolling_origin_scores(items, starts, ends, values, windows, horizons, holdout)
+
+    def backtest_forecasts(self, window: int = None, horizon: int = 1) -> pd.DataFrame:
+        """
+        Historical forecasts as Item, Date and Forecast: for every day, the
+        SMA over `window` days (default: self.window) made `horizon` days
+        earlier. Days without enough history are left out. This is the
+        forecast_df Visualizer.plot_forecast_accuracy expects.
+        """
+        window = window or self.window
+        items, starts, ends, values, days = self.matrix.layout()
+        forecast = shift_forward(rolling_sma(values, starts, ends, window), item_positions(starts, ends), horizon)
+
+        has_forecast = ~np.isnan(forecast)
+        return pd.DataFrame({
+            'Item': np.repeat(np.asarray(items), ends - starts)[has_forecast],
+            'Date': self._dates(days[has_forecast]),
+            'Forecast': forecast[has_forecast],
+        })
+
     def calculate_average_daily_demand(self) -> pd.DataFrame:
-        avg_df = (
-            self.df.groupby('Item')['QuantitySold']
-            .mean()
-            .reset_index(name='AvgDailyDemand')
-        )
+        avg_df = pd.DataFrame({'Item': self.matrix.products, 'AvgDailyDemand': self.matrix.mean()})
         return avg_df
 
     def calculate_std_dev(self) -> pd.DataFrame:
-        std_df = (
-            self.df.groupby('Item')['QuantitySold']
-            .std()
-            .fillna(0)
-            .reset_index(name='DemandStdDev')
-        )
+        std_df = pd.DataFrame({'Item': self.matrix.products, 'DemandStdDev': self.matrix.std()})
+        std_df['DemandStdDev'] = std_df['DemandStdDev'].fillna(0)
         return std_df
 
     def calculate_safety_stock(self, demand_std: pd.DataFrame, z_value: float = 1.65) -> pd.DataFrame:
@@ -54,9 +202,120 @@ class DemandEngine:
         reorder_df['ReorderPoint'] = reorder_df['ForecastDemand'] * lead_time_days + reorder_df['SafetyStock']
         return reorder_df[['Item', 'ForecastDemand', 'SafetyStock', 'ReorderPoint']]
 
-    def run(self, lead_time_days: int = 5, z_value: float = 1.65) -> pd.DataFrame:
-        sma_demand = self.calculate_sma_demand()
-        demand_std = self.calculate_std_dev()
+    def _shards(self, lengths: np.ndarray, n_shards: int):
+        """Split items into contiguous shards holding roughly equal numbers of rows"""
+        cumulative = np.cumsum(lengths)
+        targets = cumulative[-1] * np.arange(1, n_shards) / n_shards
+        bounds = np.unique(np.r_[0, np.searchsorted(cumulative, targets, side='right'), len(lengths)])
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def _parallel_statistics(self, backend: str, workers: int):
+        """
+        Compute SMA forecasts and demand std with the demand matrix rows
+        sharded across workers. Shards are merged back in item order, so the
+        output is deterministic and equal to the serial path's.
+        """
+        matrix = self.matrix
+        lengths = matrix.active_days
+        shards = self._shards(lengths, max(1, workers * SHARDS_PER_WORKER)) if len(matrix) else []
+
+        if backend == 'thread':
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_forecast_rows, matrix.units[a:b], matrix.first_day[a:b], self.window)
+                           for a, b in shards]
+                parts = [future.result() for future in futures]
+        else:
+            # Workers map the matrix from shared memory instead of receiving a pickled copy.
+            # The rows are copied straight into the segment, the only copy made
+            shape = matrix.units.shape
+            nbytes = int(np.prod(shape)) * np.dtype(UNITS_DTYPE).itemsize
+            shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+            try:
+                shared = np.ndarray(shape, dtype=UNITS_DTYPE, buffer=shm.buf)
+                np.copyto(shared, matrix.units)
+                del shared  # The segment cannot be closed while a view into it exists
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = [pool.submit(_forecast_shared_shard, shm.name, shape, int(a), int(b),
+                                           matrix.first_day[a:b], self.window)
+                               for a, b in shards]
+                    parts = [future.result() for future in futures]
+            finally:
+                shm.close()
+                shm.unlink()
+
+        if parts:
+            forecast, std = (np.concatenate(arrays) for arrays in zip(*parts))
+        else:
+            forecast = std = np.empty(0)
+
+        sma_demand = pd.DataFrame({'Item': matrix.products, 'ForecastDemand': forecast})
+        demand_std = pd.DataFrame({'Item': matrix.products, 'DemandStdDev': std}).fillna({'DemandStdDev': 0})
+        return sma_demand, demand_std
+
+    def run(self, lead_time_days: int = 5, z_value: float = 1.65, backend: str = 'serial',
+            workers: int = None, method: str = 'sma') -> pd.DataFrame:
+        """
+        Compute forecast demand, safety stock and reorder point per item.
+
+        method selects the forecaster: 'sma' (trailing moving average), or
+        'ses', 'holt' or 'holt_winters' exponential smoothing, for which
+        ForecastDemand is the mean daily forecast over the lead time.
+
+        backend selects how per-item SMA forecasting is executed: 'serial' in
+        this process, or sharded across a 'thread' or 'process' pool of
+        `workers` (default: CPU count). All backends give identical output.
+        The smoothing methods are already batched across items and ignore it.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"backend must be one of {', '.join(BACKENDS)}")
+        if method not in FORECAST_METHODS:
+            raise ValueError(f"method must be one of {', '.join(FORECAST_METHODS)}")
+
+        if method != 'sma':
+            sma_demand = self.calculate_forecast_demand(method, horizon=lead_time_days)
+            demand_std = self.calculate_std_dev()
+        elif backend == 'serial':
+            sma_demand = self.calculate_sma_demand()
+            demand_std = self.calculate_std_dev()
+        else:
+            sma_demand, demand_std = self._parallel_statistics(backend, workers or os.cpu_count() or 1)
+
         safety_stock = self.calculate_safety_stock(demand_std, z_value)
         result = self.calculate_reorder_point(sma_demand, safety_stock, lead_time_days)
-        return result
\ No newline at end of file
+        return result
+
+    def sweep(self, lead_times, z_values, as_array: bool = False):
+        """
+        Reorder points for every combination of lead time and z-value.
+
+        Demand statistics are computed once and broadcast over the grid, so a
+        sweep of thousands of scenarios costs about as much as a single run().
+
+        Returns a tidy DataFrame with one row per item, lead time and z-value,
+        or with as_array=True a tuple (items, reorder_points) where
+        reorder_points has shape (items, lead_times, z_values).
+        """
+        lead_times = np.asarray(lead_times, dtype=float)
+        z_values = np.asarray(z_values, dtype=float)
+
+        sma_demand = self.calculate_sma_demand()
+        demand_std = self.calculate_std_dev().set_index('Item')['DemandStdDev'].reindex(sma_demand['Item'])
+        forecast = sma_demand['ForecastDemand'].to_numpy(dtype=float)
+        std = demand_std.to_numpy(dtype=float)
+
+        # (items, 1, 1) * (1, lead, 1) + (items, 1, 1) * (1, 1, z)
+        safety_stock = std[:, None, None] * z_values[None, None, :]
+        reorder_points = forecast[:, None, None] * lead_times[None, :, None] + safety_stock
+
+        if as_array:
+            return sma_demand['Item'].to_numpy(), reorder_points
+
+        n_items, n_lead, n_z = reorder_points.shape
+        return pd.DataFrame({
+            'Item': np.repeat(sma_demand['Item'].to_numpy(), n_lead * n_z),
+            'LeadTimeDays': np.tile(np.repeat(lead_times, n_z), n_items),
+            'ZValue': np.tile(z_values, n_items * n_lead),
+            'ForecastDemand': np.repeat(forecast, n_lead * n_z),
+            'SafetyStock': np.broadcast_to(safety_stock, reorder_points.shape).ravel(),
+            'ReorderPoint': reorder_points.ravel(),
+        })
@@ -0,0 +1,492 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Storage types of the dense arrays: sold units per day, and stock at the end of each day
+UNITS_DTYPE = np.float32
+STOCK_DTYPE = np.int32
+
+# Longest calendar a matrix holds (about 20 years); a longer span is almost
+# always a mistyped date, and every day costs a column for every product
+MAX_CALENDAR_DAYS = 366 * 20
+
+# Spare day columns allocated past the last day, so appended days usually
+# fit in place: at least a month, or a quarter of the calendar
+MIN_SPARE_DAYS = 31
+SPARE_DAYS_FRACTION = 0.25
+
+
+def _sorted_keys(uniques) -> pd.Index:
+    """Product labels sorted as a groupby would sort them, falling back to their text for mixed types"""
+    index = pd.Index(np.asarray(uniques))
+    try:
+        return index.sort_values()
+    except TypeError:
+        return index[np.argsort(index.astype(str), kind='stable')]
+
+
+class OutOfOrderStock(ValueError):
+    """Raised by extend() for a location stock reported before that location's last report"""
+
+
+class _Rows:
+    """Rows of a sales frame reduced to array form: product codes, day numbers, units, stock and locations"""
+
+    def __init__(self, df: pd.DataFrame, key: str, date: str, value: str, stock: str, location: str):
+        codes, uniques = pd.factorize(df[key])
+        days = pd.to_datetime(df[date]).to_numpy(dtype='datetime64[D]').astype(np.int64)
+        keep = (codes >= 0) & (days != np.datetime64('NaT').astype(np.int64))
+        self.products = _sorted_keys(uniques)
+        self.codes = self.products.get_indexer(np.asarray(uniques))[codes[keep]]
+        self.days = days[keep]
+        # Missing quantities count as no sales rather than poisoning the whole day
+        units = pd.to_numeric(df[value], errors='coerce').to_numpy(dtype=np.float64)[keep]
+        self.units = np.nan_to_num(units, nan=0.0)
+        self.stock = None
+        if stock and stock in df.columns:
+            self.stock = pd.to_numeric(df[stock], errors='coerce').to_numpy(dtype=np.float64)[keep]
+        # Location of each row as a code into location_labels, where '' stands
+        # for rows without one; None if the frame has no locations
+        self.locations = self.location_labels = None
+        if location and location in df.columns:
+            location_codes, labels = pd.factorize(df[location])
+            self.location_labels = np.append(np.asarray(labels).astype(str).astype(object), '')
+            self.locations = np.where(location_codes < 0, len(labels), location_codes)[keep]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+class _Storage:
+    """
+    Backing arrays of a matrix, with spare columns past its last day.
+
+    Matrices extended from one another share it: each is a view of the first
+    columns, and only the matrix that claimed the most columns may write
+    into the spare ones, which no other view can see.
+    """
+
+    def __init__(self, n_products: int, n_days: int, has_stock: bool):
+        capacity = n_days + max(MIN_SPARE_DAYS, int(n_days * SPARE_DAYS_FRACTION))
+        self.units = np.zeros((n_products, capacity), dtype=UNITS_DTYPE)
+        self.stock = np.zeros((n_products, capacity), dtype=STOCK_DTYPE) if has_stock else None
+        self.claimed = n_days
+        self.lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.units.shape[1]
+
+    def claim(self, n_days: int, new_days: int) -> bool:
+        """Claim columns up to new_days for the matrix that holds the first n_days; False if another did"""
+        with self.lock:
+            if self.claimed != n_days or new_days > self.capacity:
+                return False
+            self.claimed = new_days
+            return True
+
+
+class _LocationStock:
+    """
+    Last stock reported by every (product, location) pair of data with
+    locations, where a product's stock is the sum over its locations
+    """
+
+    def __init__(self, pairs: pd.MultiIndex, stock: np.ndarray, day: np.ndarray):
+        self.pairs = pairs
+        self.stock = stock
+        # Calendar day number (days since the epoch) of each pair's last report
+        self.day = day
+
+    @classmethod
+    def empty(cls) -> '_LocationStock':
+        return cls(pd.MultiIndex.from_arrays([[], []]), np.zeros(0), np.zeros(0, dtype=np.int64))
+
+    @classmethod
+    def from_products(cls, matrix: 'DemandMatrix') -> '_LocationStock':
+        """Pairs of a matrix built without locations: its stock reports all come from one unnamed location"""
+        known = matrix.stock_day >= 0
+        pairs = pd.MultiIndex.from_arrays([matrix.products[known], np.full(int(known.sum()), '', dtype=object)])
+        start = int(matrix.start.astype(np.int64))
+        return cls(pairs, matrix.current_stock[known].astype(np.float64), matrix.stock_day[known] + start)
+
+    def events(self, rows: _Rows):
+        """
+        The stock reports of rows as changes to their products' stock. Returns
+        the rows reporting, the change each makes from its day on, and the
+        state after them. Raises OutOfOrderStock if a location reports a day
+        before its last report, whose later days cannot be recovered.
+        """
+        known = np.flatnonzero(~np.isnan(rows.stock))
+        if rows.locations is not None:
+            locations, location_labels = rows.locations[known], rows.location_labels
+        else:
+            locations, location_labels = np.zeros(len(known), dtype=np.int64), np.array([''], dtype=object)
+        row_pairs, pair_keys = pd.factorize(rows.codes[known] * len(location_labels) + locations)
+        uniques = pd.MultiIndex.from_arrays([rows.products[pair_keys // len(location_labels)],
+                                             location_labels[pair_keys % len(location_labels)]])
+        positions = self.pairs.get_indexer(uniques)
+        new = positions < 0
+        positions[new] = len(self.pairs) + np.arange(int(new.sum()))
+        pairs = self.pairs.append(uniques[new]) if new.any() else self.pairs
+        stock = np.concatenate([self.stock, np.zeros(int(new.sum()))])
+        day = np.concatenate([self.day, np.full(int(new.sum()), np.iinfo(np.int64).min)])
+        row_pairs = positions[row_pairs]
+
+        # The last report of each pair on each day, in day order within each pair
+        days = rows.days[known]
+        order = np.lexsort((known, days, row_pairs))
+        last = np.r_[(row_pairs[order][1:] != row_pairs[order][:-1]) | (days[order][1:] != days[order][:-1]), True]
+        reports = order[last]
+        report_pairs, report_days = row_pairs[reports], days[reports]
+        first = np.r_[True, report_pairs[1:] != report_pairs[:-1]]
+        if (report_days[first] < day[report_pairs[first]]).any():
+            raise OutOfOrderStock("A location's stock was reported for a day before its last report")
+
+        values = rows.stock[known[reports]]
+        previous = np.where(first, stock[report_pairs], np.r_[0.0, values[:-1]])
+        stock[report_pairs] = values
+        day[report_pairs] = report_days
+        return known[reports], values - previous, _LocationStock(pairs, stock, day)
+
+
+def _check_span(first: int, last: int):
+    if last - first + 1 > MAX_CALENDAR_DAYS:
+        first, last = (np.datetime64(day, 'D') for day in (first, last))
+        raise ValueError(f"Sales dates run from {first} to {last}, more than {MAX_CALENDAR_DAYS} days; "
+                         "please check the file for mistyped dates.")
+
+
+def _apply_stock(stock: np.ndarray, codes: np.ndarray, days: np.ndarray, values: np.ndarray):
+    """
+    Write stock values given on (row, column) of a window of the stock array
+    and carry each forward to the window's end. The day's stock is the last
+    value given for it.
+    """
+    n_products, width = stock.shape
+    cells = codes * width + days
+    last_rows = np.flatnonzero(~pd.Series(cells).duplicated(keep='last').to_numpy())
+    given = np.zeros((n_products, width), dtype=bool)
+    given.flat[cells[last_rows]] = True
+    day_stock = np.zeros((n_products, width), dtype=STOCK_DTYPE)
+    day_stock.flat[cells[last_rows]] = values[last_rows].astype(STOCK_DTYPE)
+    # Forward fill from the days a stock was given for
+    source = np.where(given, np.arange(width, dtype=np.int32), -1)
+    np.maximum.accumulate(source, axis=1, out=source)
+    filled = source >= 0
+    stock[filled] = day_stock[np.nonzero(filled)[0], source[filled]]
+
+
+class DemandMatrix:
+    """
+    Daily demand of every product as a dense (products x calendar days) array.
+
+    Sales of a product on the same day are summed and days without sales are
+    zero, so means, deviations and moving averages are true daily rates
+    rather than averages over whatever rows happened to exist. A product is
+    active from its first day with a row to the last day of the dataset;
+    earlier days are zero in the arrays but excluded from its statistics.
+
+    - products: row labels, sorted
+    - start: first calendar day (numpy datetime64[D])
+    - units: float32 sold units, shape (products, days)
+    - stock: int32 stock at the end of each day, carried forward over days
+      without rows (None if the data had no stock column)
+    - first_day: column of each product's first active day
+    - current_stock: each product's last reported stock, from the last row
+      giving one on the latest day that has one (NaN if unknown)
+    - stock_day: column of the day current_stock was reported on (-1 if unknown)
+
+    With a location column the stock of a product on a day is the sum of the
+    last stock each of its locations reported, as in the network level of a
+    LocationRollup, and locations without a report count as 0.
+
+    Build it once per dataset version. Each product's sum and sum of squares
+    of daily units are kept up to date as rows are added, so mean() and std()
+    cost O(products); the other statistics are reductions over one axis of
+    the arrays.
+    """
+
+    def __init__(self, products: pd.Index, start, units: np.ndarray, stock, first_day: np.ndarray,
+                 current_stock: np.ndarray, stock_day: np.ndarray = None, storage: _Storage = None,
+                 sums: np.ndarray = None, squares: np.ndarray = None, location_stock: _LocationStock = None):
+        self.products = products
+        self.start = np.datetime64(start, 'D')
+        self.units = units
+        self.stock = stock
+        self.first_day = first_day
+        self.current_stock = current_stock
+        self.stock_day = stock_day
+        self._storage = storage
+        # Per product sum and sum of squares of units, computed from the arrays if not given
+        if sums is None:
+            sums = units.sum(axis=1, dtype=np.float64)
+            squares = np.square(units, dtype=np.float64).sum(axis=1)
+        self._sums = sums
+        self._squares = squares
+        self._location_stock = location_stock
+        self._codes = None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, key: str = 'product', date: str = 'date', value: str = 'sold_units',
+                   stock: str = 'current_stock', location: str = 'location') -> 'DemandMatrix':
+        """Build the matrix from a sales frame in one pass"""
+        return cls.empty(has_stock=bool(stock and stock in df.columns)).extend(
+            df, key=key, date=date, value=value, stock=stock, location=location)
+
+    @classmethod
+    def empty(cls, has_stock: bool = True) -> 'DemandMatrix':
+        return cls(pd.Index([]), np.datetime64(0, 'D'), np.zeros((0, 0), dtype=UNITS_DTYPE),
+                   np.zeros((0, 0), dtype=STOCK_DTYPE) if has_stock else None,
+                   np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0, dtype=np.int64))
+
+    def extend(self, delta: pd.DataFrame, key: str = 'product', date: str = 'date', value: str = 'sold_units',
+               stock: str = 'current_stock', location: str = 'location') -> 'DemandMatrix':
+        """
+        Return a new matrix with delta's rows added; this one is left untouched,
+        so readers holding it are unaffected.
+
+        Units are added to the days they fall on. A stock value in delta
+        replaces the stock from its day on, until the next day delta gives one,
+        since appended rows are the newest information, and becomes a product's
+        current stock unless the matrix already has one from a later day.
+        With locations, a stock value replaces that of its location instead;
+        one for a day before the location's last report raises
+        OutOfOrderStock, and the matrix must be rebuilt from the full history.
+
+        A delta of later days for known products is written into spare columns
+        of the arrays, in O(delta) plus O(products); the arrays are only copied
+        when the spare columns run out, which grows them by a fraction of the
+        calendar. Any other delta copies them. Raises ValueError if the
+        calendar would exceed MAX_CALENDAR_DAYS.
+        """
+        rows = _Rows(delta, key, date, value, stock if self.stock is not None else None, location)
+        if len(rows) == 0:
+            return self
+
+        events, location_stock = None, self._location_stock
+        if rows.stock is not None and (rows.locations is not None or location_stock is not None):
+            if location_stock is None:
+                location_stock = _LocationStock.from_products(self) if len(self) else _LocationStock.empty()
+            events = location_stock.events(rows)
+            location_stock = events[2]
+
+        old_start = int(self.start.astype(np.int64))
+        if self.n_days and int(rows.days.min()) >= old_start + self.n_days:
+            extended = self._extend_days(rows, events, location_stock)
+            if extended is not None:
+                return extended
+
+        # Union of products and of the calendar
+        products = self.products.append(rows.products).unique() if len(self.products) else rows.products
+        if len(self.products):
+            products = _sorted_keys(products)
+        first = int(rows.days.min()) if not self.n_days else min(old_start, int(rows.days.min()))
+        last = int(rows.days.max()) if not self.n_days else max(old_start + self.n_days - 1, int(rows.days.max()))
+        _check_span(first, last)
+        n_products, n_days = len(products), last - first + 1
+
+        old_rows = products.get_indexer(self.products)
+        offset = int(old_start - first) if self.n_days else 0
+        old_columns = slice(offset, offset + self.n_days)
+        codes = products.get_indexer(rows.products)[rows.codes]
+        days = rows.days - first
+
+        storage = _Storage(n_products, n_days, self.stock is not None)
+        units = storage.units[:, :n_days]
+        units[old_rows, old_columns] = self.units
+        stock_matrix = None
+        if self.stock is not None:
+            stock_matrix = storage.stock[:, :n_days]
+            stock_matrix[old_rows, old_columns] = self.stock
+            if self.n_days and offset + self.n_days < n_days:
+                # Carry the last known stock into the new days
+                stock_matrix[old_rows, offset + self.n_days:] = self.stock[:, -1:]
+
+        first_day = np.full(n_products, n_days, dtype=np.int64)
+        first_day[old_rows] = self.first_day + offset
+        current_stock = np.full(n_products, np.nan)
+        current_stock[old_rows] = self.current_stock
+        stock_day = np.full(n_products, -1, dtype=np.int64)
+        stock_day[old_rows] = np.where(self.stock_day >= 0, self.stock_day + offset, -1)
+        sums, squares = np.zeros(n_products), np.zeros(n_products)
+        sums[old_rows], squares[old_rows] = self._sums, self._squares
+
+        self._add_rows(rows, codes, days, units, stock_matrix, first_day, current_stock, stock_day, sums, squares,
+                       events=events)
+        return DemandMatrix(products, np.datetime64(first, 'D'), units, stock_matrix, first_day, current_stock,
+                            stock_day, storage, sums, squares, location_stock)
+
+    def _extend_days(self, rows: _Rows, events, location_stock):
+        """
+        Extend with rows that all fall after the last day, writing them into
+        the spare columns of the storage; None if they hold new products
+        """
+        codes = self.products.get_indexer(rows.products)
+        if (codes < 0).any():
+            return None
+        codes = codes[rows.codes]
+        old_start = int(self.start.astype(np.int64))
+        _check_span(old_start, int(rows.days.max()))
+        n_days = int(rows.days.max()) - old_start + 1
+
+        storage = self._storage
+        if storage is None or not storage.claim(self.n_days, n_days):
+            # Out of spare columns, or another matrix claimed them: move to new storage
+            storage = _Storage(len(self), n_days, self.stock is not None)
+            storage.units[:, :self.n_days] = self.units
+            if self.stock is not None:
+                storage.stock[:, :self.n_days] = self.stock
+
+        units = storage.units[:, :n_days]
+        stock_matrix = None
+        if self.stock is not None:
+            stock_matrix = storage.stock[:, :n_days]
+            # Carry the last known stock into the new days
+            stock_matrix[:, self.n_days:] = stock_matrix[:, self.n_days - 1:self.n_days]
+
+        first_day, current_stock, stock_day = self.first_day.copy(), self.current_stock.copy(), self.stock_day.copy()
+        sums, squares = self._sums.copy(), self._squares.copy()
+        self._add_rows(rows, codes, rows.days - old_start, units, stock_matrix, first_day, current_stock, stock_day,
+                       sums, squares, window=self.n_days, events=events)
+        return DemandMatrix(self.products, self.start, units, stock_matrix, first_day, current_stock, stock_day,
+                            storage, sums, squares, location_stock)
+
+    @staticmethod
+    def _add_rows(rows: _Rows, codes: np.ndarray, days: np.ndarray, units: np.ndarray, stock_matrix,
+                  first_day: np.ndarray, current_stock: np.ndarray, stock_day: np.ndarray, sums: np.ndarray,
+                  squares: np.ndarray, window: int = None, events=None):
+        """
+        Add rows, on product rows codes and day columns days, into the arrays
+        of a matrix and its running sums, touching only the columns from
+        window (default: the first day of the rows) on. events are the rows'
+        location stock reports as changes, from _LocationStock.events.
+        """
+        n_products, n_days = units.shape
+        window = int(days.min()) if window is None else window
+        width = n_days - window
+        block = units[:, window:]
+        before_sums = block.sum(axis=1, dtype=np.float64)
+        before_squares = np.square(block, dtype=np.float64).sum(axis=1)
+        block += np.bincount(codes * width + days - window, weights=rows.units,
+                             minlength=n_products * width).reshape(n_products, width).astype(UNITS_DTYPE)
+        sums += block.sum(axis=1, dtype=np.float64) - before_sums
+        squares += np.square(block, dtype=np.float64).sum(axis=1) - before_squares
+        np.minimum.at(first_day, codes, days)
+
+        if stock_matrix is None or rows.stock is None:
+            return
+        if events is not None:
+            # Each report changes its product's stock from its day on by the change at its location
+            reports, changes = events[0], events[1]
+            if not len(reports):
+                return
+            cells = codes[reports] * width + days[reports] - window
+            changed = np.bincount(cells, weights=changes, minlength=n_products * width).reshape(n_products, width)
+            stock_matrix[:, window:] += np.cumsum(changed, axis=1).astype(STOCK_DTYPE)
+            reported = np.unique(codes[reports])
+            current_stock[reported] = np.nan_to_num(current_stock[reported])
+            np.add.at(current_stock, codes[reports], changes)
+            np.maximum.at(stock_day, codes[reports], days[reports])
+            return
+        known = np.flatnonzero(~np.isnan(rows.stock))
+        if not len(known):
+            return
+        _apply_stock(stock_matrix[:, window:], codes[known], days[known] - window, rows.stock[known])
+        # Each product's latest stock in the rows: the last row giving one on its latest such day
+        order = known[np.lexsort((known, days[known], codes[known]))]
+        latest = order[np.r_[codes[order][1:] != codes[order][:-1], True]]
+        newer = days[latest] >= stock_day[codes[latest]]
+        current_stock[codes[latest[newer]]] = rows.stock[latest[newer]]
+        stock_day[codes[latest[newer]]] = days[latest[newer]]
+
+    @property
+    def n_days(self) -> int:
+        return self.units.shape[1]
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        return pd.date_range(pd.Timestamp(self.start), periods=self.n_days, freq='D')
+
+    @property
+    def active_days(self) -> np.ndarray:
+        """Days each product has been active, its first day included"""
+        return self.n_days - self.first_day
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def code(self, product):
+        """Row of a product, matched exactly or else ignoring case; None if unknown"""
+        if self._codes is None:
+            labels = self.products.astype(str)
+            lowered = {}
+            for row, label in enumerate(labels):
+                lowered.setdefault(label.lower(), row)
+            self._codes = (dict(zip(labels, range(len(labels)))), lowered)
+        exact, lowered = self._codes
+        row = exact.get(str(product))
+        return row if row is not None else lowered.get(str(product).lower())
+
+    def series(self, product) -> pd.DataFrame:
+        """
+        One product's active days as date, product, sold_units and current_stock
+        (if known) columns; empty if the product is unknown.
+        """
+        row = self.code(product)
+        if row is None:
+            return pd.DataFrame(columns=['date', 'product', 'sold_units', 'current_stock'])
+        days = slice(int(self.first_day[row]), self.n_days)
+        frame = pd.DataFrame({
+            'date': self.dates[days],
+            'product': self.products[row],
+            'sold_units': self.units[row, days],
+        })
+        if self.stock is not None:
+            frame['current_stock'] = self.stock[row, days]
+        return frame
+
+    def _active_mask(self) -> np.ndarray:
+        return np.arange(self.n_days) >= self.first_day[:, None]
+
+    def totals(self) -> np.ndarray:
+        """Units sold per product over the whole history"""
+        return self._sums
+
+    def mean(self) -> np.ndarray:
+        """Mean daily demand over each product's active days"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.totals() / self.active_days
+
+    def std(self) -> np.ndarray:
+        """Sample standard deviation (ddof=1) of daily demand over active days; NaN with a single day"""
+        # Inactive days are zero, so the running sums cover exactly the active days
+        active = self.active_days
+        with np.errstate(invalid='ignore', divide='ignore'):
+            squares = self._squares - np.square(self._sums) / active
+            return np.where(active > 1, np.sqrt(np.clip(squares, 0, None) / (active - 1)), np.nan)
+
+    def trailing_mean(self, window: int) -> np.ndarray:
+        """Mean demand over the last `window` days, NaN for products active fewer days"""
+        window = int(window)
+        if window > self.n_days or window < 1:
+            return np.full(len(self), np.nan)
+        means = self.units[:, -window:].mean(axis=1, dtype=np.float64)
+        return np.where(self.active_days >= window, means, np.nan)
+
+    def layout(self):
+        """
+        Active days of every product, concatenated in product order, as
+        (products, starts, ends, values, days): product i's daily demand is
+        values[starts[i]:ends[i]], on the calendar days numbered by days.
+        """
+        mask = self._active_mask()
+        lengths = self.active_days
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        days = np.nonzero(mask)[1]
+        return self.products, starts, ends, self.units[mask].astype(np.float64), days
+
+    def nbytes(self) -> int:
+        return self.units.nbytes + (self.stock.nbytes if self.stock is not None else 0)
@@ -0,0 +1,93 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+# Rows serialized per chunk of a streamed export
+EXPORT_CHUNK_ROWS = 10_000
+
+# Supported export formats: (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def _chunks(frame: pd.DataFrame, rows: np.ndarray, chunk_rows: int):
+    for start in range(0, len(rows), chunk_rows):
+        yield frame.iloc[rows[start:start + chunk_rows]]
+
+
+def iter_csv(frame: pd.DataFrame, rows: np.ndarray, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Yield the selected rows as CSV text, header first, one chunk at a time"""
+    yield frame.iloc[:0].to_csv(index=False)
+    for chunk in _chunks(frame, rows, chunk_rows):
+        yield chunk.to_csv(index=False, header=False)
+
+
+def iter_ndjson(frame: pd.DataFrame, rows: np.ndarray, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Yield the selected rows as newline-delimited JSON; NaN and infinity become null"""
+    for chunk in _chunks(frame, rows, chunk_rows):
+        yield chunk.to_json(orient='records', lines=True)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose contents are drained by the streaming generator"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def iter_parquet(frame: pd.DataFrame, rows: np.ndarray, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """
+    Yield the selected rows as a Parquet file with one row group per chunk.
+
+    Needs the optional pyarrow package; raises ValueError without it before
+    anything is yielded, so callers can still answer with an error.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export needs the pyarrow package; use format=csv or format=ndjson")
+
+    schema = pa.Schema.from_pandas(frame.iloc[:0], preserve_index=False)
+
+    def generate():
+        sink = _ChunkSink()
+        with pq.ParquetWriter(sink, schema) as writer:
+            for chunk in _chunks(frame, rows, chunk_rows):
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                yield sink.drain()
+        yield sink.drain()
+
+    return generate()
+
+
+def iter_export(frame: pd.DataFrame, rows: np.ndarray, fmt: str, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Return a generator streaming frame.iloc[rows] in the given format"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    if fmt == 'parquet':
+        return iter_parquet(frame, rows, chunk_rows)
+    if fmt == 'ndjson':
+        return iter_ndjson(frame, rows, chunk_rows)
+    return iter_csv(frame, rows, chunk_rows)
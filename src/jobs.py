@@ -0,0 +1,98 @@
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Optional
+
+# Job lifecycle states
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+class Job:
+    """State of one background job, safe to read while the job runs"""
+
+    def __init__(self, name: str):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.status = QUEUED
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def update_progress(self, **progress):
+        with self._lock:
+            self.progress.update(progress)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                'id': self.id,
+                'name': self.name,
+                'status': self.status,
+                'progress': dict(self.progress),
+                'result': self.result,
+                'error': self.error,
+                'created_at': self.created_at.isoformat(),
+                'started_at': self.started_at.isoformat() if self.started_at else None,
+                'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            }
+
+
+class JobQueue:
+    """
+    In-process background job queue backed by a thread pool.
+
+    Jobs are only visible to the process that created them, so with several
+    gunicorn workers a status poll must reach the same worker (or run with
+    a single worker and threads). Only the most recent max_jobs are kept.
+    """
+
+    def __init__(self, max_workers: int = 1, max_jobs: int = 200):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_jobs = max_jobs
+
+    def submit(self, name: str, func: Callable, *args, **kwargs) -> Job:
+        """
+        Queue func(*args, progress=job.update_progress, **kwargs) and return
+        the job immediately. The function's return value becomes job.result.
+        """
+        job = Job(name)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        self._pool.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job: Job, func: Callable, args, kwargs):
+        with job._lock:
+            job.status = RUNNING
+            job.started_at = datetime.now()
+        try:
+            result = func(*args, progress=job.update_progress, **kwargs)
+            with job._lock:
+                job.result = result
+                job.status = SUCCEEDED
+        except Exception as e:
+            print(f"Error in job {job.name} ({job.id}): {str(e)}\n{traceback.format_exc()}")
+            with job._lock:
+                job.error = str(e)
+                job.status = FAILED
+        finally:
+            with job._lock:
+                job.finished_at = datetime.now()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+from demand_matrix import DemandMatrix
+
+# Output columns of the metrics table, in the order the dashboard expects them
+METRIC_COLUMNS = [
+    'product', 'current_stock', 'avg_demand', 'safety_stock', 'reorder_point',
+    'inventory_turnover', 'needs_reorder', 'potential_stockout', 'days_until_stockout'
+]
+
+
+def compute_inventory_metrics(df: pd.DataFrame, lead_time_days: int = 7,
+                              z_value: float = 1.65, stockout_buffer: float = 1.5) -> pd.DataFrame:
+    """
+    Compute per-product inventory metrics from the daily demand matrix of df.
+
+    df must contain the normalized columns:
+    - date
+    - product
+    - sold_units
+    - current_stock
+
+    Demand is measured per calendar day: same-day rows are summed and days
+    without sales count as zero. Current stock is the last one reported for
+    each product: from the last row giving one on the latest day that has one,
+    or 0 for products that never report one.
+    """
+    return compute_metrics_from_matrix(DemandMatrix.from_frame(df), lead_time_days, z_value, stockout_buffer)
+
+
+def compute_metrics_from_matrix(matrix: DemandMatrix, lead_time_days: int = 7, z_value: float = 1.65,
+                                stockout_buffer: float = 1.5) -> pd.DataFrame:
+    """
+    Compute the metrics table from a prebuilt DemandMatrix, so every version
+    of a dataset pays for its aggregation once.
+    """
+    current_stock = matrix.current_stock
+    products = matrix.products
+    avg_demand, std_demand = matrix.mean(), matrix.std()
+
+    # Products that never reported a stock count are treated as out of stock
+    unknown = np.isnan(current_stock)
+    if unknown.any():
+        print(f"Warning: {int(unknown.sum())} of {len(products)} products have no current stock reported, "
+              f"counting them as 0")
+        current_stock = np.where(unknown, 0.0, current_stock)
+
+    return metrics_from_aggregates(products, avg_demand, std_demand, current_stock,
+                                   lead_time_days, z_value, stockout_buffer)
+
+
+def metrics_from_aggregates(products, avg_demand, std_demand, current_stock, lead_time_days: int = 7,
+                            z_value: float = 1.65, stockout_buffer: float = 1.5) -> pd.DataFrame:
+    """Turn per-product mean, std and stock arrays into the metrics table"""
+    avg_demand = np.asarray(avg_demand, dtype=float)
+    std_demand = np.nan_to_num(np.asarray(std_demand, dtype=float), nan=0.0)
+    stock = np.asarray(current_stock, dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Safety stock (z-score for the service level) and reorder point
+        safety_stock = z_value * std_demand * np.sqrt(lead_time_days)
+        reorder_point = avg_demand * lead_time_days + safety_stock
+        needs_reorder = stock <= reorder_point
+
+        # Annual inventory turnover
+        has_demand = avg_demand > 0
+        days_of_inventory = np.where(has_demand, stock / avg_demand, 0.0)
+        inventory_turnover = np.where(days_of_inventory > 0, 365 / days_of_inventory, 0.0)
+
+        # Potential stockout within the lead time plus a buffer
+        days_until_stockout = np.where(has_demand, stock / avg_demand, np.inf)
+        potential_stockout = days_until_stockout < lead_time_days * stockout_buffer
+
+    metrics = pd.DataFrame({
+        'product': pd.Index(products).astype(str).to_numpy(dtype=object),
+        'current_stock': stock.astype(np.int64),
+        'avg_demand': np.round(avg_demand, 2),
+        'safety_stock': np.round(safety_stock, 2),
+        'reorder_point': np.round(reorder_point, 2),
+        'inventory_turnover': np.round(inventory_turnover, 2),
+        'needs_reorder': needs_reorder,
+        'potential_stockout': potential_stockout,
+        'days_until_stockout': np.round(days_until_stockout, 1),
+    }, columns=METRIC_COLUMNS)
+
+    return metrics
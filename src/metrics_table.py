@@ -0,0 +1,182 @@
+import base64
+import binascii
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+
+from metrics_engine import METRIC_COLUMNS
+
+# Page size bounds for MetricsTable.query
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Columns whose value is a flag that can be filtered on
+FILTER_COLUMNS = ('needs_reorder', 'potential_stockout')
+
+
+def encode_cursor(sort: str, key: float, product: str) -> str:
+    payload = json.dumps({'s': sort, 'k': key, 'p': product}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return {'sort': str(payload['s']), 'key': float(payload['k']), 'product': str(payload['p'])}
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise ValueError("Invalid cursor")
+
+
+class MetricsTable:
+    """
+    Precomputed metrics table answering paginated, sorted and filtered queries.
+
+    Pages use keyset cursors: a cursor records the sort key and product of the
+    last row returned, and the next page starts right after that position. A
+    cursor therefore stays valid when the dataset changes between pages;
+    rows are neither skipped nor repeated unless they themselves changed.
+
+    Each sort order is computed once and reused, so a query costs one
+    vectorized pass over the catalog for its filters plus the page itself.
+    """
+
+    def __init__(self, metrics: pd.DataFrame):
+        self.frame = metrics.reset_index(drop=True)
+        self._names = self.frame['product'].astype(str).to_numpy(dtype=str)
+        self._lower_names = np.char.lower(self._names)
+        self._name_rank = np.empty(len(self._names), dtype=np.int64)
+        self._name_rank[np.argsort(self._names, kind='stable')] = np.arange(len(self._names))
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @staticmethod
+    def parse_sort(sort: str):
+        """Split 'column' or '-column' into (column, descending)"""
+        sort = (sort or 'product').strip()
+        descending = sort.startswith('-')
+        column = sort.lstrip('-')
+        if column not in METRIC_COLUMNS:
+            raise ValueError(f"sort must be one of {', '.join(METRIC_COLUMNS)}, optionally prefixed with '-'")
+        return column, descending
+
+    def _sort_keys(self, column: str, descending: bool) -> np.ndarray:
+        """Float sort key per row; NaN sorts last in either direction"""
+        if column == 'product':
+            # Products are ordered by the name tie-break alone
+            return np.zeros(len(self.frame))
+        keys = self.frame[column].to_numpy(dtype=float)
+        keys = -keys if descending else keys.copy()
+        keys[np.isnan(keys)] = np.inf
+        return keys
+
+    def _order(self, column: str, descending: bool):
+        """(row order, keys in that order, names in that order, names descending?) for a sort"""
+        with self._lock:
+            cached = self._orders.get((column, descending))
+        if cached is not None:
+            return cached
+
+        keys = self._sort_keys(column, descending)
+        names_descending = column == 'product' and descending
+        tie_break = -self._name_rank if names_descending else self._name_rank
+        order = np.lexsort((tie_break, keys))
+        cached = (order, keys[order], self._names[order], names_descending)
+        with self._lock:
+            self._orders[(column, descending)] = cached
+        return cached
+
+    def _start_position(self, sort: str, cursor: str) -> int:
+        if not cursor:
+            return 0
+        position = decode_cursor(cursor)
+        if position['sort'] != sort:
+            raise ValueError("Cursor was issued for a different sort order")
+
+        column, descending = self.parse_sort(sort)
+        _, sorted_keys, sorted_names, names_descending = self._order(column, descending)
+        lo = int(np.searchsorted(sorted_keys, position['key'], side='left'))
+        hi = int(np.searchsorted(sorted_keys, position['key'], side='right'))
+        ties = sorted_names[lo:hi]
+        if names_descending:
+            return lo + int(np.count_nonzero(ties >= position['product']))
+        return lo + int(np.count_nonzero(ties <= position['product']))
+
+    def _filter_mask(self, filters: dict, prefix: str):
+        mask = np.ones(len(self.frame), dtype=bool)
+        for column, value in filters.items():
+            if value is not None:
+                mask &= self.frame[column].to_numpy(dtype=bool) == bool(value)
+        if prefix:
+            mask &= np.char.startswith(self._lower_names, prefix.lower())
+        return mask
+
+    def _check_filters(self, filters: dict):
+        unknown = set(filters) - set(FILTER_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+
+    def select(self, sort: str = 'product', prefix: str = None, **filters) -> np.ndarray:
+        """Row positions in self.frame of every matching row, in sort order"""
+        self._check_filters(filters)
+        order = self._order(*self.parse_sort(sort))[0]
+        return order[self._filter_mask(filters, prefix)[order]]
+
+    def query(self, sort: str = 'product', limit: int = DEFAULT_PAGE_SIZE, cursor: str = None,
+              prefix: str = None, **filters) -> dict:
+        """
+        Return one page of metrics as
+        {'items': [...], 'next_cursor': str or None, 'total': matching rows, ...}.
+
+        sort is a metrics column, prefixed with '-' for descending order.
+        filters are FILTER_COLUMNS set to True/False (None means no filter),
+        and prefix matches the start of product names, ignoring case.
+        """
+        self._check_filters(filters)
+        limit = min(max(int(limit), 1), MAX_PAGE_SIZE)
+        column, descending = self.parse_sort(sort)
+        sort = f"-{column}" if descending else column
+
+        order, sorted_keys, sorted_names, _ = self._order(column, descending)
+        start = self._start_position(sort, cursor)
+        mask = self._filter_mask(filters, prefix)
+        matches = np.flatnonzero(mask[order[start:]])[:limit + 1] + start
+
+        page = matches[:limit]
+        next_cursor = None
+        if len(matches) > limit:
+            last = page[-1]
+            next_cursor = encode_cursor(sort, float(sorted_keys[last]), str(sorted_names[last]))
+
+        items = self.frame.iloc[order[page]]
+        return {
+            'items': records(items),
+            'next_cursor': next_cursor,
+            'total': int(mask.sum()),
+            'limit': limit,
+            'sort': sort,
+        }
+
+    def summary(self) -> dict:
+        """Catalog-wide totals for the dashboard cards"""
+        frame = self.frame
+        return {
+            'total_products': len(frame),
+            'needs_reorder': int(frame['needs_reorder'].sum()),
+            'potential_stockouts': int(frame['potential_stockout'].sum()),
+            'avg_inventory_turnover': float(frame['inventory_turnover'].mean()) if len(frame) else 0.0,
+        }
+
+
+def records(frame: pd.DataFrame) -> list:
+    """Rows as JSON-safe dicts: NaN and infinite values become None"""
+    numeric = frame.select_dtypes(include='floating')
+    finite = numeric.where(np.isfinite(numeric))
+    frame = frame.assign(**{column: finite[column].astype(object).where(finite[column].notna(), None)
+                            for column in numeric.columns})
+    return frame.to_dict(orient='records')
@@ -0,0 +1,209 @@
+import cProfile
+import functools
+import io
+import math
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the timing histogram buckets, Prometheus style
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Quantiles estimated from the buckets for the JSON summary
+SUMMARY_QUANTILES = (0.5, 0.9, 0.99)
+
+# Profilers accepted by profile_call
+PROFILERS = ('cprofile', 'pyinstrument')
+
+# Only one profiler can hook the interpreter at a time
+_profile_lock = threading.Lock()
+
+
+class TimingHistogram:
+    """Cumulative-bucket histogram of durations in seconds"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # The last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def cumulative(self) -> list:
+        """(upper bound, observations <= bound) pairs ending with +Inf"""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating within its bucket, like histogram_quantile"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower_bound, lower_count = 0.0, 0
+        for bound, count in self.cumulative():
+            if count >= rank:
+                if math.isinf(bound):
+                    return self.max
+                if count == lower_count:
+                    return bound
+                estimate = lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+                return min(max(estimate, self.min), self.max)
+            lower_bound, lower_count = bound, count
+        return self.max
+
+    def to_dict(self) -> dict:
+        summary = {
+            'count': self.count,
+            'total_seconds': round(self.sum, 6),
+            'mean_seconds': round(self.sum / self.count, 6) if self.count else None,
+            'min_seconds': round(self.min, 6) if self.count else None,
+            'max_seconds': round(self.max, 6) if self.count else None,
+        }
+        for q in SUMMARY_QUANTILES:
+            value = self.quantile(q)
+            summary[f'p{round(q * 100)}_seconds'] = round(value, 6) if value is not None else None
+        # A list rather than a dict so JSON encoders that sort keys keep the bucket order
+        summary['buckets'] = [['+Inf' if math.isinf(bound) else bound, count]
+                              for bound, count in self.cumulative()]
+        return summary
+
+
+class PerfRegistry:
+    """
+    Thread-safe collection of named timing histograms.
+
+    Time a block with `with registry.timer('name'):` or a function with the
+    `@registry.timed('name')` decorator. Durations are recorded even when the
+    timed code raises.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = TimingHistogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name: str):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def timed_iter(self, name: str, iterable):
+        """
+        Yield from iterable, recording the time from the first item until it
+        is exhausted or closed. For generators consumed after the caller has
+        returned, such as streamed responses, which timer() would miss.
+        """
+        start = time.perf_counter()
+        try:
+            yield from iterable
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+    def snapshot(self) -> dict:
+        """Summary of every histogram, keyed by name"""
+        with self._lock:
+            return {name: histogram.to_dict() for name, histogram in sorted(self._histograms.items())}
+
+    def to_prometheus(self, metric: str = 'inventory_timing_seconds', label: str = 'name') -> str:
+        """Render every histogram in the Prometheus text exposition format"""
+        lines = [f'# HELP {metric} Duration of instrumented hot paths in seconds.',
+                 f'# TYPE {metric} histogram']
+        with self._lock:
+            for name, histogram in sorted(self._histograms.items()):
+                value = _escape_label(name)
+                for bound, count in histogram.cumulative():
+                    le = '+Inf' if math.isinf(bound) else repr(float(bound))
+                    lines.append(f'{metric}_bucket{{{label}="{value}",le="{le}"}} {count}')
+                lines.append(f'{metric}_sum{{{label}="{value}"}} {histogram.sum!r}')
+                lines.append(f'{metric}_count{{{label}="{value}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def profile_call(func, profiler: str = 'cprofile', sort: str = 'cumulative', limit: int = 50):
+    """
+    Run func() under a profiler and return (report, mimetype).
+
+    'cprofile' gives a pstats text report sorted by `sort`; 'pyinstrument'
+    gives pyinstrument's HTML report and needs the optional pyinstrument
+    package. Exceptions from func are reported in the output rather than raised.
+    Concurrent profiles wait for each other.
+    """
+    if profiler not in PROFILERS:
+        raise ValueError(f"profiler must be one of {', '.join(PROFILERS)}")
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ValueError("pyinstrument is not installed; use profile=cprofile or pip install pyinstrument")
+
+    with _profile_lock:
+        if profiler == 'pyinstrument':
+            session = Profiler()
+            session.start()
+            error = _call_capturing(func)
+            session.stop()
+            return session.output_html(), 'text/html'
+
+        session = cProfile.Profile()
+        session.enable()
+        error = _call_capturing(func)
+        session.disable()
+
+    out = io.StringIO()
+    if error:
+        out.write(f"Profiled call raised: {error}\n\n")
+    pstats.Stats(session, stream=out).sort_stats(sort).print_stats(limit)
+    return out.getvalue(), 'text/plain'
+
+
+def _call_capturing(func):
+    try:
+        func()
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
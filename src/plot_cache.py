@@ -0,0 +1,140 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+
+def plot_cache_key(product, product_data: pd.DataFrame, **params) -> str:
+    """
+    Build a cache key from the product, the content of its data slice and the
+    render parameters, so a plot is only re-rendered when one of them changes.
+    """
+    digest = hashlib.sha1()
+    digest.update(str(product).encode())
+    digest.update(pd.util.hash_pandas_object(product_data, index=False).to_numpy().tobytes())
+    digest.update(repr(sorted(params.items())).encode())
+    return digest.hexdigest()
+
+
+class PlotCache:
+    """
+    Bounded in-memory LRU cache of rendered PNG plots.
+
+    Eviction is by total byte size rather than entry count. When a spill
+    directory is configured, evicted plots are written there and read back on
+    a later miss instead of being re-rendered.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, spill_dir: Optional[Path] = None,
+                 max_spill_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.max_spill_bytes = max_spill_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.spill_dir:
+            self.spill_dir.mkdir(exist_ok=True, parents=True)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return png
+
+        png = self._read_spill(key)
+        with self._lock:
+            if png is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self.put(key, png)
+        return png
+
+    def put(self, key: str, png: bytes):
+        if len(png) > self.max_bytes:
+            return
+
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= len(old)
+            self._entries[key] = png
+            self.current_bytes += len(png)
+
+            # Evict least recently used plots until we are back under budget
+            while self.current_bytes > self.max_bytes:
+                old_key, old_png = self._entries.popitem(last=False)
+                self.current_bytes -= len(old_png)
+                self.evictions += 1
+                evicted.append((old_key, old_png))
+
+        for old_key, old_png in evicted:
+            self._write_spill(old_key, old_png)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _spill_path(self, key: str) -> Path:
+        return self.spill_dir / f"{key}.png"
+
+    def _read_spill(self, key: str) -> Optional[bytes]:
+        if not self.spill_dir:
+            return None
+        try:
+            return self._spill_path(key).read_bytes()
+        except OSError:
+            return None
+
+    def _write_spill(self, key: str, png: bytes):
+        if not self.spill_dir:
+            return
+        path = self._spill_path(key)
+        if path.exists():
+            return
+        try:
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_bytes(png)
+            os.replace(tmp_path, path)
+            self._prune_spill()
+        except OSError as e:
+            print(f"Warning: could not spill plot to disk: {str(e)}")
+
+    def _prune_spill(self):
+        """Delete the oldest spilled plots once the spill directory is over budget"""
+        files = sorted(self.spill_dir.glob('*.png'), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in files)
+        for path in files:
+            if total <= self.max_spill_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                'spill_dir': str(self.spill_dir) if self.spill_dir else None,
+            }
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+
+class ProductIndex:
+    """
+    Sorted layout of a sales frame with a product -> row-range mapping.
+
+    Rows are stably sorted by product (case-normalized unless case_sensitive)
+    and then by date, so every product's history is one contiguous, date-ordered
+    slice of `frame` and a lookup is a dict access plus an iloc slice instead
+    of a full-column string comparison.
+    """
+
+    def __init__(self, df: pd.DataFrame, key: str = 'product', date: str = 'date',
+                 case_sensitive: bool = False):
+        self.key = key
+        self.case_sensitive = case_sensitive
+
+        codes, names = self._normalized_codes(df[key])
+        valid = codes >= 0
+        dates = df[date].to_numpy() if date in df.columns else np.zeros(len(df))
+        # lexsort is stable: rows with equal product and date keep their order
+        order = np.lexsort((dates, codes))
+        order = order[valid[order]]
+
+        self.frame = df.iloc[order].reset_index(drop=True)
+        counts = np.bincount(codes[valid], minlength=len(names))
+        stops = np.cumsum(counts)
+        starts = stops - counts
+        self._ranges = {name: (int(start), int(stop))
+                        for name, start, stop in zip(names, starts, stops) if stop > start}
+
+    def _normalize(self, product) -> str:
+        product = str(product)
+        return product if self.case_sensitive else product.lower()
+
+    def _normalized_codes(self, products: pd.Series):
+        """Factorize products by their normalized name, sorted by that name"""
+        if isinstance(products.dtype, pd.CategoricalDtype):
+            # Normalize each category once instead of every row
+            category_codes, names = pd.factorize(
+                pd.Index([self._normalize(c) for c in products.cat.categories]), sort=True)
+            lookup = np.r_[category_codes, -1]
+            return lookup[products.cat.codes.to_numpy()], np.asarray(names)
+
+        normalized = products.astype(str)
+        if not self.case_sensitive:
+            normalized = normalized.str.lower()
+        codes, names = pd.factorize(normalized.where(products.notna()), sort=True)
+        return codes, np.asarray(names)
+
+    def __len__(self) -> int:
+        return len(self._ranges)
+
+    def __contains__(self, product) -> bool:
+        return self._normalize(product) in self._ranges
+
+    @property
+    def products(self) -> list:
+        return list(self._ranges)
+
+    def lookup(self, product):
+        """Return the (start, stop) row range for product, or None if it is unknown"""
+        return self._ranges.get(self._normalize(product))
+
+    def slice(self, product) -> pd.DataFrame:
+        """Return the product's rows, sorted by date; empty if it is unknown"""
+        bounds = self.lookup(product)
+        if bounds is None:
+            return self.frame.iloc[0:0]
+        return self.frame.iloc[bounds[0]:bounds[1]]
@@ -0,0 +1,235 @@
+import numpy as np
+import pandas as pd
+
+from metrics_engine import metrics_from_aggregates
+
+# Levels of the location hierarchy, from the bottom up
+LEVELS = ('location', 'region', 'network')
+
+# Location of every row in data without a location column
+DEFAULT_LOCATION = 'all'
+
+# Region of locations the data (or the regions mapping) assigns none
+UNASSIGNED_REGION = 'unassigned'
+
+
+def _codes(values: pd.Series, default: str):
+    """
+    Integer codes and sorted labels of a column, with missing values labelled
+    default; only labels that occur are kept
+    """
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype('category')
+    # Label the categories rather than every row
+    labels = np.append(values.cat.categories.astype(str).to_numpy(dtype=object), default)
+    codes = values.cat.codes.to_numpy(dtype=np.int64)
+    codes[codes < 0] = len(labels) - 1
+    used = np.bincount(codes, minlength=len(labels)) > 0
+    labels, inverse = np.unique(labels[used].astype(str), return_inverse=True)
+    remap = np.full(len(used), -1, dtype=np.int64)
+    remap[used] = inverse
+    return remap[codes], pd.Index(labels, dtype=object)
+
+
+def _daily_cells(keys: np.ndarray, n_keys: int, days: np.ndarray, units: np.ndarray, n_days: int):
+    """
+    Units summed per (key, day) cell, as (cell keys, cell days, cell totals)
+    sorted by key and day, plus the cell of every input row. keys are
+    compact indices below n_keys.
+    """
+    combined = keys * n_days + days
+    size = n_keys * n_days
+    if size <= 4 * len(combined) + 1024:
+        # Dense enough to number the cells with a bincount instead of a hash table
+        present = np.bincount(combined, minlength=size) > 0
+        uniques = np.flatnonzero(present)
+        cells = (np.cumsum(present) - 1)[combined]
+    else:
+        cells, uniques = pd.factorize(combined, sort=True)
+    totals = np.bincount(cells, weights=units, minlength=len(uniques))
+    return (uniques // n_days, uniques % n_days, totals), cells
+
+
+class _Demand:
+    """
+    Daily demand statistics per key from its (key, day) cells, with the
+    semantics of DemandMatrix: a key is active from its first day with a row
+    to the last day of the data, days without a cell count as zero, and the
+    standard deviation is the sample one (ddof=1) over the active days.
+    """
+
+    def __init__(self, cell_keys: np.ndarray, cell_days: np.ndarray, cell_units: np.ndarray, n_keys: int,
+                 n_days: int):
+        first = np.full(n_keys, n_days, dtype=np.int64)
+        np.minimum.at(first, cell_keys, cell_days)
+        totals = np.bincount(cell_keys, weights=cell_units, minlength=n_keys)
+        squares = np.bincount(cell_keys, weights=cell_units * cell_units, minlength=n_keys)
+        active = n_days - first
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean = totals / active
+            variance = np.clip(squares - totals * self.mean, 0, None) / (active - 1)
+            self.std = np.where(active > 1, np.sqrt(variance), np.nan)
+
+
+class LocationRollup:
+    """
+    Reorder metrics per (location, product), rolled up a location -> region
+    -> network hierarchy.
+
+    Each level's daily demand is the sum over the locations below it, so its
+    mean is additive but its deviation is that of the summed series, which
+    includes the correlation between locations. Safety stock at a region or
+    the network is therefore the pooled z * sigma * sqrt(lead time) of the
+    combined demand, never the sum of the locations' safety stocks; that sum
+    is reported as unpooled_safety_stock for comparison. Current stock is the
+    last stock reported for each (location, product), summed up the
+    hierarchy.
+
+    Regions come from the data's region column (that of each location's first
+    row) or else from the regions mapping of location to region.
+
+    Every level is one grouped pass over the (key, day) cells of the level
+    below, so the cost follows the number of rows with sales, not locations x
+    products x days.
+    """
+
+    def __init__(self, df: pd.DataFrame, regions: dict = None, lead_time_days: int = 7,
+                 z_value: float = 1.65, stockout_buffer: float = 1.5):
+        self.lead_time_days = lead_time_days
+        self.z_value = z_value
+        self.stockout_buffer = stockout_buffer
+        self._frames = {}
+        self._build(df, regions or {})
+
+    def _build(self, df: pd.DataFrame, regions: dict):
+        df = df[df['date'].notna() & df['product'].notna()]
+        product_codes, self.products = _codes(df['product'], '')
+        if 'location' in df.columns:
+            location_codes, self.locations = _codes(df['location'], DEFAULT_LOCATION)
+        else:
+            location_codes, self.locations = np.zeros(len(df), dtype=np.int64), pd.Index([DEFAULT_LOCATION])
+
+        # One region per location
+        if 'region' in df.columns:
+            row_regions, region_labels = _codes(df['region'], UNASSIGNED_REGION)
+            first_row = np.full(len(self.locations), len(df), dtype=np.int64)
+            np.minimum.at(first_row, location_codes, np.arange(len(df)))
+            given = pd.Series(region_labels[row_regions[first_row]], dtype='string')
+            given[given == UNASSIGNED_REGION] = pd.NA
+        else:
+            given = pd.Series(pd.NA, index=range(len(self.locations)), dtype='string')
+        from_mapping = pd.Series([regions.get(str(location)) for location in self.locations], dtype='string')
+        region_codes, self.regions = _codes(given.fillna(from_mapping), UNASSIGNED_REGION)
+        self.location_region = region_codes
+
+        dates = df['date'].to_numpy(dtype='datetime64[D]')
+        self.start = dates.min() if len(dates) else np.datetime64(0, 'D')
+        days = (dates - self.start).astype(np.int64)
+        self.n_days = int(days.max()) + 1 if len(days) else 0
+        units = pd.to_numeric(df['sold_units'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+        n_products = len(self.products)
+
+        # Location level: the (location, product) pair of every row, its daily cells and statistics
+        row_pairs, pair_keys = pd.factorize(location_codes * n_products + product_codes, sort=True)
+        n_pairs = len(pair_keys)
+        (cell_pairs, cell_days, cell_units), _ = _daily_cells(row_pairs, n_pairs, days, units, self.n_days)
+        pairs = _Demand(cell_pairs, cell_days, cell_units, n_pairs, self.n_days)
+        pair_location, pair_product = pair_keys // n_products, pair_keys % n_products
+        pair_region = region_codes[pair_location]
+        pair_stock = np.nan_to_num(self._last_stock(df['current_stock'], row_pairs, days, n_pairs))
+        self._frames['location'] = self._metrics(
+            {'location': pair_location, 'region': pair_region}, pair_product, pairs, pair_stock)
+
+        # What the locations would hold as safety stock each on their own
+        pair_safety_stock = self.z_value * np.nan_to_num(pairs.std) * np.sqrt(self.lead_time_days)
+
+        # Region level: one grouped pass over the location cells
+        pair_parent, region_keys = pd.factorize(pair_region * n_products + pair_product, sort=True)
+        region_cells, _ = _daily_cells(pair_parent[cell_pairs], len(region_keys), cell_days, cell_units,
+                                       self.n_days)
+        self._frames['region'] = self._rolled_up(
+            {'region': region_keys // n_products}, region_keys % n_products, region_cells, pair_parent,
+            pair_stock, pair_safety_stock)
+
+        # Network level: one grouped pass over the region cells
+        region_cell_keys, region_cell_days, region_cell_units = region_cells
+        network_cells, _ = _daily_cells(region_keys[region_cell_keys] % n_products, n_products,
+                                        region_cell_days, region_cell_units, self.n_days)
+        self._frames['network'] = self._rolled_up(
+            {}, np.arange(n_products), network_cells, pair_product, pair_stock, pair_safety_stock)
+
+    @staticmethod
+    def _last_stock(stock: pd.Series, row_pairs: np.ndarray, days: np.ndarray, n_pairs: int) -> np.ndarray:
+        """
+        Stock of each pair from the last row giving one on the latest day that
+        has one, as DemandMatrix.current_stock; NaN if no row does
+        """
+        stock = pd.to_numeric(stock, errors='coerce').to_numpy(dtype=np.float64)
+        known = np.flatnonzero(~np.isnan(stock))
+        last_day = np.full(n_pairs, -1, dtype=np.int64)
+        np.maximum.at(last_day, row_pairs[known], days[known])
+        latest = known[days[known] == last_day[row_pairs[known]]]
+        last_row = np.full(n_pairs, -1, dtype=np.int64)
+        np.maximum.at(last_row, row_pairs[latest], latest)
+        return np.where(last_row >= 0, stock[last_row], np.nan)
+
+    def _rolled_up(self, dimensions: dict, product_codes: np.ndarray, cells, pair_parent: np.ndarray,
+                   pair_stock: np.ndarray, pair_safety_stock: np.ndarray) -> pd.DataFrame:
+        """Metrics of an upper level, with stock and unpooled safety stock summed over its locations"""
+        n_keys = len(product_codes)
+        demand = _Demand(*cells, n_keys, self.n_days)
+        extra = {
+            'locations': np.bincount(pair_parent, minlength=n_keys),
+            'unpooled_safety_stock': np.round(np.bincount(pair_parent, weights=pair_safety_stock,
+                                                          minlength=n_keys), 2),
+        }
+        stock = np.bincount(pair_parent, weights=pair_stock, minlength=n_keys)
+        return self._metrics(dimensions, product_codes, demand, stock, extra)
+
+    def _metrics(self, dimensions: dict, product_codes: np.ndarray, demand: _Demand, stock: np.ndarray,
+                 extra: dict = None) -> pd.DataFrame:
+        """
+        Metrics table of one level; dimensions maps names to codes and the
+        keys arrive sorted by dimensions and product
+        """
+        products = pd.Categorical.from_codes(product_codes, categories=self.products)
+        metrics = metrics_from_aggregates(products, demand.mean, demand.std, stock,
+                                          self.lead_time_days, self.z_value, self.stockout_buffer)
+        labels = {'location': self.locations, 'region': self.regions}
+        columns = {name: pd.Categorical.from_codes(codes, categories=labels[name])
+                   for name, codes in dimensions.items()}
+        columns['product'] = products
+        columns.update(extra or {})
+        return pd.concat([pd.DataFrame(columns), metrics.drop(columns='product')], axis=1)
+
+    def metrics(self, level: str = 'location', location=None, region=None, product=None) -> pd.DataFrame:
+        """
+        Metrics of one level of the hierarchy, optionally for one location,
+        region and/or product:
+
+        - location: location, region, product and the metrics columns
+        - region: region, product, locations (how many stock the product),
+          unpooled_safety_stock and the metrics columns
+        - network: product, locations, unpooled_safety_stock and the metrics columns
+        """
+        if level not in LEVELS:
+            raise ValueError(f"level must be one of {', '.join(LEVELS)}")
+        frame = self._frames[level]
+        mask = np.ones(len(frame), dtype=bool)
+        for name, value in (('location', location), ('region', region), ('product', product)):
+            if value is None:
+                continue
+            if name not in frame.columns:
+                raise ValueError(f"The {level} level has no {name} column")
+            mask &= (frame[name] == str(value)).to_numpy()
+        return frame[mask] if not mask.all() else frame
+
+    def summary(self) -> dict:
+        """Size of each level and the safety stock saved by pooling at the region and network levels"""
+        summary = {'locations': len(self.locations), 'regions': len(self.regions), 'products': len(self.products)}
+        for level in LEVELS:
+            frame = self._frames[level]
+            summary[level] = {'rows': len(frame), 'safety_stock': round(float(frame['safety_stock'].sum()), 2)}
+            if 'unpooled_safety_stock' in frame.columns:
+                summary[level]['unpooled_safety_stock'] = round(float(frame['unpooled_safety_stock'].sum()), 2)
+        return summary
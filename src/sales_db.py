@@ -0,0 +1,395 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from metrics_engine import METRIC_COLUMNS
+
+# Seconds a connection waits for another writer before giving up
+BUSY_TIMEOUT_SECONDS = 30
+
+# Rows per executemany batch when loading sales
+INSERT_BATCH_ROWS = 50000
+
+# Bytes read at a time when hashing uploads
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# Upload lifecycle states, as recorded in the uploads table
+UPLOAD_QUEUED = 'queued'
+UPLOAD_DONE = 'done'
+UPLOAD_FAILED = 'failed'
+
+# Indexes of the sales table; dropped and rebuilt around full reloads, which is
+# faster than maintaining them row by row
+SALES_INDEXES = {
+    'sales_product_date': 'CREATE INDEX IF NOT EXISTS sales_product_date ON sales (product, date)',
+    'sales_date': 'CREATE INDEX IF NOT EXISTS sales_date ON sales (date)',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS sales (
+    product TEXT NOT NULL,
+    date TEXT NOT NULL,
+    sold_units REAL,
+    current_stock REAL,
+    location TEXT
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    version TEXT NOT NULL,
+    product TEXT NOT NULL,
+    current_stock INTEGER,
+    avg_demand REAL,
+    safety_stock REAL,
+    reorder_point REAL,
+    inventory_turnover REAL,
+    needs_reorder INTEGER,
+    potential_stockout INTEGER,
+    days_until_stockout REAL,
+    PRIMARY KEY (version, product)
+);
+CREATE TABLE IF NOT EXISTS upload_files (
+    sha256 TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sha256 TEXT NOT NULL REFERENCES upload_files (sha256),
+    original_name TEXT,
+    mode TEXT NOT NULL,
+    status TEXT NOT NULL,
+    rows INTEGER,
+    snapshot_id TEXT,
+    error TEXT,
+    uploaded_at TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS uploads_sha256 ON uploads (sha256);
+"""
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SalesDatabase:
+    """
+    Embedded SQLite database with the queryable side of the app's state:
+
+    - sales: the rows of the active dataset, indexed by (product, date) and
+      by date, so per-product and date-range queries never scan the history.
+      The table mirrors one snapshot of the active dataset, recorded as
+      sales_version in meta; see sync_sales.
+    - metrics: the materialized metrics table of a dataset version, so a
+      restarted worker serves the dashboard without recomputing it.
+    - upload_files and uploads: every upload with its content hash, outcome
+      and the snapshot it produced. Files are stored once per content hash.
+
+    The database runs in WAL mode, so readers never block on the writer and
+    see the last committed state. Each thread of each worker process opens
+    its own connection on first use and keeps it.
+    """
+
+    def __init__(self, path, timeout: float = BUSY_TIMEOUT_SECONDS):
+        self.path = Path(path)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use (or after a fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode; transactions are opened explicitly by transaction()
+        conn = sqlite3.connect(str(self.path), timeout=self.timeout, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        with self._schema_lock:
+            if not self._schema_ready:
+                conn.executescript(SCHEMA + ';\n'.join(SALES_INDEXES.values()) + ';')
+                self._migrate(conn)
+                self._schema_ready = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _migrate(self, conn):
+        """Bring tables created by older versions up to SCHEMA"""
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(sales)')}
+        if 'location' not in columns:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('ALTER TABLE sales ADD COLUMN location TEXT')
+            # The rows were loaded without their locations: reload them on the next sync
+            conn.execute("DELETE FROM meta WHERE key = 'sales_version'")
+            conn.execute('COMMIT')
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run a block as one write transaction. The write lock is taken up front
+        (BEGIN IMMEDIATE), so checks made inside the block still hold at commit.
+        """
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _get_meta(self, conn, key: str):
+        row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, conn, key: str, value):
+        conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    # Sales
+
+    def sales_version(self):
+        """Dataset version the sales table holds, or None if it was never loaded"""
+        return self._get_meta(self.connection(), 'sales_version')
+
+    @staticmethod
+    def _sales_rows(df: pd.DataFrame):
+        """Yield batches of (product, date, sold_units, current_stock, location) tuples; NaN is stored as NULL"""
+        dates = pd.to_datetime(df['date'])
+        keep = dates.notna().to_numpy() & df['product'].notna().to_numpy()
+        products = df['product'].astype(str).to_numpy(dtype=object)[keep]
+        days = np.datetime_as_string(dates.to_numpy(dtype='datetime64[D]')[keep], unit='D')
+        sold = pd.to_numeric(df['sold_units'], errors='coerce').to_numpy(dtype=np.float64)[keep]
+        if 'current_stock' in df.columns:
+            stock = pd.to_numeric(df['current_stock'], errors='coerce').to_numpy(dtype=np.float64)[keep]
+        else:
+            stock = np.full(len(products), np.nan)
+        if 'location' in df.columns:
+            locations = np.array([None if pd.isna(value) else str(value)
+                                  for value in df['location'].to_numpy(dtype=object)[keep]], dtype=object)
+        else:
+            locations = np.full(len(products), None, dtype=object)
+        for start in range(0, len(products), INSERT_BATCH_ROWS):
+            stop = start + INSERT_BATCH_ROWS
+            yield zip(products[start:stop].tolist(), days[start:stop].tolist(),
+                      sold[start:stop].tolist(), stock[start:stop].tolist(), locations[start:stop].tolist())
+
+    def _insert_sales(self, conn, df: pd.DataFrame):
+        for batch in self._sales_rows(df):
+            conn.executemany('INSERT INTO sales (product, date, sold_units, current_stock, location) '
+                             'VALUES (?, ?, ?, ?, ?)', batch)
+
+    def replace_sales(self, df: pd.DataFrame, version: str):
+        """Replace the sales table with the rows of df, a canonical frame of dataset version"""
+        with self.transaction() as conn:
+            if self._get_meta(conn, 'sales_version') == version:
+                return
+            for name in SALES_INDEXES:
+                conn.execute(f'DROP INDEX IF EXISTS {name}')
+            conn.execute('DELETE FROM sales')
+            self._insert_sales(conn, df)
+            for statement in SALES_INDEXES.values():
+                conn.execute(statement)
+            self._set_meta(conn, 'sales_version', version)
+
+    def append_sales(self, delta: pd.DataFrame, version: str, base_version: str) -> bool:
+        """
+        Add an appended delta, moving the table from base_version to version.
+        Returns False, changing nothing, if the table does not hold base_version;
+        the next sync_sales then reloads it in full.
+        """
+        with self.transaction() as conn:
+            current = self._get_meta(conn, 'sales_version')
+            if current == version:
+                return True
+            if current != base_version:
+                return False
+            self._insert_sales(conn, delta)
+            self._set_meta(conn, 'sales_version', version)
+        return True
+
+    def sync_sales(self, version: str, load) -> bool:
+        """
+        Make the sales table hold dataset version, calling load() for its rows
+        only if it does not already. Returns True if the table was reloaded.
+        """
+        if self.sales_version() == version:
+            return False
+        self.replace_sales(load(), version)
+        return True
+
+    def product_history(self, product: str, start: str = None, end: str = None, location: str = None) -> pd.DataFrame:
+        """
+        One product's rows as date, sold_units, current_stock and location (None
+        if the data has none), in date order, optionally limited to
+        start <= date <= end (ISO dates) and to one location. Served from the
+        (product, date) index.
+        """
+        query = 'SELECT date, sold_units, current_stock, location FROM sales WHERE product = ?'
+        params = [str(product)]
+        if start:
+            query += ' AND date >= ?'
+            params.append(start)
+        if end:
+            query += ' AND date <= ?'
+            params.append(end)
+        if location is not None:
+            query += ' AND location = ?'
+            params.append(str(location))
+        query += ' ORDER BY date'
+        rows = self.connection().execute(query, params).fetchall()
+        frame = pd.DataFrame(rows, columns=['date', 'sold_units', 'current_stock', 'location'])
+        frame['date'] = pd.to_datetime(frame['date'])
+        return frame
+
+    def daily_totals(self, start: str = None, end: str = None) -> pd.DataFrame:
+        """Units sold per day over all products, optionally within [start, end], from the date index"""
+        query = 'SELECT date, SUM(sold_units), COUNT(*) FROM sales'
+        clauses, params = [], []
+        if start:
+            clauses.append('date >= ?')
+            params.append(start)
+        if end:
+            clauses.append('date <= ?')
+            params.append(end)
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        query += ' GROUP BY date ORDER BY date'
+        rows = self.connection().execute(query, params).fetchall()
+        frame = pd.DataFrame(rows, columns=['date', 'sold_units', 'rows'])
+        frame['date'] = pd.to_datetime(frame['date'])
+        return frame
+
+    # Metrics
+
+    def save_metrics(self, metrics: pd.DataFrame, version: str):
+        """Materialize the metrics table of a dataset version, dropping those of older versions"""
+        frame = metrics[METRIC_COLUMNS]
+        columns = ', '.join(METRIC_COLUMNS)
+        placeholders = ', '.join('?' * (len(METRIC_COLUMNS) + 1))
+        rows = zip([version] * len(frame), *(frame[column].tolist() for column in METRIC_COLUMNS))
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM metrics')
+            conn.executemany(f'INSERT INTO metrics (version, {columns}) VALUES ({placeholders})', rows)
+
+    def clear_metrics(self):
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM metrics')
+
+    def load_metrics(self, version: str):
+        """Return the materialized metrics of a dataset version, or None if there are none"""
+        columns = ', '.join(METRIC_COLUMNS)
+        rows = self.connection().execute(
+            f'SELECT {columns} FROM metrics WHERE version = ? ORDER BY product', (version,)).fetchall()
+        if not rows:
+            return None
+        metrics = pd.DataFrame(rows, columns=METRIC_COLUMNS)
+        for column in ('needs_reorder', 'potential_stockout'):
+            metrics[column] = metrics[column].astype(bool)
+        metrics['current_stock'] = metrics['current_stock'].astype(np.int64)
+        metrics['product'] = metrics['product'].astype(object)
+        return metrics
+
+    # Uploads
+
+    def store_upload(self, incoming, folder, original_name: str, mode: str) -> tuple:
+        """
+        Record an upload saved at incoming and file it under folder by content.
+
+        Content seen before is not stored again: incoming is deleted and the
+        existing copy reused. Returns (upload id, path of the stored file,
+        whether the content was a duplicate).
+        """
+        incoming = Path(incoming)
+        sha256 = file_sha256(incoming)
+        size = incoming.stat().st_size
+        now = datetime.now().isoformat(timespec='seconds')
+        with self.transaction() as conn:
+            row = conn.execute('SELECT path FROM upload_files WHERE sha256 = ?', (sha256,)).fetchone()
+            duplicate = row is not None and Path(row[0]).is_file()
+            if duplicate:
+                path = Path(row[0])
+                incoming.unlink()
+            else:
+                path = Path(folder) / f"{sha256}{incoming.suffix.lower()}"
+                os.replace(incoming, path)
+                conn.execute('INSERT OR REPLACE INTO upload_files (sha256, path, size, stored_at) VALUES (?, ?, ?, ?)',
+                             (sha256, str(path), size, now))
+            cursor = conn.execute(
+                'INSERT INTO uploads (sha256, original_name, mode, status, uploaded_at) VALUES (?, ?, ?, ?, ?)',
+                (sha256, original_name, mode, UPLOAD_QUEUED, now))
+        return cursor.lastrowid, path, duplicate
+
+    def applied_upload(self, upload_id: int):
+        """
+        Id of an earlier upload with the same content as upload_id that is
+        already in the active dataset, i.e. finished since the dataset was last
+        replaced; None if there is none
+        """
+        conn = self.connection()
+        since = conn.execute('SELECT COALESCE(MAX(id), 0) FROM uploads WHERE status = ? AND mode = ?',
+                             (UPLOAD_DONE, 'replace')).fetchone()[0]
+        row = conn.execute(
+            'SELECT id FROM uploads WHERE sha256 = (SELECT sha256 FROM uploads WHERE id = ?) '
+            'AND status = ? AND id >= ? AND id != ? ORDER BY id DESC LIMIT 1',
+            (upload_id, UPLOAD_DONE, since, upload_id)).fetchone()
+        return row[0] if row else None
+
+    def register_files(self, paths):
+        """Record existing files by content hash so later uploads of the same content reuse them"""
+        paths = [Path(path) for path in paths]
+        known = {row[0] for row in self.connection().execute('SELECT path FROM upload_files')}
+        now = datetime.now().isoformat(timespec='seconds')
+        rows = [(file_sha256(path), str(path), path.stat().st_size, now)
+                for path in paths if str(path) not in known and path.is_file()]
+        if rows:
+            with self.transaction() as conn:
+                conn.executemany('INSERT OR IGNORE INTO upload_files (sha256, path, size, stored_at) '
+                                 'VALUES (?, ?, ?, ?)', rows)
+
+    def finish_upload(self, upload_id: int, rows: int = None, snapshot_id: str = None, error: str = None):
+        """Record the outcome of an upload: its row count and snapshot, or its error"""
+        with self.transaction() as conn:
+            conn.execute('UPDATE uploads SET status = ?, rows = ?, snapshot_id = ?, error = ?, finished_at = ? '
+                         'WHERE id = ?',
+                         (UPLOAD_FAILED if error else UPLOAD_DONE, rows, snapshot_id, error,
+                          datetime.now().isoformat(timespec='seconds'), upload_id))
+
+    def uploads(self, limit: int = 50) -> list:
+        """Most recent uploads first, as dicts"""
+        cursor = self.connection().execute(
+            'SELECT id, sha256, original_name, mode, status, rows, snapshot_id, error, uploaded_at, finished_at '
+            'FROM uploads ORDER BY id DESC LIMIT ?', (int(limit),))
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def stats(self) -> dict:
+        conn = self.connection()
+        counts = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                  for table in ('sales', 'metrics', 'upload_files', 'uploads')}
+        return {'path': str(self.path), 'sales_version': self.sales_version(), 'rows': counts}
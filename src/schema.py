@@ -0,0 +1,111 @@
+import pandas as pd
+
+# Bumped whenever the canonical columns or their dtypes change. Optional
+# columns do not count: frames without them are exactly what they were
+SCHEMA_VERSION = 2
+
+# Frames carrying this attrs key at SCHEMA_VERSION are already canonical
+SCHEMA_ATTR = 'sales_schema_version'
+
+# Canonical sales columns, in order, and their dtypes. current_stock is NaN
+# on rows that do not report a stock count
+SALES_COLUMNS = ['date', 'product', 'sold_units', 'current_stock']
+SALES_DTYPES = {
+    'date': 'datetime64[ns]',
+    'product': 'category',
+    'sold_units': 'int64',
+    'current_stock': 'float64',
+}
+
+# Columns kept after SALES_COLUMNS when the data has them: where each row was
+# recorded, for multi-location datasets (see rollup.py)
+OPTIONAL_COLUMNS = ['location', 'region']
+OPTIONAL_DTYPES = {
+    'location': 'category',
+    'region': 'category',
+}
+
+# Column name variations accepted from frames that did not come through load_sales
+LEGACY_COLUMN_MAP = {
+    'date': 'date',
+    'order date': 'date',
+    'product': 'product',
+    'item': 'product',
+    'sku': 'product',
+    'sold_units': 'sold_units',
+    'quantity': 'sold_units',
+    'qty': 'sold_units',
+    'current_stock': 'current_stock',
+    'stock': 'current_stock',
+    'inventory': 'current_stock',
+    'location': 'location',
+    'store': 'location',
+    'warehouse': 'location',
+    'region': 'region',
+}
+
+
+def is_canonical(df: pd.DataFrame) -> bool:
+    """Return True if df is flagged as a canonical sales frame of the current version"""
+    return df.attrs.get(SCHEMA_ATTR) == SCHEMA_VERSION
+
+
+def mark_canonical(df: pd.DataFrame) -> pd.DataFrame:
+    df.attrs[SCHEMA_ATTR] = SCHEMA_VERSION
+    return df
+
+
+def to_canonical(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Build the canonical frame from one that already has the standard column
+    names and parsed values. Columns that already have their canonical dtype
+    are reused as-is; anything beyond SALES_COLUMNS and the OPTIONAL_COLUMNS
+    present is dropped.
+    """
+    columns = {}
+    dtypes = {**SALES_DTYPES, **OPTIONAL_DTYPES}
+    for name in SALES_COLUMNS + [name for name in OPTIONAL_COLUMNS if name in df.columns]:
+        series = df[name]
+        dtype = dtypes[name]
+        if dtype == 'category':
+            columns[name] = series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype(dtype)
+        else:
+            columns[name] = series if series.dtype == dtype else series.astype(dtype)
+    return mark_canonical(pd.DataFrame(columns, copy=False))
+
+
+def ensure_canonical(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return df unchanged if it is already canonical, otherwise map common
+    column name variations onto the standard names and cast the result.
+    """
+    if is_canonical(df):
+        return df
+
+    df = df.rename(columns=lambda col: str(col).lower().strip())
+    df = df.rename(columns={col: new_col for col, new_col in LEGACY_COLUMN_MAP.items()
+                            if col in df.columns and new_col not in df.columns})
+
+    # Ensure required columns exist
+    missing_columns = []
+    if 'product' not in df.columns:
+        missing_columns.append('product (or item, sku)')
+    if 'sold_units' not in df.columns:
+        missing_columns.append('sold_units (or quantity, qty)')
+    if missing_columns:
+        raise ValueError(f"Could not find required columns: {', '.join(missing_columns)}. "
+                         f"Available columns: {', '.join(df.columns)}")
+
+    # Ensure we have a date column, if not create a dummy one
+    if 'date' not in df.columns:
+        df = df.assign(date=pd.Timestamp('today').normalize())
+
+    # Ensure we have a current_stock column, if not the stock is unknown
+    if 'current_stock' not in df.columns:
+        df = df.assign(current_stock=float('nan'))
+
+    return to_canonical(df.assign(
+        date=pd.to_datetime(df['date'], errors='coerce'),
+        sold_units=pd.to_numeric(df['sold_units'], errors='coerce').fillna(0),
+        current_stock=pd.to_numeric(df['current_stock'], errors='coerce'),
+    ))
@@ -0,0 +1,117 @@
+import struct
+
+import numpy as np
+import pandas as pd
+
+# Layout of the binary series format: a little-endian uint32 point count and
+# uint32 format version (8 bytes, so the arrays stay aligned), then float64
+# dates (ms since epoch), float32 sold units and float32 stock
+BINARY_HEADER = struct.Struct('<II')
+BINARY_VERSION = 1
+BINARY_MIMETYPE = 'application/octet-stream'
+
+# LTTB buckets larger than this are scanned with numpy instead of a Python loop
+LTTB_VECTOR_BUCKET = 64
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Returns the sorted indices of at most `threshold` points that keep the
+    visual shape of the (x, y) line: the first and last points, plus the
+    point of each bucket forming the largest triangle with the previously
+    kept point and the average of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket i covers [edges[i], edges[i + 1]) for the n - 2 interior points;
+    # the last "bucket" is the final point on its own
+    edges = (np.floor(np.arange(threshold - 1) * (n - 2) / (threshold - 2)) + 1).astype(np.int64)
+    edges[-1] = n - 1
+    bounds = np.append(edges, n)
+    avg_x = (np.add.reduceat(x, edges) / np.diff(bounds)).tolist()
+    avg_y = (np.add.reduceat(y, edges) / np.diff(bounds)).tolist()
+
+    # Only the choice of the previous point is sequential. Small buckets are
+    # scanned in plain Python, which beats numpy's per-call overhead.
+    xs, ys, edges = x.tolist(), y.tolist(), edges.tolist()
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_x, next_y = avg_x[i + 1], avg_y[i + 1]
+        xa, ya = xs[a], ys[a]
+        if stop - start > LTTB_VECTOR_BUCKET:
+            area = np.abs((xa - next_x) * (y[start:stop] - ya) - (xa - x[start:stop]) * (next_y - ya))
+            a = start + int(np.argmax(area))
+        else:
+            best = -1.0
+            for j in range(start, stop):
+                area = abs((xa - next_x) * (ys[j] - ya) - (xa - xs[j]) * (next_y - ya))
+                if area > best:
+                    best, a = area, j
+        selected[i + 1] = a
+    return selected
+
+
+def build_series(product_data: pd.DataFrame, max_points: int = None) -> dict:
+    """
+    Compact columnar series for one product's date-sorted rows.
+
+    With max_points the series is downsampled with LTTB on sold units, and
+    stock is taken at the same points. The mean is always over the full
+    history so the chart's average line does not shift with downsampling.
+    """
+    dates = product_data['date'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+    sold = product_data['sold_units'].to_numpy(dtype=np.float64)
+    if 'current_stock' in product_data.columns:
+        stock = product_data['current_stock'].to_numpy(dtype=np.float64)
+    else:
+        stock = np.zeros(len(sold))
+
+    total_points = len(dates)
+    if max_points:
+        keep = lttb(dates, sold, max_points)
+        dates, sold, stock = dates[keep], sold[keep], stock[keep]
+
+    return {
+        'dates': dates,
+        'sold_units': sold,
+        'current_stock': stock,
+        'mean_sold_units': float(product_data['sold_units'].mean()) if total_points else None,
+        'total_points': total_points,
+    }
+
+
+def series_to_json(product, series: dict) -> dict:
+    """JSON-ready dict with ISO dates and integer units where the values allow it"""
+    def compact(values):
+        return values.astype(np.int64).tolist() if np.all(values == np.round(values)) else values.tolist()
+
+    return {
+        'product': str(product),
+        'dates': np.datetime_as_string(series['dates'].astype('datetime64[ms]'), unit='D').tolist(),
+        'sold_units': compact(series['sold_units']),
+        'current_stock': compact(series['current_stock']),
+        'mean_sold_units': series['mean_sold_units'],
+        'points': len(series['dates']),
+        'total_points': series['total_points'],
+    }
+
+
+def series_to_binary(series: dict) -> bytes:
+    """Pack a series as BINARY_HEADER followed by its typed arrays"""
+    n = len(series['dates'])
+    return b''.join([
+        BINARY_HEADER.pack(n, BINARY_VERSION),
+        series['dates'].astype('<f8').tobytes(),
+        series['sold_units'].astype('<f4').tobytes(),
+        series['current_stock'].astype('<f4').tobytes(),
+    ])
@@ -0,0 +1,239 @@
+import itertools
+
+import numpy as np
+
+# Smoothing parameters tried for every item by the grid search
+ALPHA_GRID = (0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.7, 0.9)
+BETA_GRID = (0.01, 0.05, 0.15)
+GAMMA_GRID = (0.05, 0.15, 0.3)
+
+# Seasonal period of Holt-Winters, in days
+DEFAULT_SEASON_LENGTH = 7
+
+# Items fitted together; bounds the (items x parameter combinations) state arrays
+FIT_BATCH_ITEMS = 2048
+
+
+def history_matrix(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Item histories from the item layout (see DemandEngine._item_layout) as rows
+    of an (items x steps) array, right-aligned on each item's last row and
+    NaN-padded in front, so one column is one time step for every item.
+    Layouts from a DemandMatrix end on the same day for every item, so the
+    columns are calendar days.
+    """
+    lengths = ends - starts
+    n_steps = int(lengths.max()) if len(lengths) else 0
+    matrix = np.full((len(lengths), n_steps), np.nan)
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    columns = np.arange(len(values)) - np.repeat(starts, lengths) + np.repeat(n_steps - lengths, lengths)
+    matrix[rows, columns] = values
+    return matrix
+
+
+class ExponentialSmoothing:
+    """
+    Base class of the batched exponential smoothing forecasters.
+
+    fit() runs the model's recurrence for every item and every combination
+    of smoothing parameters at once: the state arrays have shape
+    (items, combinations) and each time step is a handful of array
+    operations, so all SKUs advance together. The combination with the
+    lowest one-step-ahead squared error is kept per item, along with its
+    final state, from which forecast() extrapolates.
+
+    Subclasses define param_names, a default grid, the initial state and
+    the one-step update. Missing values (NaN) leave an item's state as is.
+    """
+
+    name = None
+    param_names = ()
+    # Observations consumed by the initial state before errors are scored
+    warmup = 1
+
+    def __init__(self, grid: dict = None):
+        grid = {**self.default_grid(), **(grid or {})}
+        self.combinations = np.array(list(itertools.product(*(grid[name] for name in self.param_names))),
+                                     dtype=float)
+        self.params = None
+        self.state = None
+        self.sse = None
+        self.n_steps = 0
+
+    def default_grid(self) -> dict:
+        return {}
+
+    def initial_state(self, matrix: np.ndarray, first: np.ndarray) -> list:
+        """State arrays of shape (items,) or (items, ...) after the warmup observations"""
+        raise NotImplementedError
+
+    def step(self, state: list, params: list, y: np.ndarray, t: int, mask: np.ndarray) -> np.ndarray:
+        """
+        Advance state in place by one time step where mask is set and return
+        the one-step-ahead error y - prediction made before the update.
+        """
+        raise NotImplementedError
+
+    def fit(self, matrix: np.ndarray):
+        """Fit smoothing parameters per item on an (items x steps) history matrix"""
+        n_items, self.n_steps = matrix.shape
+        self.params = np.empty((n_items, len(self.param_names)))
+        self.sse = np.empty(n_items)
+        states = []
+        for start in range(0, n_items, FIT_BATCH_ITEMS):
+            chunk = matrix[start:start + FIT_BATCH_ITEMS]
+            params, state, sse = self._fit_chunk(chunk)
+            self.params[start:start + len(chunk)] = params
+            self.sse[start:start + len(chunk)] = sse
+            states.append(state)
+        self.state = [np.concatenate(parts) for parts in zip(*states)] if states else []
+        return self
+
+    def _fit_chunk(self, chunk: np.ndarray):
+        n_items, n_steps = chunk.shape
+        n_combinations = len(self.combinations)
+        observed = ~np.isnan(chunk)
+        first = np.where(observed.any(axis=1), observed.argmax(axis=1), n_steps)
+
+        # Every combination starts from the same initial state
+        state = [np.repeat(part[:, None], n_combinations, axis=1)
+                 for part in self.initial_state(chunk, first)]
+        params = [self.combinations[:, i] for i in range(len(self.param_names))]
+        sse = np.zeros((n_items, n_combinations))
+        scored_from = first + self.warmup
+
+        for t in range(int(scored_from.min(initial=n_steps)), n_steps):
+            y = chunk[:, t]
+            active = (scored_from <= t) & observed[:, t]
+            if not active.any():
+                continue
+            mask = active[:, None]
+            error = self.step(state, params, y[:, None], t, mask)
+            sse += np.where(mask, error * error, 0.0)
+
+        best = sse.argmin(axis=1)
+        rows = np.arange(n_items)
+        return (self.combinations[best], [part[rows, best] for part in state], sse[rows, best])
+
+    def forecast(self, horizon: int) -> np.ndarray:
+        """Forecasts for the next `horizon` steps after the history, shape (items, horizon)"""
+        raise NotImplementedError
+
+
+class SimpleExponentialSmoothing(ExponentialSmoothing):
+    """SES: a level updated towards each observation; the forecast is flat"""
+
+    name = 'ses'
+    param_names = ('alpha',)
+
+    def default_grid(self) -> dict:
+        return {'alpha': ALPHA_GRID}
+
+    def initial_state(self, matrix, first):
+        level = matrix[np.arange(len(matrix)), np.minimum(first, matrix.shape[1] - 1)] if matrix.size else np.empty(0)
+        return [np.where(first < matrix.shape[1], level, np.nan)]
+
+    def step(self, state, params, y, t, mask):
+        level, = state
+        alpha, = params
+        error = y - level
+        np.copyto(level, level + alpha * error, where=mask)
+        return error
+
+    def forecast(self, horizon):
+        level, = self.state
+        return np.repeat(level[:, None], horizon, axis=1)
+
+
+class HoltLinear(SimpleExponentialSmoothing):
+    """Holt's linear method: level plus a smoothed trend, extrapolated linearly"""
+
+    name = 'holt'
+    param_names = ('alpha', 'beta')
+
+    def default_grid(self) -> dict:
+        return {'alpha': ALPHA_GRID, 'beta': BETA_GRID}
+
+    def initial_state(self, matrix, first):
+        level, = super().initial_state(matrix, first)
+        return [level, np.zeros(len(level))]
+
+    def step(self, state, params, y, t, mask):
+        level, trend = state
+        alpha, beta = params
+        prediction = level + trend
+        error = y - prediction
+        new_level = prediction + alpha * error
+        np.copyto(trend, trend + beta * (new_level - prediction), where=mask)
+        np.copyto(level, new_level, where=mask)
+        return error
+
+    def forecast(self, horizon):
+        level, trend = self.state
+        return level[:, None] + trend[:, None] * np.arange(1, horizon + 1)
+
+
+class HoltWinters(HoltLinear):
+    """
+    Additive Holt-Winters: level, trend and one seasonal offset per position
+    in a cycle of season_length steps.
+
+    Seasonal offsets live in a ring indexed by column % season_length, so the
+    same calendar position maps to the same slot for every item of a matrix.
+    The first season of each item initializes the level (its mean) and the
+    offsets (deviations from it).
+    """
+
+    name = 'holt_winters'
+    param_names = ('alpha', 'beta', 'gamma')
+
+    def __init__(self, grid: dict = None, season_length: int = DEFAULT_SEASON_LENGTH):
+        if season_length < 2:
+            raise ValueError("season_length must be at least 2")
+        self.season_length = season_length
+        self.warmup = season_length
+        super().__init__(grid)
+
+    def default_grid(self) -> dict:
+        return {'alpha': ALPHA_GRID[1:6:2], 'beta': BETA_GRID[:2], 'gamma': GAMMA_GRID}
+
+    def initial_state(self, matrix, first):
+        m = self.season_length
+        n_items, n_steps = matrix.shape
+        columns = first[:, None] + np.arange(m)
+        inside = columns < n_steps
+        window = np.where(inside, matrix[np.arange(n_items)[:, None], np.minimum(columns, n_steps - 1)], np.nan)
+        known = ~np.isnan(window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            level = np.where(known, window, 0.0).sum(axis=1) / known.sum(axis=1)
+
+        season = np.zeros((n_items, m))
+        deviations = np.where(known, window - level[:, None], 0.0)
+        season[np.arange(n_items)[:, None], columns % m] = deviations
+        return [level, np.zeros(n_items), season]
+
+    def step(self, state, params, y, t, mask):
+        level, trend, season = state
+        alpha, beta, gamma = params
+        slot = season[:, :, t % self.season_length]
+        base = level + trend
+        error = y - (base + slot)
+        new_level = base + alpha * (y - slot - base)
+        np.copyto(slot, slot + gamma * (y - new_level - slot), where=mask)
+        np.copyto(trend, trend + beta * (new_level - base), where=mask)
+        np.copyto(level, new_level, where=mask)
+        return error
+
+    def forecast(self, horizon):
+        level, trend, season = self.state
+        steps = np.arange(1, horizon + 1)
+        slots = (self.n_steps - 1 + steps) % self.season_length
+        return level[:, None] + trend[:, None] * steps + season[:, slots]
+
+
+# Forecasters selectable with DemandEngine.run(method=...), besides 'sma'
+FORECASTERS = {
+    SimpleExponentialSmoothing.name: SimpleExponentialSmoothing,
+    HoltLinear.name: HoltLinear,
+    HoltWinters.name: HoltWinters,
+}
@@ -0,0 +1,198 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+from columnar_store import is_columnar_store, read_columnar
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within one process
+    fcntl = None
+
+# ioctl that makes a copy-on-write clone of a file on btrfs and XFS
+FICLONE = 0x40049409
+
+POINTER_NAME = 'CURRENT'
+LOCK_NAME = 'write.lock'
+SNAPSHOTS_DIR = 'snapshots'
+
+# Old snapshots kept besides the current one, and the minimum age before any
+# snapshot is deleted so requests that just resolved it can still open it
+KEEP_SNAPSHOTS = 2
+SNAPSHOT_GRACE_SECONDS = 300
+
+
+def is_snapshot_store(path) -> bool:
+    """Return True if path is a directory managed by SnapshotStore"""
+    return (Path(path) / POINTER_NAME).is_file()
+
+
+def _clone_file(source: Path, destination: Path):
+    """Copy a file, as a copy-on-write clone where the filesystem supports it"""
+    if fcntl is not None:
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return
+            except OSError:
+                pass
+    shutil.copyfile(source, destination)
+
+
+class Snapshot:
+    """A snapshot being written inside SnapshotStore.transaction"""
+
+    def __init__(self, snapshot_id: str, path: Path, base_id: str):
+        self.id = snapshot_id
+        self.path = path
+        self.base_id = base_id
+
+
+class SnapshotStore:
+    """
+    Versioned, immutable columnar datasets behind an atomic "current" pointer.
+
+    Every write builds a complete columnar store in a new snapshot directory
+    and then publishes it by atomically replacing the CURRENT pointer file.
+    Readers resolve the pointer once and read that snapshot, so they never see
+    a partial write and never take a lock; an in-flight request keeps the
+    snapshot it started with. Writers are serialized with a lock file, which
+    also covers other worker processes where fcntl is available.
+
+    Appends start from a copy of the base snapshot's files, reflinked where the
+    filesystem supports it, and extend the copies, so a published snapshot is
+    never modified. The pointer only ever moves forward to freshly written
+    snapshots.
+
+    Superseded snapshots are deleted after each publish, keeping the newest
+    `keep` and anything younger than `grace_seconds`.
+    """
+
+    def __init__(self, root, keep: int = KEEP_SNAPSHOTS, grace_seconds: float = SNAPSHOT_GRACE_SECONDS):
+        self.root = Path(root)
+        self.keep = keep
+        self.grace_seconds = grace_seconds
+        self._thread_lock = threading.Lock()
+
+    @property
+    def snapshots_dir(self) -> Path:
+        return self.root / SNAPSHOTS_DIR
+
+    def current_id(self):
+        """Return the id of the published snapshot, or None if nothing was published yet"""
+        try:
+            return (self.root / POINTER_NAME).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def path_for(self, snapshot_id: str) -> Path:
+        return self.snapshots_dir / snapshot_id
+
+    def current_path(self) -> Path:
+        snapshot_id = self.current_id()
+        if snapshot_id is None:
+            raise FileNotFoundError(f"No dataset has been published in {self.root}")
+        return self.path_for(snapshot_id)
+
+    def read(self, mmap: bool = True) -> pd.DataFrame:
+        """Load the current snapshot"""
+        return read_columnar(self.current_path(), mmap=mmap)
+
+    @contextmanager
+    def _write_lock(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.root / LOCK_NAME, 'a') as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _new_id() -> str:
+        # Sortable by creation time, unique across processes
+        return f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+
+    def _copy_base(self, base: Path, target: Path):
+        """Copy the base snapshot's files into a new snapshot that will append to them"""
+        for source in base.iterdir():
+            if source.suffix == '.tmp':
+                continue
+            _clone_file(source, target / source.name)
+
+    @contextmanager
+    def transaction(self, append: bool = False):
+        """
+        Write a new snapshot and publish it when the block exits cleanly.
+
+        Yields a Snapshot whose path is an empty directory, or with append=True
+        a copy of the current snapshot to open with
+        ColumnarWriter(path, append=True). Nothing is visible to readers until
+        the block exits; on an exception the snapshot is discarded.
+        """
+        with self._write_lock():
+            base_id = self.current_id()
+            snapshot = Snapshot(self._new_id(), None, base_id)
+            snapshot.path = self.path_for(snapshot.id)
+            snapshot.path.mkdir(parents=True)
+            try:
+                if append and base_id is not None:
+                    self._copy_base(self.path_for(base_id), snapshot.path)
+                yield snapshot
+                if not is_columnar_store(snapshot.path):
+                    raise ValueError("Nothing was written to the new snapshot")
+                self._publish(snapshot.id, base_id)
+            except BaseException:
+                shutil.rmtree(snapshot.path, ignore_errors=True)
+                raise
+            self.collect_garbage()
+
+    def _publish(self, snapshot_id: str, previous_id: str):
+        tmp_path = self.root / f"{POINTER_NAME}.{snapshot_id}.tmp"
+        with open(tmp_path, 'w') as handle:
+            handle.write(snapshot_id)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, self.root / POINTER_NAME)
+
+        # The grace period for deleting a snapshot runs from when it stopped being current
+        if previous_id is not None:
+            try:
+                os.utime(self.path_for(previous_id))
+            except FileNotFoundError:
+                pass
+
+    def snapshot_ids(self) -> list:
+        if not self.snapshots_dir.exists():
+            return []
+        return sorted(path.name for path in self.snapshots_dir.iterdir() if path.is_dir())
+
+    def collect_garbage(self) -> list:
+        """Delete superseded snapshots past the retention limits; returns the removed ids"""
+        current = self.current_id()
+        now = time.time()
+        older = [snapshot_id for snapshot_id in self.snapshot_ids() if snapshot_id != current]
+        removed = []
+        for snapshot_id in older[:max(len(older) - self.keep, 0)]:
+            path = self.path_for(snapshot_id)
+            try:
+                age = now - path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if age < self.grace_seconds:
+                continue
+            # Files still mapped on platforms that forbid deleting them are retried next time
+            shutil.rmtree(path, ignore_errors=True)
+            if not path.exists():
+                removed.append(snapshot_id)
+        return removed
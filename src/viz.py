@@ -1,5 +1,6 @@
 import pandas as pd
 import matplotlib.pyplot as plt
+from product_index import ProductIndex
 
 plt.style.use('dark_background')
 
@@ -7,9 +8,29 @@ class Visualizer:
     def __init__(self, df: pd.DataFrame, forecast_df: pd.DataFrame = None):
         self.df = df.copy()
         self.forecast_df = forecast_df.copy() if forecast_df is not None else None
+        self._index = None
+        self._forecast_index = None
+
+    @classmethod
+    def from_engine(cls, engine, window: int = None, horizon: int = 1):
+        """Visualizer over an engine's history and its backtested forecasts"""
+        return cls(engine.df[["Item", "Date", "QuantitySold"]], engine.backtest_forecasts(window, horizon))
+
+    @property
+    def index(self) -> ProductIndex:
+        """Item -> row range index over the history, built on first use"""
+        if self._index is None:
+            self._index = ProductIndex(self.df, key="Item", date="Date", case_sensitive=True)
+        return self._index
+
+    @property
+    def forecast_index(self) -> ProductIndex:
+        if self._forecast_index is None:
+            self._forecast_index = ProductIndex(self.forecast_df, key="Item", date="Date", case_sensitive=True)
+        return self._forecast_index
 
     def plot_demand_trend(self, item: str):
-        data = self.df[self.df["Item"] == item].sort_values("Date")
+        data = self.index.slice(item)
         if data.empty:
             raise ValueError(f"No data found for item: {item}")
         plt.figure()
@@ -22,8 +43,8 @@ class Visualizer:
     def plot_forecast_accuracy(self, item: str):
         if self.forecast_df is None:
             raise ValueError("forecast_df required for forecast accuracy plot.")
-        actual = self.df[self.df["Item"] == item].sort_values("Date")
-        forecast = self.forecast_df[self.forecast_df["Item"] == item].sort_values("Date")
+        actual = self.index.slice(item)
+        forecast = self.forecast_index.slice(item)
         merged = pd.merge(actual, forecast, on=["Item", "Date"], how="inner")
         if merged.empty:
             raise ValueError(f"Forecast and actual data do not align for item: {item}")
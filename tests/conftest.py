@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The application modules live flat in src/, as the app and benchmarks import them
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
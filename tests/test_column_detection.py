@@ -0,0 +1,53 @@
+"""
+Column detection through the schema memo: a header seen before is answered
+from the memo even when it differs only in case or surrounding whitespace,
+and the memo file carries hits across processes.
+"""
+import pandas as pd
+import pytest
+
+from column_detection import SchemaMemo, detect_columns
+from data_loader import iter_sales_chunks, load_sales
+
+ROWS = '2024-01-01,A,3,40\n2024-01-02,A,1,39\n'
+
+
+def write_csv(tmp_path, name: str, header: str):
+    path = tmp_path / name
+    path.write_text(header + '\n' + ROWS)
+    return path
+
+
+@pytest.mark.parametrize('first, second', [
+    ('date,product,units sold,stock', 'Date,PRODUCT,Units Sold,Stock'),
+    ('Date,Product,Units Sold,Stock', ' date , product,units sold  ,stock\t'),
+])
+def test_header_differing_in_case_or_whitespace_hits_the_memo(tmp_path, first, second):
+    memo = SchemaMemo(tmp_path / 'memo.json')
+    expected = load_sales(str(write_csv(tmp_path, 'first.csv', first)), memo=memo)
+    assert memo.stats() == {'entries': 1, 'hits': 0, 'misses': 1}
+
+    df = load_sales(str(write_csv(tmp_path, 'second.csv', second)), memo=memo)
+    assert memo.stats() == {'entries': 1, 'hits': 1, 'misses': 1}
+    pd.testing.assert_frame_equal(df, expected)
+
+    chunks = list(iter_sales_chunks(str(tmp_path / 'second.csv'), memo=memo))
+    assert memo.stats()['hits'] == 2
+    assert chunks[0]['sold_units'].tolist() == [3.0, 1.0]
+
+
+def test_memo_file_is_shared_between_instances(tmp_path):
+    load_sales(str(write_csv(tmp_path, 'first.csv', 'Date,Item,Qty,On Hand')), memo=SchemaMemo(tmp_path / 'memo.json'))
+
+    memo = SchemaMemo(tmp_path / 'memo.json')
+    df = load_sales(str(write_csv(tmp_path, 'second.csv', 'DATE,ITEM,QTY,ON HAND ')), memo=memo)
+    assert memo.stats()['hits'] == 1
+    assert df['current_stock'].tolist() == [40.0, 39.0]
+
+
+def test_memoized_mapping_matches_detection():
+    columns = ['order date', 'sku', 'qty', 'warehouse', 'current inventory']
+    memo = SchemaMemo()
+    detected = detect_columns(columns, memo=memo)
+    assert detect_columns(columns, memo=memo) == detected == detect_columns(columns)
+    assert memo.stats()['hits'] == 1
@@ -0,0 +1,196 @@
+"""
+Incremental maintenance of the demand matrix: extending a matrix with
+appended deltas must give the same arrays, and the same metrics, as
+rebuilding it from the full history.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_loader import load_sales
+from demand_matrix import DemandMatrix
+from metrics_engine import compute_metrics_from_matrix
+
+
+def make_sales(n_products: int = 20, n_days: int = 40, seed: int = 0) -> pd.DataFrame:
+    """Sparse canonical sales rows, several per day for some products, with gaps and missing stock"""
+    rng = np.random.default_rng(seed)
+    n_rows = n_products * n_days
+    df = pd.DataFrame({
+        'date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, n_days, n_rows), unit='D'),
+        'product': rng.choice([f"SKU-{i:03d}" for i in range(n_products)], n_rows),
+        'sold_units': rng.poisson(5, n_rows).astype(float),
+        'current_stock': rng.integers(0, 300, n_rows).astype(float),
+    })
+    df.loc[rng.random(n_rows) < 0.1, 'current_stock'] = np.nan
+    return df.sort_values('date', kind='stable').reset_index(drop=True)
+
+
+def assert_same_matrix(actual: DemandMatrix, expected: DemandMatrix):
+    assert list(actual.products) == list(expected.products)
+    assert actual.start == expected.start
+    np.testing.assert_array_equal(actual.units, expected.units)
+    np.testing.assert_array_equal(actual.stock, expected.stock)
+    np.testing.assert_array_equal(actual.first_day, expected.first_day)
+    np.testing.assert_array_equal(actual.current_stock, expected.current_stock)
+    np.testing.assert_array_equal(actual.stock_day, expected.stock_day)
+    # Running sums carried through extends agree with the arrays they summarize
+    recomputed = DemandMatrix(actual.products, actual.start, actual.units, None, actual.first_day, None)
+    np.testing.assert_allclose(actual.totals(), recomputed.totals())
+    np.testing.assert_allclose(actual.std(), recomputed.std())
+    pd.testing.assert_frame_equal(compute_metrics_from_matrix(actual), compute_metrics_from_matrix(expected))
+
+
+@pytest.mark.parametrize('split_day', [1, 20, 39])
+def test_extend_matches_full_rebuild(split_day):
+    df = make_sales()
+    cutoff = pd.Timestamp('2024-01-01') + pd.Timedelta(days=split_day)
+    base, delta = df[df['date'] < cutoff], df[df['date'] >= cutoff]
+
+    extended = DemandMatrix.from_frame(base).extend(delta)
+    assert_same_matrix(extended, DemandMatrix.from_frame(df))
+
+
+def test_statistics_match_pandas_on_daily_series():
+    df = make_sales(seed=6)
+    df['sold_units'] += 0.25
+    matrix = DemandMatrix.from_frame(df[df['date'] < pd.Timestamp('2024-01-20')]).extend(
+        df[df['date'] >= pd.Timestamp('2024-01-20')])
+    calendar = pd.date_range(df['date'].min(), df['date'].max())
+    for row, product in enumerate(matrix.products):
+        rows = df[df['product'] == product]
+        daily = rows.groupby('date')['sold_units'].sum().reindex(calendar[calendar >= rows['date'].min()],
+                                                                 fill_value=0)
+        assert matrix.mean()[row] == pytest.approx(daily.mean())
+        assert matrix.std()[row] == pytest.approx(daily.std())
+
+
+def test_chained_extends_match_full_rebuild():
+    df = make_sales(seed=1)
+    bounds = pd.Timestamp('2024-01-01') + pd.to_timedelta([0, 10, 11, 25, 40], unit='D')
+    matrix = DemandMatrix.empty()
+    for begin, end in zip(bounds[:-1], bounds[1:]):
+        matrix = matrix.extend(df[(df['date'] >= begin) & (df['date'] < end)])
+    assert_same_matrix(matrix, DemandMatrix.from_frame(df))
+
+
+def test_delta_sharing_the_last_day_is_added_to_it():
+    df = make_sales(seed=2)
+    last_day = df['date'].max()
+    # Rows of the last day arrive in two uploads
+    base = df.iloc[:len(df) - 5]
+    delta = df.iloc[len(df) - 5:]
+    assert (delta['date'] == last_day).all() and (base['date'] == last_day).any()
+
+    assert_same_matrix(DemandMatrix.from_frame(base).extend(delta), DemandMatrix.from_frame(df))
+
+
+def test_new_products_in_delta():
+    df = make_sales(seed=3)
+    late = df['product'].isin(['SKU-000', 'SKU-001']) & (df['date'] < pd.Timestamp('2024-01-30'))
+    df = df[~late]
+    cutoff = pd.Timestamp('2024-01-30')
+
+    extended = DemandMatrix.from_frame(df[df['date'] < cutoff]).extend(df[df['date'] >= cutoff])
+    assert_same_matrix(extended, DemandMatrix.from_frame(df))
+
+
+def test_append_updates_current_stock():
+    base = pd.DataFrame({
+        'date': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-02']),
+        'product': ['X', 'X', 'Y'],
+        'sold_units': [1.0, 2.0, 4.0],
+        'current_stock': [50.0, 45.0, 10.0],
+    })
+    delta = pd.DataFrame({
+        'date': pd.to_datetime(['2024-01-03', '2024-01-03']),
+        'product': ['X', 'Y'],
+        'sold_units': [3.0, 1.0],
+        # Y's newer row has no stock, so its last reported stock stands
+        'current_stock': [28.0, np.nan],
+    })
+
+    matrix = DemandMatrix.from_frame(base)
+    extended = matrix.extend(delta)
+    metrics = compute_metrics_from_matrix(extended).set_index('product')
+    assert metrics.loc['X', 'current_stock'] == 28
+    assert metrics.loc['Y', 'current_stock'] == 10
+    assert_same_matrix(extended, DemandMatrix.from_frame(pd.concat([base, delta], ignore_index=True)))
+
+    # The matrix that was extended is unchanged for readers still holding it
+    assert compute_metrics_from_matrix(matrix).set_index('product').loc['X', 'current_stock'] == 45
+
+
+def test_loaded_delta_without_stock_keeps_the_last_reported_stock(tmp_path):
+    (tmp_path / 'base.csv').write_text(
+        'date,product,sold_units,current_stock\n'
+        '2024-01-01,A,3,40\n'
+        '2024-01-01,B,2,25\n')
+    # A sales-only file, as appended between stock counts
+    (tmp_path / 'delta.csv').write_text(
+        'date,product,sold_units\n'
+        '2024-01-02,A,1\n'
+        '2024-01-02,B,4\n')
+
+    base, delta = load_sales(str(tmp_path / 'base.csv')), load_sales(str(tmp_path / 'delta.csv'))
+    assert delta['current_stock'].isna().all()
+
+    extended = DemandMatrix.from_frame(base).extend(delta)
+    metrics = compute_metrics_from_matrix(extended).set_index('product')
+    assert metrics.loc['A', 'current_stock'] == 40
+    assert metrics.loc['B', 'current_stock'] == 25
+    assert_same_matrix(extended, DemandMatrix.from_frame(pd.concat([base, delta], ignore_index=True)))
+
+
+def test_last_row_of_the_day_sets_the_stock():
+    df = pd.DataFrame({
+        'date': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-02']),
+        'product': ['X', 'X', 'X'],
+        'sold_units': [1.0, 2.0, 3.0],
+        'current_stock': [50.0, 40.0, 35.0],
+    })
+    matrix = DemandMatrix.from_frame(df)
+    assert matrix.current_stock[0] == 35
+    assert matrix.stock[0, -1] == 35
+
+
+def test_daily_appends_past_the_spare_columns_match_full_rebuild():
+    df = make_sales(n_products=5, n_days=120, seed=4)
+    start = pd.Timestamp('2024-01-01')
+    matrix = DemandMatrix.from_frame(df[df['date'] < start + pd.Timedelta(days=10)])
+    snapshots = []
+    for day in range(10, 120):
+        rows = df[df['date'] == start + pd.Timedelta(days=day)]
+        if len(rows):
+            snapshots.append((matrix, matrix.units.copy(), matrix.stock.copy()))
+            matrix = matrix.extend(rows)
+    assert_same_matrix(matrix, DemandMatrix.from_frame(df))
+
+    # Growing in place never changes what earlier matrices see
+    for older, units, stock in snapshots:
+        np.testing.assert_array_equal(older.units, units)
+        np.testing.assert_array_equal(older.stock, stock)
+
+
+def test_two_extends_of_one_matrix_do_not_share_new_days():
+    df = make_sales(seed=5)
+    cutoff = pd.Timestamp('2024-01-30')
+    base = DemandMatrix.from_frame(df[df['date'] < cutoff])
+    first_delta = df[df['date'] >= cutoff]
+    second_delta = first_delta.assign(sold_units=first_delta['sold_units'] * 2, current_stock=7.0)
+
+    first = base.extend(first_delta)
+    second = base.extend(second_delta)
+    assert_same_matrix(first, DemandMatrix.from_frame(df))
+    assert_same_matrix(second, DemandMatrix.from_frame(pd.concat([df[df['date'] < cutoff], second_delta])))
+
+
+@pytest.mark.parametrize('outlier', ['1970-01-01', '2099-12-31'])
+def test_outlier_dates_are_rejected(outlier):
+    df = make_sales(n_products=3, n_days=5)
+    matrix = DemandMatrix.from_frame(df)
+    delta = df.iloc[:1].assign(date=pd.Timestamp(outlier))
+    with pytest.raises(ValueError, match='mistyped dates'):
+        matrix.extend(delta)
+    with pytest.raises(ValueError, match='mistyped dates'):
+        DemandMatrix.from_frame(pd.concat([df, delta]))
@@ -0,0 +1,80 @@
+"""
+Keyset pagination of the metrics table: following next_cursor visits every
+matching row exactly once in sort order, ties and NaN included, and a cursor
+keeps its place when the table is rebuilt with other rows.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from metrics_engine import METRIC_COLUMNS
+from metrics_table import MetricsTable, decode_cursor, encode_cursor
+
+
+def make_metrics(n_products: int = 57, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    # Few distinct values so pages split runs of ties
+    avg_demand = rng.integers(0, 5, n_products).astype(float)
+    avg_demand[::9] = np.nan
+    frame = pd.DataFrame({column: np.zeros(n_products) for column in METRIC_COLUMNS})
+    return frame.assign(
+        product=[f"SKU-{i:03d}" for i in rng.permutation(n_products)],
+        avg_demand=avg_demand,
+        needs_reorder=rng.random(n_products) < 0.5,
+        potential_stockout=False,
+    )
+
+
+def collect(table: MetricsTable, limit: int, cursor: str = None, **query) -> list:
+    """Products of every page from cursor on, following next_cursor"""
+    products = []
+    while True:
+        page = table.query(limit=limit, cursor=cursor, **query)
+        products += [item['product'] for item in page['items']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            return products
+
+
+def test_cursor_round_trips():
+    cursor = encode_cursor('-avg_demand', -2.5, 'SKU-007')
+    assert decode_cursor(cursor) == {'sort': '-avg_demand', 'key': -2.5, 'product': 'SKU-007'}
+    with pytest.raises(ValueError):
+        decode_cursor('not a cursor')
+
+
+@pytest.mark.parametrize('sort', ['product', '-product', 'avg_demand', '-avg_demand'])
+@pytest.mark.parametrize('limit', [1, 4, 100])
+def test_pages_visit_every_row_once_in_order(sort, limit):
+    table = MetricsTable(make_metrics())
+    expected = [table.frame['product'][i] for i in table.select(sort)]
+    assert collect(table, limit, sort=sort) == expected
+    assert len(expected) == len(table)
+
+
+def test_pages_with_filters_and_prefix():
+    table = MetricsTable(make_metrics())
+    expected = [table.frame['product'][i] for i in table.select('-avg_demand', prefix='sku-0', needs_reorder=True)]
+    assert collect(table, 3, sort='-avg_demand', prefix='sku-0', needs_reorder=True) == expected
+    assert table.query(sort='-avg_demand', prefix='sku-0', needs_reorder=True)['total'] == len(expected)
+
+
+def test_cursor_keeps_its_place_across_rebuilds():
+    metrics = make_metrics()
+    page = MetricsTable(metrics).query(sort='avg_demand', limit=10)
+    seen = [item['product'] for item in page['items']]
+
+    # Rows before and after the cursor are removed in the new table
+    dropped = {seen[0], metrics.sort_values(['avg_demand', 'product'])['product'].iloc[-1]}
+    rebuilt = MetricsTable(metrics[~metrics['product'].isin(dropped)])
+    rest = collect(rebuilt, 7, page['next_cursor'], sort='avg_demand')
+    expected = [product for product in metrics.sort_values(['avg_demand', 'product'])['product']
+                if product not in dropped and product not in seen]
+    assert rest == expected
+
+
+def test_cursor_from_another_sort_is_refused():
+    table = MetricsTable(make_metrics())
+    cursor = table.query(sort='avg_demand', limit=5)['next_cursor']
+    with pytest.raises(ValueError, match='different sort'):
+        table.query(sort='-avg_demand', cursor=cursor)
@@ -0,0 +1,95 @@
+"""
+Multi-location data: the rollup pools demand up the location -> region ->
+network hierarchy, and the demand matrix the dashboard plots from agrees
+with the network level on demand and stock.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from demand_matrix import DemandMatrix, OutOfOrderStock
+from metrics_engine import METRIC_COLUMNS, compute_metrics_from_matrix
+from rollup import LocationRollup
+
+from test_incremental import assert_same_matrix, make_sales
+
+
+def make_location_sales(seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = make_sales(n_products=15, n_days=40, seed=seed)
+    locations = np.array(['L1', 'L2', 'L3', 'L4'])
+    df['location'] = pd.Categorical(rng.choice(locations, len(df)))
+    df['region'] = pd.Categorical(np.where(df['location'].isin(['L1', 'L2']), 'north', 'south'))
+    return df
+
+
+def test_pooled_totals_of_upper_levels():
+    df = make_location_sales()
+    rollup = LocationRollup(df)
+    locations = rollup.metrics('location')
+    calendar = pd.date_range(df['date'].min(), df['date'].max())
+
+    for region, product in [('north', 'SKU-000'), ('south', 'SKU-007')]:
+        row = rollup.metrics('region', region=region, product=product).iloc[0]
+        below = locations[(locations['region'] == region) & (locations['product'] == product)]
+        # Stock and unpooled safety stock add up, safety stock is that of the summed demand
+        assert row['locations'] == len(below)
+        assert row['current_stock'] == below['current_stock'].sum()
+        assert row['unpooled_safety_stock'] == pytest.approx(below['safety_stock'].sum(), abs=0.01 * len(below))
+        rows = df[(df['region'] == region) & (df['product'] == product)]
+        daily = rows.groupby('date')['sold_units'].sum().reindex(calendar[calendar >= rows['date'].min()],
+                                                                 fill_value=0)
+        assert row['avg_demand'] == pytest.approx(round(daily.mean(), 2))
+        assert row['safety_stock'] == pytest.approx(round(1.65 * daily.std() * np.sqrt(7), 2))
+        assert row['safety_stock'] <= row['unpooled_safety_stock']
+
+    network = rollup.metrics('network').set_index('product')
+    regions = rollup.metrics('region')
+    assert (network['current_stock'] == regions.groupby('product', observed=True)['current_stock'].sum()).all()
+    assert (network['locations'] == regions.groupby('product', observed=True)['locations'].sum()).all()
+
+
+def test_matrix_matches_the_network_level():
+    df = make_location_sales(seed=1)
+    network = LocationRollup(df).metrics('network')[METRIC_COLUMNS]
+    network = network.assign(product=network['product'].astype(str)).reset_index(drop=True)
+    metrics = compute_metrics_from_matrix(DemandMatrix.from_frame(df))
+    pd.testing.assert_frame_equal(metrics, network, check_dtype=False)
+
+
+def test_matrix_stock_sums_the_last_report_of_each_location():
+    df = pd.DataFrame({
+        'date': pd.to_datetime(['2024-01-01', '2024-01-01', '2024-01-02', '2024-01-03', '2024-01-03']),
+        'product': ['A', 'A', 'A', 'A', 'A'],
+        'sold_units': [1.0, 1.0, 1.0, 1.0, 1.0],
+        'current_stock': [10.0, 5.0, 7.0, 3.0, 1.0],
+        'location': ['L1', 'L2', 'L1', 'L2', 'L2'],
+    })
+    matrix = DemandMatrix.from_frame(df)
+    assert matrix.stock[0].tolist() == [15, 12, 8]
+    assert matrix.current_stock[0] == 8
+
+
+@pytest.mark.parametrize('split_day', [1, 20, 39])
+def test_location_extend_matches_full_rebuild(split_day):
+    df = make_location_sales(seed=2)
+    cutoff = pd.Timestamp('2024-01-01') + pd.Timedelta(days=split_day)
+    base, delta = df[df['date'] < cutoff], df[df['date'] >= cutoff]
+    assert_same_matrix(DemandMatrix.from_frame(base).extend(delta), DemandMatrix.from_frame(df))
+
+
+def test_locations_added_to_data_without_them():
+    df = make_location_sales(seed=3)
+    cutoff = pd.Timestamp('2024-01-25')
+    base = df[df['date'] < cutoff].drop(columns=['location', 'region'])
+    delta = df[df['date'] >= cutoff]
+    both = pd.concat([base, delta], ignore_index=True)
+    assert_same_matrix(DemandMatrix.from_frame(base).extend(delta), DemandMatrix.from_frame(both))
+
+
+def test_location_stock_reported_before_its_last_report_is_refused():
+    df = make_location_sales(seed=4)
+    matrix = DemandMatrix.from_frame(df)
+    late = df[df['current_stock'].notna()].iloc[:1]
+    with pytest.raises(OutOfOrderStock):
+        matrix.extend(late)
@@ -0,0 +1,81 @@
+"""
+The SQLite side of the app: sales rows keep their location, databases from
+before the location column are migrated, and content that is already in
+the active dataset is recognized when it is appended again.
+"""
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from sales_db import SalesDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    return SalesDatabase(tmp_path / 'app.db')
+
+
+def store(db, tmp_path, content: str, mode: str) -> int:
+    incoming = tmp_path / 'incoming.csv'
+    incoming.write_text(content)
+    folder = tmp_path / 'uploads'
+    folder.mkdir(exist_ok=True)
+    upload_id, _, _ = db.store_upload(incoming, folder, 'sales.csv', mode)
+    return upload_id
+
+
+def test_history_filters_by_location(db):
+    df = pd.DataFrame({
+        'date': pd.to_datetime(['2024-01-01', '2024-01-01', '2024-01-02']),
+        'product': ['A', 'A', 'A'],
+        'sold_units': [3.0, 2.0, 1.0],
+        'current_stock': [40.0, 10.0, float('nan')],
+        'location': pd.Categorical(['L1', 'L2', None]),
+    })
+    db.replace_sales(df, 'v1')
+
+    locations = db.product_history('A')['location']
+    assert locations.iloc[:2].tolist() == ['L1', 'L2'] and pd.isna(locations.iloc[2])
+    rows = db.product_history('A', location='L2')
+    assert rows['sold_units'].tolist() == [2.0]
+    assert rows['current_stock'].tolist() == [10.0]
+
+
+def test_sales_table_without_location_is_migrated_and_reloaded(tmp_path):
+    path = tmp_path / 'app.db'
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE sales (product TEXT NOT NULL, date TEXT NOT NULL, sold_units REAL, current_stock REAL);
+        INSERT INTO meta VALUES ('sales_version', 'v1');
+        INSERT INTO sales VALUES ('A', '2024-01-01', 3, 40);
+    """)
+    conn.close()
+
+    db = SalesDatabase(path)
+    assert db.sales_version() is None
+    assert db.product_history('A')['location'].isna().all()
+
+
+def test_appended_content_already_in_the_dataset_is_recognized(db, tmp_path):
+    base = store(db, tmp_path, 'date,product,sold_units\n2024-01-01,A,1\n', 'replace')
+    db.finish_upload(base, rows=1, snapshot_id='s1')
+    delta = store(db, tmp_path, 'date,product,sold_units\n2024-01-02,A,2\n', 'append')
+    assert db.applied_upload(delta) is None
+    db.finish_upload(delta, rows=1, snapshot_id='s2')
+
+    again = store(db, tmp_path, 'date,product,sold_units\n2024-01-02,A,2\n', 'append')
+    assert db.applied_upload(again) == delta
+
+    # After a replace the same content is new to the dataset again
+    replace = store(db, tmp_path, 'date,product,sold_units\n2024-02-01,B,5\n', 'replace')
+    db.finish_upload(replace, rows=1, snapshot_id='s3')
+    assert db.applied_upload(store(db, tmp_path, 'date,product,sold_units\n2024-01-02,A,2\n', 'append')) is None
+
+
+def test_failed_upload_does_not_count_as_applied(db, tmp_path):
+    first = store(db, tmp_path, 'date,product,sold_units\n2024-01-02,A,2\n', 'append')
+    db.finish_upload(first, error='Error processing file')
+    again = store(db, tmp_path, 'date,product,sold_units\n2024-01-02,A,2\n', 'append')
+    assert db.applied_upload(again) is None
@@ -0,0 +1,108 @@
+"""
+Snapshot publishing: appends must never change a published snapshot, failed
+writes must leave the CURRENT pointer and the store's files as they were, and
+a delta the base cannot hold must be refused rather than silently trimmed.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from columnar_store import ColumnarWriter, can_append, read_columnar, write_columnar
+from snapshots import POINTER_NAME, SnapshotStore
+
+
+def make_rows(products, day: str) -> pd.DataFrame:
+    return pd.DataFrame({
+        'date': pd.Timestamp(day),
+        'product': products,
+        'sold_units': np.arange(1.0, len(products) + 1),
+        'current_stock': np.arange(10, 10 + len(products)),
+    })
+
+
+def file_contents(path):
+    return {item.name: item.read_bytes() for item in path.iterdir()}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SnapshotStore(tmp_path / 'data')
+    with store.transaction() as snapshot:
+        write_columnar(make_rows(['B', 'D'], '2024-01-01'), snapshot.path)
+    return store
+
+
+def test_append_leaves_base_snapshot_untouched(store):
+    base_id = store.current_id()
+    before = file_contents(store.path_for(base_id))
+
+    with store.transaction(append=True) as snapshot:
+        write_columnar(make_rows(['A', 'C'], '2024-01-02'), snapshot.path, append=True)
+
+    assert store.current_id() == snapshot.id != base_id
+    assert (store.root / POINTER_NAME).read_text() == snapshot.id
+    assert file_contents(store.path_for(base_id)) == before
+    assert len(read_columnar(store.path_for(base_id))) == 2
+    assert len(store.read()) == 4
+
+
+def test_appended_categories_are_sorted(store):
+    with store.transaction(append=True) as snapshot:
+        write_columnar(make_rows(['C', 'A'], '2024-01-02'), snapshot.path, append=True)
+
+    df = store.read()
+    assert list(df['product'].cat.categories) == ['A', 'B', 'C', 'D']
+    assert list(df['product']) == ['B', 'D', 'C', 'A']
+
+
+def test_failed_transaction_keeps_current_pointer(store):
+    base_id = store.current_id()
+    with pytest.raises(RuntimeError):
+        with store.transaction(append=True) as snapshot:
+            write_columnar(make_rows(['A'], '2024-01-02'), snapshot.path, append=True)
+            raise RuntimeError('ingest failed')
+
+    assert store.current_id() == base_id
+    assert not snapshot.path.exists()
+    assert len(store.read()) == 2
+
+
+def test_aborted_append_truncates_written_rows(tmp_path):
+    write_columnar(make_rows(['A', 'B'], '2024-01-01'), tmp_path)
+    before = file_contents(tmp_path)
+
+    writer = ColumnarWriter(tmp_path, append=True)
+    writer.append(make_rows(['C', 'D', 'E'], '2024-01-02'))
+    writer.abort()
+
+    assert file_contents(tmp_path) == before
+
+
+def test_leftovers_of_an_interrupted_append_are_dropped(tmp_path):
+    write_columnar(make_rows(['A', 'B'], '2024-01-01'), tmp_path)
+    # Written but never committed or aborted, as after a crash
+    writer = ColumnarWriter(tmp_path, append=True)
+    writer.append(make_rows(['C'], '2024-01-02'))
+    writer._close_handles()
+
+    write_columnar(make_rows(['D'], '2024-01-03'), tmp_path, append=True)
+    df = read_columnar(tmp_path, mmap=False)
+    assert list(df['product']) == ['A', 'B', 'D']
+    assert list(df['current_stock']) == [10, 11, 10]
+
+
+def test_append_with_new_columns_is_refused(store):
+    delta = make_rows(['A'], '2024-01-02').assign(location='LOC-1')
+    assert not can_append(store.current_path(), delta)
+
+    base_id = store.current_id()
+    with pytest.raises(ValueError, match='location'):
+        with store.transaction(append=True) as snapshot:
+            write_columnar(delta, snapshot.path, append=True)
+    assert store.current_id() == base_id
+
+
+def test_append_with_wider_dtype_is_refused(store):
+    delta = make_rows(['A'], '2024-01-02').assign(current_stock=np.nan)
+    assert not can_append(store.current_path(), delta)
+    assert can_append(store.current_path(), make_rows(['A'], '2024-01-02'))
@@ -0,0 +1,69 @@
+"""
+The /upload route: files the loader cannot read are turned away with a 400
+before anything is saved or queued, and CSV uploads are accepted as jobs.
+"""
+import io
+import os
+import time
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+
+@pytest.fixture(scope='module')
+def webapp(tmp_path_factory):
+    # Importing the app seeds its data directory, so give it a scratch one
+    previous = os.environ.get('INVENTORY_DATA_DIR')
+    os.environ['INVENTORY_DATA_DIR'] = str(tmp_path_factory.mktemp('data'))
+    try:
+        import app
+    finally:
+        if previous is None:
+            os.environ.pop('INVENTORY_DATA_DIR')
+        else:
+            os.environ['INVENTORY_DATA_DIR'] = previous
+    return app
+
+
+def post(webapp, name: str, content: bytes = b'date,product,sold_units\n2024-01-01,A,1\n'):
+    client = webapp.app.test_client()
+    return client.post('/upload', data={'file': (io.BytesIO(content), name)},
+                       content_type='multipart/form-data')
+
+
+def uploaded_files(webapp):
+    return sorted(path.name for path in webapp.UPLOAD_FOLDER.iterdir())
+
+
+@pytest.mark.parametrize('name', ['sales.txt', 'sales', 'sales.csv.exe'])
+def test_unsupported_files_are_refused_before_saving(webapp, monkeypatch, name):
+    queued = []
+    monkeypatch.setattr(webapp.upload_jobs, 'submit', lambda *args, **kwargs: queued.append(args))
+    before = uploaded_files(webapp)
+
+    response = post(webapp, name)
+
+    assert response.status_code == 400
+    assert 'Unsupported file format' in response.get_json()['error']
+    assert uploaded_files(webapp) == before
+    assert queued == []
+
+
+def test_queue_upload_raises_for_unsupported_files(webapp):
+    file = FileStorage(io.BytesIO(b'date,product,sold_units\n'), filename='sales.json')
+    with pytest.raises(ValueError, match=r'\.json'):
+        webapp.queue_upload(file)
+
+
+def test_csv_upload_is_queued(webapp):
+    response = post(webapp, 'Sales.CSV')
+    assert response.status_code == 202
+
+    client = webapp.app.test_client()
+    deadline = time.monotonic() + 30
+    while True:
+        status = client.get(response.get_json()['status_url']).get_json()
+        if status['status'] in ('succeeded', 'failed') or time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+    assert status['status'] == 'succeeded', status